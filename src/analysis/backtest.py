@@ -0,0 +1,38 @@
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from src.analysis.train_model import train_and_evaluate_model
+
+
+def rolling_origin_folds(years):
+    # Train on the first season up to N, test on N + 1, for every N
+    years = sorted(years)
+    return [(years[:i], years[i]) for i in range(1, len(years))]
+
+
+def run_fold(fold):
+    modeling_data, predictors, target, train_years, test_year = fold
+    train_data = modeling_data[modeling_data['Year'].isin(train_years)]
+    test_data = modeling_data[modeling_data['Year'] == test_year]
+
+    metrics = train_and_evaluate_model(train_data, test_data, predictors, target, report=False)
+    metrics.insert(1, 'TrainYears', f"{train_years[0]}-{train_years[-1]}")
+    metrics.insert(2, 'TestYear', test_year)
+    metrics.insert(3, 'TrainRows', len(train_data))
+    metrics.insert(4, 'TestRows', len(test_data))
+    return metrics
+
+
+def rolling_origin_backtest(modeling_data, predictors, target, years=None, n_workers=1):
+    years = years if years is not None else modeling_data['Year'].unique()
+    columns = ['Year', target] + predictors
+    folds = [(modeling_data[columns], predictors, target, train_years, test_year)
+             for train_years, test_year in rolling_origin_folds(years)]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            fold_metrics = list(executor.map(run_fold, folds))
+    else:
+        fold_metrics = [run_fold(fold) for fold in folds]
+
+    return pd.concat(fold_metrics, ignore_index=True)
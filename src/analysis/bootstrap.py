@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from src.analysis.rank_drivers import rank_drivers, ranking_weights
+
+# Bootstrap confidence intervals for the driver ranking. Each replicate resamples every
+# driver's races with replacement and recomputes the CompositeScore for all drivers. The
+# per-(Driver, Race) summary is turned into one array of per-race values per driver once,
+# so a replicate is a fancy index into it plus a few reductions, and a chunk of replicates
+# is computed at a time
+
+# Replicates per task; fixed so results don't depend on the number of workers
+replicates_per_chunk = 250
+
+
+def race_index(summary, min_races=20):
+    # Rows of the drivers rank_drivers keeps, grouped by driver in its order, as the per-race
+    # values needed to rebuild the ranking metrics from any sample of races (position sums
+    # with counts, since positions can be missing)
+    races = summary.groupby('Driver', observed=True)['Race'].transform('size')
+    rows = summary[races >= min_races].sort_values('Driver', kind='stable')
+
+    values = np.column_stack([
+        rows['SmoothedDeg_sum'].to_numpy(np.float64),
+        rows['SmoothedDeg_count'].to_numpy(np.float64),
+        rows['RacePoints'].to_numpy(np.float64),
+        rows['FinishPosition'].to_numpy(np.float64, na_value=0),
+        rows['FinishPosition'].notna().to_numpy(np.float64),
+        rows['StartingPosition'].to_numpy(np.float64, na_value=0),
+        rows['StartingPosition'].notna().to_numpy(np.float64),
+    ])
+    drivers, counts = np.unique(rows['Driver'].astype(str).to_numpy(), return_counts=True)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    return drivers, values, offsets, counts
+
+
+def bootstrap_scores(values, offsets, counts, weights, samples):
+    # CompositeScore of every driver for each replicate, given race samples (replicates x races)
+    totals = np.add.reduceat(values[samples], offsets, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = {
+            'PointsPerRace': totals[..., 2] / counts,
+            'SmoothedDeg': totals[..., 0] / totals[..., 1],
+            'FinishPosition': totals[..., 3] / totals[..., 4],
+            'StartingPosition': totals[..., 5] / totals[..., 6],
+        }
+        metrics['AvgPositionsGained'] = metrics['StartingPosition'] - metrics['FinishPosition']
+
+        # MinMaxScaler across drivers within each replicate, positions inverted as in score_drivers
+        normalized = {}
+        for name, metric in metrics.items():
+            low = np.nanmin(metric, axis=1, keepdims=True)
+            spread = np.nanmax(metric, axis=1, keepdims=True) - low
+            scaled = (metric - low) / np.where(spread == 0, 1, spread)
+            inverted = name in ('FinishPosition', 'StartingPosition')
+            normalized[f'{name}_Normalized'] = 1 - scaled if inverted else scaled
+
+    return sum(normalized[metric] * weight for metric, weight in weights.items())
+
+
+def bootstrap_chunk(task):
+    values, offsets, counts, weights, n_replicates, seed = task
+    rng = np.random.default_rng(seed)
+
+    # Each driver draws as many races as they have, from their own races only
+    driver_of_race = np.repeat(np.arange(len(counts)), counts)
+    draws = rng.random((n_replicates, len(driver_of_race)))
+    samples = offsets[driver_of_race] + (draws * counts[driver_of_race]).astype(np.int64)
+
+    scores = bootstrap_scores(values, offsets, counts, weights, samples)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, len(counts) + 1)[None, :], axis=1)
+    return scores, ranks
+
+
+def bootstrap_rankings(summary, n_replicates=1000, weighted=True, confidence=0.95, seed=0, n_workers=1):
+    # Point ranking plus bootstrap intervals of each driver's CompositeScore and rank.
+    # The same seed gives the same intervals for any n_workers
+    drivers, values, offsets, counts = race_index(summary)
+    weights = ranking_weights(weighted)
+
+    chunk_sizes = [min(replicates_per_chunk, n_replicates - start)
+                   for start in range(0, n_replicates, replicates_per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(values, offsets, counts, weights, size, chunk_seed) for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            chunks = list(executor.map(bootstrap_chunk, tasks))
+    else:
+        chunks = [bootstrap_chunk(task) for task in tasks]
+
+    scores = np.concatenate([chunk[0] for chunk in chunks])
+    ranks = np.concatenate([chunk[1] for chunk in chunks])
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = pd.DataFrame({
+        'Driver': drivers,
+        'ScoreLower': np.nanpercentile(scores, tail, axis=0),
+        'ScoreUpper': np.nanpercentile(scores, 100 - tail, axis=0),
+        'RankLower': np.percentile(ranks, tail, axis=0, method='lower'),
+        'RankMedian': np.percentile(ranks, 50, axis=0, method='lower'),
+        'RankUpper': np.percentile(ranks, 100 - tail, axis=0, method='higher'),
+    })
+
+    ranked_drivers = rank_drivers(summary, weighted)
+    point = ranked_drivers[['Driver', 'CompositeScore']].astype({'Driver': str})
+    point.insert(1, 'Rank', ranked_drivers.index)
+    return point.merge(intervals, on='Driver', how='left').set_index(ranked_drivers.index)
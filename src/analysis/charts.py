@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.profiling import profiled, stage
+
+# Charts are described by plain, picklable spec dicts first and drawn afterwards, so a
+# whole chart set can be rendered in worker processes. Every spec has a 'kind' matching
+# a draw function below and the 'file' it is saved to
+
+
+def bar_chart(data, x, y, title, xlabel, ylabel, file):
+    # Plain labels keep the data order; a categorical column would plot every category
+    data = data[[x, y]].astype({x: float, y: str})
+    return {'kind': 'bar', 'data': data, 'x': x, 'y': y,
+            'title': title, 'xlabel': xlabel, 'ylabel': ylabel, 'file': file}
+
+
+def draw_bar(spec):
+    fig = plt.figure(figsize=(12, 8))
+    sns.barplot(x=spec['x'], y=spec['y'], data=spec['data'])
+    plt.title(spec['title'])
+    plt.xlabel(spec['xlabel'])
+    plt.ylabel(spec['ylabel'])
+    plt.tight_layout()
+    return fig
+
+
+def draw_radar(spec):
+    metric_labels = spec['metric_labels']
+    N = len(metric_labels)
+    top_n = len(spec['drivers'])
+
+    # Create subplot figure with 3 rows and 3 columns
+    fig, axes = plt.subplots(nrows=min(3, (top_n + 2) // 3), ncols=3, figsize=(15, 15),
+                             subplot_kw=dict(polar=True))
+    axes = axes.flatten()
+
+    for i, (driver, driver_data) in enumerate(zip(spec['drivers'], spec['values'])):
+        if i >= len(axes):
+            break
+
+        # Close the plot by appending the first value
+        values = driver_data + [driver_data[0]]
+
+        # Angles for each metric
+        angles = [n / float(N) * 2 * np.pi for n in range(N)]
+        angles += angles[:1]  # Close the loop
+
+        # Plot data
+        ax = axes[i]
+        ax.plot(angles, values, linewidth=2, linestyle='solid')
+        ax.fill(angles, values, alpha=0.1)
+
+        # Fix axis to go in the right order and start at 12 o'clock
+        ax.set_theta_offset(np.pi / 2)
+        ax.set_theta_direction(-1)
+
+        # Draw axis lines for each angle and label
+        ax.set_xticks(angles[:-1])
+        ax.set_xticklabels(metric_labels)
+
+        # Draw ylabels
+        ax.set_rlabel_position(0)
+        ax.set_ylim(0, 1)
+
+        # Add title
+        ax.set_title(f"{driver} (Rank {i + 1})", size=11, y=1.1)
+
+    # Hide unused subplots
+    for i in range(min(top_n, len(axes)), len(axes)):
+        axes[i].axis('off')
+
+    plt.tight_layout()
+    return fig
+
+
+def draw_scatter(spec):
+    target = spec['target']
+    fig = plt.figure(figsize=(10, 6))
+    plt.scatter(spec['train_actual'], spec['train_predictions'], alpha=0.5, label='Train')
+    plt.scatter(spec['test_actual'], spec['test_predictions'], alpha=0.5, label='Test')
+    plt.plot([0, max(spec['train_actual'])], [0, max(spec['train_actual'])], 'r--')
+    plt.xlabel(f'Actual {target}')
+    plt.ylabel(f'Predicted {target}')
+    plt.title(f"Actual vs Predicted {target} using {spec['model']}")
+    plt.legend()
+    plt.tight_layout()
+    return fig
+
+
+draw_functions = {'bar': draw_bar, 'radar': draw_radar, 'scatter': draw_scatter}
+
+
+def render_chart(spec, output_dir='src/resources', show=False):
+    with stage('render_chart', chart=spec['file']):
+        fig = draw_functions[spec['kind']](spec)
+        plt.savefig(Path(output_dir) / spec['file'])
+    if show:
+        plt.show()
+    plt.close(fig)
+    return spec['file']
+
+
+def render_chart_headless(task):
+    spec, output_dir = task
+    return render_chart(spec, output_dir)
+
+
+def use_headless_backend():
+    plt.switch_backend('Agg')
+
+
+@profiled('render_charts')
+def render_charts(specs, headless=False, n_workers=1, output_dir='src/resources'):
+    # Interactive mode draws and shows each chart in turn. Headless mode uses the Agg
+    # backend without show(), rendering in a process pool when n_workers > 1
+    if not headless:
+        return [render_chart(spec, output_dir, show=True) for spec in specs]
+
+    tasks = [(spec, output_dir) for spec in specs]
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=use_headless_backend) as executor:
+            return list(executor.map(render_chart_headless, tasks))
+
+    use_headless_backend()
+    return [render_chart_headless(task) for task in tasks]
@@ -0,0 +1,200 @@
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.preprocessing import StandardScaler
+
+from src.config import (incremental_drift_check, incremental_max_trees, incremental_model_dir,
+                        incremental_reservoir_size, incremental_ridge_alpha, incremental_trees_per_update)
+from src.utils.profiling import stage
+
+# Incremental alternative to retraining both models on the whole history whenever races are
+# added. Only the feature rows of races not seen before are used for an update:
+#
+#   Ridge          count, means and co-moments of [predictors, target], merged per batch
+#                  (Chan et al.'s parallel update, as in FeatureAccumulator). They hold the
+#                  StandardScaler statistics and the normal equations, so the model equals a
+#                  full retrain of Ridge(alpha) on every row seen, without keeping the rows
+#   Random Forest  trees_per_update new trees per update, fitted on the new rows plus a
+#                  reservoir sample (Algorithm R) of up to reservoir_size earlier rows; the
+#                  oldest trees are dropped beyond max_trees. Trees are scale-invariant, so
+#                  they are fitted on the raw predictors
+#
+# The state of each target is persisted with joblib under incremental_model_dir, and every
+# comparison against a full retrain is kept in its drift history
+
+
+class IncrementalModels:
+
+    def __init__(self, predictors, target, alpha=incremental_ridge_alpha, trees_per_update=incremental_trees_per_update,
+                 max_trees=incremental_max_trees, reservoir_size=incremental_reservoir_size, seed=42):
+        self.predictors = list(predictors)
+        self.target = target
+        self.alpha = alpha
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.reservoir_size = reservoir_size
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+
+        # Moments of [predictors, target]
+        self.n = 0
+        self.mean = np.zeros(len(self.predictors) + 1)
+        self.comoments = np.zeros((len(self.predictors) + 1, len(self.predictors) + 1))
+
+        self.trees = []
+        self.reservoir = np.empty((0, len(self.predictors) + 1))
+        self.seen_races = set()
+        self.updates = 0
+        self.drift = []
+
+    def rows(self, data):
+        # [predictors, target] of data; predictors missing from it (e.g. a compound dummy
+        # of a later season) are 0, and predictors added later are ignored
+        columns = [data[col] if col in data else 0 for col in self.predictors + [self.target]]
+        return np.column_stack([np.broadcast_to(np.asarray(col, dtype=np.float64), len(data)) for col in columns])
+
+    def new_rows(self, data):
+        # The rows of data from races not seen yet
+        races = list(zip(data['Year'].astype(int), data['Race'].astype(str)))
+        return data[[race not in self.seen_races for race in races]], set(races) - self.seen_races
+
+    def update(self, data):
+        # Learn the rows of races not seen before; returns how many rows were used
+        data, races = self.new_rows(data)
+        if data.empty:
+            return 0
+        batch = self.rows(data)
+
+        with stage('update_ridge', rows=len(batch), target=self.target):
+            n_b = len(batch)
+            mean_b = batch.mean(axis=0)
+            centered = batch - mean_b
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            self.comoments += centered.T @ centered + np.outer(delta, delta) * self.n * n_b / n
+            self.mean += delta * n_b / n
+            self.n = n
+
+        with stage('update_random_forest', rows=len(batch), target=self.target):
+            sample = np.vstack([self.reservoir, batch])
+            forest = RandomForestRegressor(n_estimators=self.trees_per_update,
+                                           random_state=self.seed + self.updates).fit(sample[:, :-1], sample[:, -1])
+            self.trees = (self.trees + forest.estimators_)[-self.max_trees:]
+            self.add_to_reservoir(batch)
+
+        self.seen_races |= races
+        self.updates += 1
+        return len(batch)
+
+    def add_to_reservoir(self, batch):
+        # Algorithm R: the reservoir stays a uniform sample of every row seen
+        seen_before = self.n - len(batch)
+        free = max(self.reservoir_size - len(self.reservoir), 0)
+        self.reservoir = np.vstack([self.reservoir, batch[:free]])
+        for i in range(free, len(batch)):
+            slot = self.rng.integers(0, seen_before + i + 1)
+            if slot < self.reservoir_size:
+                self.reservoir[slot] = batch[i]
+
+    def scaler(self):
+        # StandardScaler with the statistics of every row seen
+        scaler = StandardScaler()
+        variance = np.diag(self.comoments)[:-1] / self.n
+        scale = np.sqrt(variance)
+        scaler.mean_, scaler.var_, scaler.scale_ = self.mean[:-1], variance, np.where(scale == 0, 1.0, scale)
+        scaler.n_features_in_, scaler.n_samples_seen_ = len(self.predictors), self.n
+        return scaler
+
+    def ridge(self):
+        # Ridge(alpha) on the standardized predictors of every row seen, from the moments:
+        # (Z'Z + alpha I) w = Z'y with Z'Z = C_xx / (s s') and Z'y = C_xy / s
+        scale = self.scaler().scale_
+        gram = self.comoments[:-1, :-1] / np.outer(scale, scale)
+        coef = np.linalg.solve(gram + self.alpha * np.eye(len(scale)), self.comoments[:-1, -1] / scale)
+        ridge = Ridge(alpha=self.alpha)
+        ridge.coef_, ridge.intercept_, ridge.n_features_in_ = coef, self.mean[-1], len(scale)
+        return ridge
+
+    def predict(self, data):
+        X = self.rows(data)[:, :-1]
+        ridge_predictions = self.ridge().predict(self.scaler().transform(X))
+        forest_predictions = np.mean([tree.predict(X) for tree in self.trees], axis=0)
+        return ridge_predictions, forest_predictions
+
+
+def state_path(model_dir, target):
+    return Path(model_dir) / f"{target}.joblib"
+
+
+def load_models(model_dir, predictors, target):
+    # The persisted state of target, or a fresh one
+    path = state_path(model_dir, target)
+    return joblib.load(path) if path.exists() else IncrementalModels(predictors, target)
+
+
+def save_models(model_dir, models):
+    path = state_path(model_dir, models.target)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    joblib.dump(models, tmp_path)
+    tmp_path.replace(path)
+
+
+def compare_with_full_retrain(models, train_data, test_data):
+    # Test metrics of the incremental models and of Ridge(alpha) and a forest of as many
+    # trees retrained on all of train_data, recorded in the models' drift history
+    X_train, y_train = models.rows(train_data)[:, :-1], train_data[models.target].to_numpy(np.float64)
+    y_test = test_data[models.target].to_numpy(np.float64)
+
+    start = time.perf_counter()
+    scaler = StandardScaler().fit(X_train)
+    full_ridge = Ridge(alpha=models.alpha).fit(scaler.transform(X_train), y_train)
+    full_forest = RandomForestRegressor(n_estimators=len(models.trees), random_state=models.seed).fit(X_train, y_train)
+    retrain_seconds = time.perf_counter() - start
+
+    X_test = models.rows(test_data)[:, :-1]
+    full = {'Ridge': full_ridge.predict(scaler.transform(X_test)), 'Random Forest': full_forest.predict(X_test)}
+    incremental = dict(zip(['Ridge', 'Random Forest'], models.predict(test_data)))
+
+    record = {'time': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'updates': models.updates,
+              'rows': models.n, 'races': len(models.seen_races), 'retrain_seconds': retrain_seconds}
+    for model in full:
+        record[f'{model} R2 incremental'] = r2_score(y_test, incremental[model])
+        record[f'{model} R2 full'] = r2_score(y_test, full[model])
+        record[f'{model} MAE incremental'] = mean_absolute_error(y_test, incremental[model])
+        record[f'{model} MAE full'] = mean_absolute_error(y_test, full[model])
+    models.drift.append(record)
+    return record
+
+
+def update_models(train_data, test_data, predictors, target, model_dir=incremental_model_dir,
+                  check_drift=incremental_drift_check):
+    # Update the persisted models of target with the races of train_data they have not
+    # seen, report their test metrics and, with check_drift, how far they are from a full retrain
+    models = load_models(model_dir, predictors, target)
+    start = time.perf_counter()
+    n_rows = models.update(train_data)
+    update_seconds = time.perf_counter() - start
+    save_models(model_dir, models)
+
+    print()
+    print(f"Incremental models (target = {target}): {n_rows} new rows learned in {update_seconds:.3f}s, "
+          f"{models.n} rows from {len(models.seen_races)} races in total, {len(models.trees)} trees")
+    ridge_predictions, forest_predictions = models.predict(test_data)
+    for model, predictions in [('Ridge', ridge_predictions), ('Random Forest', forest_predictions)]:
+        print(f"{model} Test R² Score: {r2_score(test_data[target], predictions):.3f}, "
+              f"Test MAE: {mean_absolute_error(test_data[target], predictions):.3f}")
+
+    if check_drift:
+        record = compare_with_full_retrain(models, train_data, test_data)
+        save_models(model_dir, models)
+        print(f"Drift against a full retrain ({record['retrain_seconds']:.3f}s):")
+        print(pd.DataFrame(models.drift).drop(columns=['time']).tail(5).round(3).to_string(index=False))
+    return models
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import sklearn
+
+
+def model_cache_key(train_data, predictors, target, hyperparameters):
+    # Hash of the training rows actually used, plus everything else that shapes the fit
+    digest = hashlib.sha256()
+    rows = pd.util.hash_pandas_object(train_data[predictors + [target]], index=False)
+    digest.update(rows.values.tobytes())
+    digest.update(json.dumps({
+        'predictors': predictors,
+        'target': target,
+        'hyperparameters': hyperparameters,
+        'sklearn': sklearn.__version__,
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_or_fit(fit, train_data, predictors, target, hyperparameters, cache_dir):
+    # Return fit(train_data, predictors, target), reusing the fitted models stored on disk
+    # when the same inputs were seen before
+    if cache_dir is None:
+        return fit(train_data, predictors, target)
+
+    start = time.perf_counter()
+    key = model_cache_key(train_data, predictors, target, hyperparameters)
+    path = Path(cache_dir) / f"{target}_{key[:24]}.joblib"
+
+    if path.exists():
+        models = joblib.load(path)
+        print(f"Model cache hit for {target}: loaded in {time.perf_counter() - start:.3f}s")
+        return models
+
+    models = fit(train_data, predictors, target)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    joblib.dump(models, tmp_path)
+    tmp_path.replace(path)
+
+    print(f"Model cache miss for {target}: fitted in {time.perf_counter() - start:.3f}s")
+    return models
@@ -1,8 +1,8 @@
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import matplotlib.pyplot as plt
-import seaborn as sns
+import pandas as pd
+from src.data.race_summary import driver_race_summary
+from src.data.schema import TIRE_MATRIX_SCHEMA
+from src.utils.profiling import profiled
 from src.config import (
     points_per_race_weight,
     tire_management_score_weight,
@@ -11,34 +11,47 @@ from src.config import (
     avg_positions_gained_weight
 )
 
+# Normalized metrics combined into the CompositeScore
+normalized_metrics = [
+    'PointsPerRace_Normalized',
+    'SmoothedDeg_Normalized',
+    'StartingPosition_Normalized',
+    'FinishPosition_Normalized',
+    'AvgPositionsGained_Normalized'
+]
+
+
 def analyze_best_driver(tire_matrix, weighted=True):
-    # First calculate RacePoints correctly - sum points per unique Race-Driver combination
-    race_points = tire_matrix.drop_duplicates(subset=['Driver', 'Race'])[['Driver', 'Race', 'RacePoints']]
-    total_points_by_driver = race_points.groupby('Driver')['RacePoints'].sum().reset_index()
+    return rank_drivers(driver_race_summary(tire_matrix), weighted)
 
-    finish_position = tire_matrix.drop_duplicates(subset=['Driver', 'Race'])[['Driver', 'Race', 'FinishPosition']]
-    avg_finish_position_by_driver = finish_position.groupby('Driver')['FinishPosition'].mean().reset_index()
 
-    starting_position = tire_matrix.drop_duplicates(subset=['Driver', 'Race'])[['Driver', 'Race', 'StartingPosition']]
-    avg_starting_position_by_driver = starting_position.groupby('Driver')['StartingPosition'].mean().reset_index()
+@profiled('rank_drivers')
+def rank_drivers(summary, weighted=True):
+    return score_drivers(summary_driver_stats(summary), weighted)
 
-    # Group data by Driver for other metrics
-    driver_stats = tire_matrix.groupby('Driver').agg({
-        'SmoothedDeg': 'mean',  # Lower is better
-        'DegradationPct': 'mean',  # Lower is better
-        'Stint': 'count'
-    }).reset_index()
 
-    # Calculate races participated
-    races_by_driver = tire_matrix.groupby('Driver')['Race'].nunique().reset_index()
-    races_by_driver.rename(columns={'Race': 'RacesParticipated'}, inplace=True)
+def summary_driver_stats(summary):
+    # Driver stats from the per-(Driver, Year, Race) summary in one groupby (one row per race each)
+    driver_stats = summary.groupby('Driver', observed=True).agg(
+        SmoothedDeg=('SmoothedDeg_sum', 'sum'),
+        SmoothedDeg_count=('SmoothedDeg_count', 'sum'),
+        DegradationPct=('DegradationPct_sum', 'sum'),
+        DegradationPct_count=('DegradationPct_count', 'sum'),
+        Stint=('Stints', 'sum'),
+        RacesParticipated=('Race', 'size'),
+        RacePoints=('RacePoints', 'sum'),
+        FinishPosition=('FinishPosition', 'mean'),
+        StartingPosition=('StartingPosition', 'mean')
+    ).reset_index()
 
-    # Merge data frames
-    driver_stats = pd.merge(driver_stats, races_by_driver, on='Driver')
-    driver_stats = pd.merge(driver_stats, total_points_by_driver, on='Driver')
-    driver_stats = pd.merge(driver_stats, avg_finish_position_by_driver, on='Driver')
-    driver_stats = pd.merge(driver_stats, avg_starting_position_by_driver, on='Driver')
+    # Per-lap means, at the tire matrix precision
+    for col in ['SmoothedDeg', 'DegradationPct']:
+        driver_stats[col] = (driver_stats[col] / driver_stats.pop(f'{col}_count')).astype(TIRE_MATRIX_SCHEMA[col])
 
+    return driver_stats
+
+
+def score_drivers(driver_stats, weighted=True):
     # Remove drivers where RacesParticipated < 20
     driver_stats = driver_stats[driver_stats['RacesParticipated'] >= 20].reset_index()
 
@@ -46,19 +59,17 @@ def analyze_best_driver(tire_matrix, weighted=True):
     driver_stats['PointsPerRace'] = driver_stats['RacePoints'] / driver_stats['RacesParticipated']
     driver_stats['AvgPositionsGained'] = driver_stats['StartingPosition'] - driver_stats['FinishPosition']
 
-    scaler = MinMaxScaler()
-
-    driver_stats['FinishPosition_Normalized'] = 1 + (-1 * scaler.fit_transform(
+    driver_stats['FinishPosition_Normalized'] = 1 + (-1 * min_max_scale(
         driver_stats[['FinishPosition']]
     ))
 
-    driver_stats['StartingPosition_Normalized'] = 1 + (-1 * scaler.fit_transform(
+    driver_stats['StartingPosition_Normalized'] = 1 + (-1 * min_max_scale(
         driver_stats[['StartingPosition']]
     ))
 
     # Normalize other metrics
     normalized_features = pd.DataFrame(
-        scaler.fit_transform(driver_stats[['PointsPerRace', 'AvgPositionsGained', 'SmoothedDeg']]),
+        min_max_scale(driver_stats[['PointsPerRace', 'AvgPositionsGained', 'SmoothedDeg']]),
         columns=[f"{col}_Normalized" for col in ['PointsPerRace', 'AvgPositionsGained', 'SmoothedDeg']]
     )
 
@@ -66,20 +77,7 @@ def analyze_best_driver(tire_matrix, weighted=True):
     for col in ['PointsPerRace', 'AvgPositionsGained', 'SmoothedDeg']:
         driver_stats[f"{col}_Normalized"] = normalized_features[f"{col}_Normalized"]
 
-    # Apply weights to different metrics if weighted is True
-    weights = {
-        'PointsPerRace_Normalized': points_per_race_weight,
-        'SmoothedDeg_Normalized': tire_management_score_weight,
-        'StartingPosition_Normalized': starting_position_weight,
-        'FinishPosition_Normalized': finish_position_weight,
-        'AvgPositionsGained_Normalized': avg_positions_gained_weight
-    } if weighted else {col: 0.2 for col in [
-        'PointsPerRace_Normalized',
-        'SmoothedDeg_Normalized',
-        'StartingPosition_Normalized',
-        'FinishPosition_Normalized',
-        'AvgPositionsGained_Normalized'
-    ]}
+    weights = ranking_weights(weighted)
 
     # Calculate composite score
     driver_stats['CompositeScore'] = sum(
@@ -92,140 +90,83 @@ def analyze_best_driver(tire_matrix, weighted=True):
     return ranked_drivers
 
 
-def plot_driver_rankings(ranked_drivers, top_n=10, radar=False):
-    # Get top N drivers
-    top_drivers = ranked_drivers.head(top_n)
+def min_max_scale(frame):
+    # MinMaxScaler().fit_transform with the same arithmetic (NaNs ignored, constant columns
+    # scaled by 1), without importing scikit-learn just to rank
+    values = frame.to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return values
+    low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+    spread = high - low
+    scale = 1 / np.where(spread < 10 * np.finfo(values.dtype).eps, 1, spread)
+    return values * scale + (0 - low * scale)
 
-    if not radar:
-        # Bar chart of composite scores
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x='CompositeScore', y='Driver', data=top_drivers)
-        plt.title(f'Top {top_n} Drivers by Composite Performance Score')
-        plt.xlabel('Composite Performance Score')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/composite_scores.png")
-        plt.show()
-
-        # Points per race
-        plt.figure(figsize=(12, 8))
-        points_sorted = ranked_drivers.sort_values('PointsPerRace', ascending=False).head(top_n)
-        sns.barplot(x='PointsPerRace', y='Driver', data=points_sorted)
-        plt.title(f'Top {top_n} Drivers by Points Per Race')
-        plt.xlabel('Points Per Race')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/points_per_race.png")
-        plt.show()
-
-        # Positions gained per race
-        plt.figure(figsize=(12, 8))
-        positions_sorted = ranked_drivers.sort_values('AvgPositionsGained', ascending=False).head(top_n)
-        sns.barplot(x='AvgPositionsGained', y='Driver', data=positions_sorted)
-        plt.title(f'Top {top_n} Drivers by Positions Gained Per Race')
-        plt.xlabel('Positions Gained Per Race')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/positions_gained.png")
-        plt.show()
-
-        # Average Starting Position
-        plt.figure(figsize=(12, 8))
-        starting_sorted = ranked_drivers.sort_values('StartingPosition', ascending=True).head(top_n)
-        sns.barplot(x='StartingPosition', y='Driver', data=starting_sorted)
-        plt.title(f'Top {top_n} Drivers by Average Starting Position')
-        plt.xlabel('Average Starting Position')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/starting_position.png")
-        plt.show()
-
-        # Average Finish Position
-        plt.figure(figsize=(12, 8))
-        finish_sorted = ranked_drivers.sort_values('FinishPosition', ascending=True).head(top_n)
-        sns.barplot(x='FinishPosition', y='Driver', data=finish_sorted)
-        plt.title(f'Top {top_n} Drivers by Average Finish Position')
-        plt.xlabel('Average Finish Position')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/finish_position.png")
-        plt.show()
-
-        # Tire management
-        plt.figure(figsize=(12, 8))
-        tire_sorted = ranked_drivers.sort_values('SmoothedDeg', ascending=False).head(top_n)
-        sns.barplot(x='SmoothedDeg', y='Driver', data=tire_sorted)
-        plt.title(f'Top {top_n} Drivers by Tire Degradation')
-        plt.xlabel('Average Tire Degradation %')
-        plt.ylabel('Driver')
-        plt.tight_layout()
-        plt.savefig("src/resources/tire_degradation.png")
-        plt.show()
-
-    else:
-        # Create radar charts for top drivers
-        metrics = [
-            'PointsPerRace_Normalized',
-            'SmoothedDeg_Normalized',
-            'StartingPosition_Normalized',
-            'FinishPosition_Normalized',
-            'AvgPositionsGained_Normalized'
-        ]
-
-        metric_labels = [
-            'Points Per Race',
-            'Tire Management',
-            'Starting Position',
-            'Finish Position',
-            'Positions Gained'
-        ]
-
-        # Number of variables
-        N = len(metrics)
 
-        # Create subplot figure with 3 rows and 3 columns
-        fig, axes = plt.subplots(nrows=min(3, (top_n + 2) // 3), ncols=3, figsize=(15, 15),
-                                 subplot_kw=dict(polar=True))
-        axes = axes.flatten()
-
-        for i, driver in enumerate(top_drivers['Driver'].values[:top_n]):
-            if i >= len(axes):
-                break
+def ranking_weights(weighted=True):
+    # Apply weights to different metrics if weighted is True
+    return {
+        'PointsPerRace_Normalized': points_per_race_weight,
+        'SmoothedDeg_Normalized': tire_management_score_weight,
+        'StartingPosition_Normalized': starting_position_weight,
+        'FinishPosition_Normalized': finish_position_weight,
+        'AvgPositionsGained_Normalized': avg_positions_gained_weight
+    } if weighted else {col: 0.2 for col in normalized_metrics}
 
-            # Get driver data
-            driver_data = top_drivers.loc[top_drivers['Driver'] == driver, metrics].values.flatten().tolist()
 
-            # Close the plot by appending the first value
-            values = driver_data + [driver_data[0]]
+def plot_driver_rankings(ranked_drivers, top_n=10, radar=False, headless=False, n_workers=1):
+    from src.analysis.charts import render_charts
+    render_charts(driver_ranking_charts(ranked_drivers, top_n, radar), headless, n_workers)
 
-            # Angles for each metric
-            angles = [n / float(N) * 2 * np.pi for n in range(N)]
-            angles += angles[:1]  # Close the loop
 
-            # Plot data
-            ax = axes[i]
-            ax.plot(angles, values, linewidth=2, linestyle='solid')
-            ax.fill(angles, values, alpha=0.1)
+def driver_ranking_charts(ranked_drivers, top_n=10, radar=False):
+    # Plotting libraries are only imported when charts are requested
+    from src.analysis.charts import bar_chart
 
-            # Fix axis to go in the right order and start at 12 o'clock
-            ax.set_theta_offset(np.pi / 2)
-            ax.set_theta_direction(-1)
+    # Get top N drivers
+    top_drivers = ranked_drivers.head(top_n)
 
-            # Draw axis lines for each angle and label
-            ax.set_xticks(angles[:-1])
-            ax.set_xticklabels(metric_labels)
+    if not radar:
+        return [
+            # Bar chart of composite scores
+            bar_chart(top_drivers, 'CompositeScore', 'Driver',
+                      f'Top {top_n} Drivers by Composite Performance Score',
+                      'Composite Performance Score', 'Driver', 'composite_scores.png'),
+            # Points per race
+            bar_chart(ranked_drivers.sort_values('PointsPerRace', ascending=False).head(top_n),
+                      'PointsPerRace', 'Driver', f'Top {top_n} Drivers by Points Per Race',
+                      'Points Per Race', 'Driver', 'points_per_race.png'),
+            # Positions gained per race
+            bar_chart(ranked_drivers.sort_values('AvgPositionsGained', ascending=False).head(top_n),
+                      'AvgPositionsGained', 'Driver', f'Top {top_n} Drivers by Positions Gained Per Race',
+                      'Positions Gained Per Race', 'Driver', 'positions_gained.png'),
+            # Average Starting Position
+            bar_chart(ranked_drivers.sort_values('StartingPosition', ascending=True).head(top_n),
+                      'StartingPosition', 'Driver', f'Top {top_n} Drivers by Average Starting Position',
+                      'Average Starting Position', 'Driver', 'starting_position.png'),
+            # Average Finish Position
+            bar_chart(ranked_drivers.sort_values('FinishPosition', ascending=True).head(top_n),
+                      'FinishPosition', 'Driver', f'Top {top_n} Drivers by Average Finish Position',
+                      'Average Finish Position', 'Driver', 'finish_position.png'),
+            # Tire management
+            bar_chart(ranked_drivers.sort_values('SmoothedDeg', ascending=False).head(top_n),
+                      'SmoothedDeg', 'Driver', f'Top {top_n} Drivers by Tire Degradation',
+                      'Average Tire Degradation %', 'Driver', 'tire_degradation.png'),
+        ]
 
-            # Draw ylabels
-            ax.set_rlabel_position(0)
-            ax.set_ylim(0, 1)
+    # Create radar charts for top drivers
+    metrics = normalized_metrics
 
-            # Add title
-            ax.set_title(f"{driver} (Rank {i + 1})", size=11, y=1.1)
+    metric_labels = [
+        'Points Per Race',
+        'Tire Management',
+        'Starting Position',
+        'Finish Position',
+        'Positions Gained'
+    ]
 
-        # Hide unused subplots
-        for i in range(min(top_n, len(axes)), len(axes)):
-            axes[i].axis('off')
+    drivers = list(top_drivers['Driver'].values[:top_n])
+    values = [top_drivers.loc[top_drivers['Driver'] == driver, metrics].values.flatten().astype(float).tolist()
+              for driver in drivers]
 
-        plt.tight_layout()
-        plt.savefig("src/resources/radar_charts.png")
-        plt.show()
+    return [{'kind': 'radar', 'drivers': drivers, 'values': values,
+             'metric_labels': metric_labels, 'file': 'radar_charts.png'}]
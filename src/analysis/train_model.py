@@ -1,33 +1,57 @@
 import pandas as pd
 import numpy as np
-from matplotlib import pyplot as plt
 from sklearn.linear_model import Ridge
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import r2_score, mean_absolute_error
 from sklearn.model_selection import GridSearchCV
 from sklearn.preprocessing import StandardScaler
-
-
-def train_and_evaluate_model(train_data, test_data, predictors, target):
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(train_data[predictors])
+from src.analysis.model_cache import load_or_fit
+from src.analysis.tuning import (forest_search_space, print_tuning_report, ridge_alphas, tune_random_forest,
+                                 tune_ridge)
+from src.config import (model_cache_dir, tuning_budget_seconds, tuning_budget_trees, tuning_candidates,
+                        tuning_workers)
+from src.utils.profiling import profiled, stage
+
+
+# Predictors used by both models, plus a Tire_ dummy per compound (see model_predictors)
+base_predictors = [
+    'SmoothedDeg_mean',
+    'SmoothedDeg_std',
+    'LapTime_mean',
+    'LapTime_std',
+    'LapTime_min',
+    'DegradationPct_mean',
+    'DegradationPct_max',
+    'DegradationPct_median',
+    'DegSlope_mean',
+    'DegIntercept_mean',
+    'RelativePerformance',
+    'PositionsGained'
+]
+
+# Hyperparameters of the fitted models, also part of the model cache key
+ridge_param_grid = {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0]}
+random_forest_params = {'n_estimators': 100, 'random_state': 42}
+
+
+def model_predictors(modeling_data):
+    # Add tire compound dummy variables
+    return base_predictors + [col for col in modeling_data.columns if col.startswith('Tire_')]
+
+
+@profiled('train_and_evaluate_model', labels=('target',))
+def train_and_evaluate_model(train_data, test_data, predictors, target, report=True, cache_dir=model_cache_dir,
+                             charts=None):
+    hyperparameters = {'ridge_param_grid': ridge_param_grid, 'random_forest_params': random_forest_params}
+    if tuning_enabled():
+        hyperparameters = {'tuning': {'budget_seconds': tuning_budget_seconds, 'budget_trees': tuning_budget_trees,
+                                      'candidates': tuning_candidates, 'search_space': forest_search_space,
+                                      'ridge_alphas': ridge_alphas.tolist()}}
+    scaler, reg, rf = load_or_fit(fit_models, train_data, predictors, target, hyperparameters, cache_dir)
+
+    X_train = scaler.transform(train_data[predictors])
     X_test = scaler.transform(test_data[predictors])
 
-    # Try ridge regression with hyperparameter tuning
-    ridge = Ridge()
-    param_grid = {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0]}
-    grid_search = GridSearchCV(ridge, param_grid, cv=5, scoring='r2')
-    grid_search.fit(X_train, train_data[target])
-    best_alpha = grid_search.best_params_['alpha']
-
-    # Use best model
-    reg = Ridge(alpha=best_alpha)
-    reg.fit(X_train, train_data[target])
-
-    # Try a Random Forest model
-    rf = RandomForestRegressor(n_estimators=100, random_state=42)
-    rf.fit(X_train, train_data[target])
-
     # Make predictions with both analysis
     train_predictions_ridge = reg.predict(X_train)
     test_predictions_ridge = reg.predict(X_test)
@@ -35,6 +59,17 @@ def train_and_evaluate_model(train_data, test_data, predictors, target):
     train_predictions_rf = rf.predict(X_train)
     test_predictions_rf = rf.predict(X_test)
 
+    metrics = pd.DataFrame([
+        evaluate_predictions('Ridge', train_data[target], train_predictions_ridge,
+                             test_data[target], test_predictions_ridge),
+        evaluate_predictions('Random Forest', train_data[target], train_predictions_rf,
+                             test_data[target], test_predictions_rf),
+    ])
+    metrics.insert(0, 'Target', target)
+
+    if not report:
+        return metrics
+
     # Evaluate analysis
     print()
     print(f"Ridge Regression Test Performance (target = {target}):")
@@ -85,14 +120,71 @@ def train_and_evaluate_model(train_data, test_data, predictors, target):
         test_predictions = test_predictions_rf
         chosen_model = rf
 
-    plt.figure(figsize=(10, 6))
-    plt.scatter(train_data[target], train_predictions, alpha=0.5, label='Train')
-    plt.scatter(test_data[target], test_predictions, alpha=0.5, label='Test')
-    plt.plot([0, max(train_data[target])], [0, max(train_data[target])], 'r--')
-    plt.xlabel(f'Actual {target}')
-    plt.ylabel(f'Predicted {target}')
-    plt.title(f'Actual vs Predicted {target} using {better_model}')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(f"src/resources/{target}_{better_model.replace(' ', '_')}.png")
-    plt.show()
\ No newline at end of file
+    chart = {
+        'kind': 'scatter', 'target': target, 'model': better_model,
+        'train_actual': train_data[target].to_numpy(dtype=float), 'train_predictions': train_predictions,
+        'test_actual': test_data[target].to_numpy(dtype=float), 'test_predictions': test_predictions,
+        'file': f"{target}_{better_model.replace(' ', '_')}.png",
+    }
+
+    # Collect the chart for batch rendering when a list is given, otherwise draw it now
+    if charts is not None:
+        charts.append(chart)
+    else:
+        # Plotting libraries are only imported when a chart is actually drawn
+        from src.analysis.charts import render_charts
+        render_charts([chart])
+
+    return metrics
+
+
+def tuning_enabled():
+    return tuning_budget_seconds is not None or tuning_budget_trees is not None
+
+
+def fit_models(train_data, predictors, target):
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(train_data[predictors])
+
+    if tuning_enabled():
+        return (scaler,) + tune_models(X_train, train_data[target], target)
+
+    # Try ridge regression with hyperparameter tuning
+    with stage('fit_ridge', rows=len(train_data), target=target):
+        ridge = Ridge()
+        grid_search = GridSearchCV(ridge, ridge_param_grid, cv=5, scoring='r2')
+        grid_search.fit(X_train, train_data[target])
+        best_alpha = grid_search.best_params_['alpha']
+
+        # Use best model
+        reg = Ridge(alpha=best_alpha)
+        reg.fit(X_train, train_data[target])
+
+    # Try a Random Forest model
+    with stage('fit_random_forest', rows=len(train_data), target=target):
+        rf = RandomForestRegressor(**random_forest_params)
+        rf.fit(X_train, train_data[target])
+
+    return scaler, reg, rf
+
+
+def tune_models(X_train, y_train, target):
+    # Ridge and Random Forest tuned within the configured budget
+    with stage('tune_ridge', rows=len(X_train), target=target):
+        reg, ridge_report = tune_ridge(X_train, y_train)
+    with stage('tune_random_forest', rows=len(X_train), target=target):
+        rf, forest_report = tune_random_forest(X_train, y_train, tuning_candidates, tuning_budget_seconds,
+                                               tuning_budget_trees, n_workers=tuning_workers,
+                                               seed=random_forest_params['random_state'])
+    print_tuning_report(target, ridge_report, forest_report, tuning_budget_seconds, tuning_budget_trees)
+    return reg, rf
+
+
+def evaluate_predictions(model, train_actual, train_predictions, test_actual, test_predictions):
+    return {
+        'Model': model,
+        'TrainR2': r2_score(train_actual, train_predictions),
+        'TestR2': r2_score(test_actual, test_predictions),
+        'TrainMAE': mean_absolute_error(train_actual, train_predictions),
+        'TestMAE': mean_absolute_error(test_actual, test_predictions),
+    }
\ No newline at end of file
@@ -0,0 +1,143 @@
+import itertools
+import time
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge, RidgeCV
+
+from src.utils.profiling import stage
+
+# Budgeted tuning of the two models. Ridge's alpha is picked by generalized cross-validation
+# over ridge_alphas (one fit for all of them). Random Forest candidates, sampled from
+# forest_search_space, go through successive halving with the number of trees as the
+# resource: every rung grows the surviving forests (warm_start, so earlier trees are kept)
+# to eta times more trees and keeps the best 1 / eta by out-of-bag R². A forest whose OOB R²
+# improves by less than tolerance over one growth step stops growing. Tuning ends when the
+# rungs run out or the budget (seconds of wall time and/or trees grown) is spent, and the
+# best forest found so far is returned as it is, already fitted on all training rows
+
+ridge_alphas = np.logspace(-3, 3, 13)
+
+forest_search_space = {
+    'max_depth': [4, 6, 8, 12, None],
+    'min_samples_leaf': [1, 2, 5, 10, 20],
+    'max_features': [0.33, 0.5, 0.75, 1.0],
+}
+
+# What fit_models used before tuning, always among the candidates for comparison
+default_forest_candidate = {'max_depth': None, 'min_samples_leaf': 1, 'max_features': 1.0}
+
+
+def forest_candidates(n_candidates, seed=0):
+    # n_candidates distinct points of forest_search_space, including the default
+    grid = [dict(zip(forest_search_space, values)) for values in itertools.product(*forest_search_space.values())]
+    rng = np.random.default_rng(seed)
+    others = [params for params in grid if params != default_forest_candidate]
+    chosen = rng.choice(len(others), size=min(n_candidates - 1, len(others)), replace=False)
+    return [default_forest_candidate] + [others[i] for i in sorted(chosen)]
+
+
+def grow_forest(task):
+    # Grow a candidate's forest to n_trees, step trees at a time, or until its OOB R² stops
+    # improving or the deadline passes. Returns the forest and its (trees, OOB R²) history
+    forest, params, X, y, n_trees, step, tolerance, deadline, seed = task
+    if forest is None:
+        forest = RandomForestRegressor(n_estimators=0, warm_start=True, oob_score=True, random_state=seed,
+                                       **params)
+    previous = getattr(forest, 'oob_score_', None)
+    history = []
+    plateaued = False
+    while forest.n_estimators < n_trees and time.time() < deadline:
+        forest.n_estimators = min(forest.n_estimators + step, n_trees)
+        forest.fit(X, y)
+        history.append((forest.n_estimators, forest.oob_score_))
+        if previous is not None and forest.oob_score_ - previous < tolerance:
+            plateaued = True
+            break
+        previous = forest.oob_score_
+    return forest, history, plateaued
+
+
+def tune_random_forest(X, y, n_candidates=27, budget_seconds=None, budget_trees=None, min_trees=25,
+                       max_trees=400, eta=3, tolerance=1e-3, n_workers=1, seed=42):
+    # Best forest within the budget, and a report of the search
+    start = time.perf_counter()
+    deadline = time.time() + budget_seconds if budget_seconds else float('inf')
+    candidates = [{'params': params, 'forest': None, 'oob': -np.inf, 'plateaued': False}
+                  for params in forest_candidates(n_candidates, seed)]
+    X, y = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    survivors = candidates
+    n_trees = min_trees
+    rungs = []
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+    try:
+        while survivors and time.time() < deadline:
+            growing = [c for c in survivors if not c['plateaued'] and trees(c) < n_trees]
+            # Within a tree budget, only the best candidates the remainder can afford are grown
+            if budget_trees is not None:
+                remaining = budget_trees - sum(trees(c) for c in candidates)
+                affordable = []
+                for candidate in sorted(growing, key=lambda c: -c['oob']):
+                    if n_trees - trees(candidate) <= remaining:
+                        affordable.append(candidate)
+                        remaining -= n_trees - trees(candidate)
+                growing = affordable
+            if not growing:
+                break
+
+            tasks = [(c['forest'], c['params'], X, y, n_trees, min_trees, tolerance, deadline, seed) for c in growing]
+            with stage('tune_rung', rows=len(X), trees=n_trees, candidates=len(tasks)):
+                results = executor.map(grow_forest, tasks) if executor else map(grow_forest, tasks)
+                for candidate, (forest, history, plateaued) in zip(growing, results):
+                    candidate['forest'], candidate['plateaued'] = forest, plateaued
+                    if history:
+                        candidate['oob'] = history[-1][1]
+
+            survivors.sort(key=lambda c: -c['oob'])
+            rungs.append({'trees': n_trees, 'candidates': len(growing), 'best_oob_r2': survivors[0]['oob'],
+                          'seconds': time.perf_counter() - start})
+            if n_trees >= max_trees:
+                break
+            survivors = survivors[:max(1, len(survivors) // eta)]
+            n_trees = min(n_trees * eta, max_trees)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    evaluated = [c for c in candidates if trees(c) > 0]
+    if not evaluated:
+        raise ValueError("Tuning budget too small to grow a single forest")
+    best = max(evaluated, key=lambda c: c['oob'])
+    forest = best['forest']
+    forest.warm_start = False
+    report = {'params': best['params'], 'trees': forest.n_estimators, 'oob_r2': best['oob'],
+              'candidates': len(candidates), 'rungs': rungs,
+              'trees_grown': sum(trees(c) for c in evaluated),
+              'seconds': time.perf_counter() - start}
+    return forest, report
+
+
+def trees(candidate):
+    return candidate['forest'].n_estimators if candidate['forest'] is not None else 0
+
+
+def tune_ridge(X, y):
+    # Ridge refitted with the alpha of lowest leave-one-out error (efficient GCV)
+    search = RidgeCV(alphas=ridge_alphas).fit(X, y)
+    return Ridge(alpha=search.alpha_).fit(X, y), {'alpha': float(search.alpha_)}
+
+
+def print_tuning_report(target, ridge_report, forest_report, budget_seconds, budget_trees):
+    budget = ', '.join(part for part in [f"{budget_seconds:g}s" if budget_seconds else '',
+                                         f"{budget_trees} trees" if budget_trees else ''] if part)
+    print()
+    print(f"Tuning (target = {target}, budget {budget}):")
+    print(f"Ridge alpha: {ridge_report['alpha']:g}")
+    for rung in forest_report['rungs']:
+        print(f"  {rung['candidates']:3d} forests grown to {rung['trees']:3d} trees, best OOB R² "
+              f"{rung['best_oob_r2']:.3f} after {rung['seconds']:.1f}s")
+    params = ', '.join(f"{name}={value}" for name, value in forest_report['params'].items())
+    print(f"Random Forest: {params}, {forest_report['trees']} trees, OOB R² {forest_report['oob_r2']:.3f}")
+    print(f"{forest_report['candidates']} candidates, {forest_report['trees_grown']} trees grown "
+          f"in {forest_report['seconds']:.1f}s")
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.rank_drivers import normalized_metrics
+
+# Sensitivity of the driver ranking to the CompositeScore weights. The normalized metrics
+# don't depend on the weights, so a whole batch of weight vectors is scored as one matrix
+# product: (drivers x metrics) @ (metrics x vectors)
+
+
+def random_weights(n_vectors, seed=0, concentration=1.0):
+    # Weight vectors drawn uniformly from the simplex (each sums to 1) by default; a higher
+    # concentration keeps them closer to equal weights
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.dirichlet(np.full(len(normalized_metrics), concentration), n_vectors),
+                        columns=normalized_metrics)
+
+
+def sweep_ranks(ranked_drivers, weights):
+    # Rank (1 = best) of every driver under every weight vector, drivers x vectors.
+    # weights is a DataFrame with the normalized metric columns, or an array in that order
+    weights = np.asarray(weights[normalized_metrics] if isinstance(weights, pd.DataFrame) else weights, dtype=float)
+    metrics = ranked_drivers[normalized_metrics].to_numpy(dtype=float)
+    scores = metrics @ weights.T
+
+    # Stable sort on the negated scores, so ties keep the order analyze_best_driver returned
+    order = np.argsort(-scores, axis=0, kind='stable')
+    ranks = np.empty_like(order, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, len(metrics) + 1, dtype=np.int32)[:, None], axis=0)
+
+    return pd.DataFrame(ranks, index=pd.Index(ranked_drivers['Driver'].astype(str), name='Driver'))
+
+
+def rank_stability(ranks, top_n=10):
+    # Per-driver summary of the rank distribution across the sweep
+    values = ranks.to_numpy()
+    stability = pd.DataFrame({
+        'MeanRank': values.mean(axis=1),
+        'MedianRank': np.median(values, axis=1),
+        'RankStd': values.std(axis=1),
+        'BestRank': values.min(axis=1),
+        'WorstRank': values.max(axis=1),
+        'WinShare': (values == 1).mean(axis=1),
+        f'Top{top_n}Share': (values <= top_n).mean(axis=1),
+    }, index=ranks.index)
+    return stability.sort_values(['MeanRank', f'Top{top_n}Share'], ascending=[True, False])
+
+
+def weight_sweep(ranked_drivers, weights, top_n=10):
+    # Ranks under every weight vector, and how stable each driver's position is
+    ranks = sweep_ranks(ranked_drivers, weights)
+    return ranks, rank_stability(ranks, top_n)
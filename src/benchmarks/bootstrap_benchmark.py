@@ -0,0 +1,62 @@
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+
+from src.analysis.bootstrap import bootstrap_rankings, bootstrap_scores, race_index
+from src.analysis.rank_drivers import rank_drivers, ranking_weights
+from src.data.collect_data import collect_data
+from src.data.race_summary import driver_race_summary
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def pandas_replicate(summary, rng):
+    # One replicate the straightforward way: resample each driver's races and rerun rank_drivers
+    samples = summary.groupby('Driver', observed=True).sample(frac=1, replace=True, random_state=rng)
+    # Resampled races are duplicates of each other, so give every draw its own race key
+    return rank_drivers(samples.assign(Race=np.arange(len(samples)).astype(str)))
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024), n_replicates=2000, n_workers=None):
+    n_workers = n_workers or os.cpu_count()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races)
+    summary = driver_race_summary(tire_matrix)
+
+    # Drawing every race exactly once reproduces rank_drivers' scores
+    drivers, values, offsets, counts = race_index(summary)
+    for weighted in (True, False):
+        scores = bootstrap_scores(values, offsets, counts, ranking_weights(weighted), np.arange(len(values))[None, :])
+        ranked = rank_drivers(summary, weighted)
+        expected = ranked.set_index(ranked['Driver'].astype(str))['CompositeScore'].reindex(drivers)
+        assert np.allclose(scores[0], expected, rtol=1e-6)
+
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(20):
+        pandas_replicate(summary, rng)
+    pandas_time = (time.perf_counter() - start) / 20
+
+    start = time.perf_counter()
+    sequential = bootstrap_rankings(summary, n_replicates, seed=0, n_workers=1)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = bootstrap_rankings(summary, n_replicates, seed=0, n_workers=n_workers)
+    parallel_time = time.perf_counter() - start
+
+    # Same seed, same intervals, whatever the number of workers
+    assert sequential.equals(parallel)
+
+    print(f"{len(drivers)} drivers, {len(values)} driver races, {n_replicates} replicates")
+    print(f"pandas resample + rank_drivers: {pandas_time * 1000:.1f} ms per replicate "
+          f"(~{pandas_time * n_replicates:.0f}s for {n_replicates})")
+    print(f"Vectorized, 1 process:   {sequential_time:.2f}s")
+    print(f"Vectorized, {n_workers} processes: {parallel_time:.2f}s")
+    print(sequential.round(3).to_string())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src.data.collect_data import TireRecord, TireMatrixBuilder, process_race
+from src.utils.synthetic import make_session, make_races
+
+
+def per_stint_concat(race_records):
+    # Previous approach: one TireRecord per row, one DataFrame per stint, concatenated
+    # onto a growing tire matrix
+    tire_matrix = pd.DataFrame()
+    for records in race_records:
+        for _, stint in records.groupby(['Driver', 'Stint'], sort=False):
+            stint_df = pd.DataFrame.from_records([TireRecord(**row).__dict__ for row in stint.to_dict('records')])
+            if not tire_matrix.empty:
+                tire_matrix = pd.concat([tire_matrix, stint_df], ignore_index=True)
+            else:
+                tire_matrix = stint_df
+    return tire_matrix
+
+
+def per_race_concat(race_records):
+    return pd.concat(list(race_records), ignore_index=True)
+
+
+def columnar_builder(race_records, n_races):
+    builder = TireMatrixBuilder(expected_batches=n_races)
+    for records in race_records:
+        builder.append(records)
+    return builder.to_frame()
+
+
+def arriving(race_records):
+    # Each race's records arrive as a fresh table, as they do from collect_races
+    for records in race_records:
+        yield records.copy()
+
+
+def measure(accumulate, race_records):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tire_matrix = accumulate(arriving(race_records))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tire_matrix, elapsed, peak
+
+
+def run(n_races=40, include_per_stint=True):
+    race_records = [process_race(make_session(seed=i), race[0], 2024) for i, race in enumerate(make_races(n_races))]
+    data_size = sum(records.memory_usage(deep=True).sum() for records in race_records)
+
+    print(f"{n_races} synthetic races, {sum(map(len, race_records))} tire records, "
+          f"{data_size / 2 ** 20:.1f} MiB of race records")
+
+    approaches = [('Per-race concat', per_race_concat),
+                  ('Columnar builder', lambda records: columnar_builder(records, n_races))]
+    # The per-stint approach is quadratic, so it dominates the run time on large fixtures
+    if include_per_stint:
+        approaches.insert(0, ('Per-stint concat', per_stint_concat))
+
+    expected = None
+    for name, accumulate in approaches:
+        tire_matrix, elapsed, peak = measure(accumulate, race_records)
+        if expected is None:
+            expected = tire_matrix
+        else:
+            pd.testing.assert_frame_equal(expected, tire_matrix, check_dtype=False)
+        print(f"{name:18} {elapsed:8.3f}s  peak {peak / 2 ** 20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    run()
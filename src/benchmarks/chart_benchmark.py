@@ -0,0 +1,53 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from src.analysis.charts import render_charts
+from src.analysis.rank_drivers import analyze_best_driver, driver_ranking_charts
+from src.analysis.train_model import model_predictors, train_and_evaluate_model
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def full_chart_set(years=(2020, 2021, 2022, 2023, 2024)):
+    # The two model scatters plus the ranking bar charts and radar grid, as main draws them
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races)
+        modeling_data = prepare_features(tire_matrix)
+        predictors = model_predictors(modeling_data)
+        train_data = modeling_data[modeling_data['Year'] < years[-1]]
+        test_data = modeling_data[modeling_data['Year'] == years[-1]]
+
+        charts = []
+        for target in ['StintLength', 'RacePoints']:
+            train_and_evaluate_model(train_data, test_data, predictors, target, cache_dir=None, charts=charts)
+
+    driver_rankings = analyze_best_driver(tire_matrix)
+    return charts + driver_ranking_charts(driver_rankings, top_n=20) + \
+        driver_ranking_charts(driver_rankings, top_n=6, radar=True)
+
+
+def time_rendering(charts, n_workers):
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        render_charts(charts, headless=True, n_workers=n_workers, output_dir=output_dir)
+        return time.perf_counter() - start
+
+
+def run(n_workers=None):
+    n_workers = n_workers or os.cpu_count()
+    charts = full_chart_set()
+
+    sequential = time_rendering(charts, 1)
+    parallel = time_rendering(charts, n_workers)
+
+    print(f"{len(charts)} charts")
+    print(f"Sequential on the main thread: {sequential:.2f}s")
+    print(f"Process pool ({n_workers} workers):  {parallel:.2f}s")
+
+
+if __name__ == "__main__":
+    run()
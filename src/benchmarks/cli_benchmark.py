@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Import and cold-start time of each CLI subcommand, every run in a fresh interpreter.
+# Import time is the sum of the top-level imports reported by python -X importtime;
+# cold start is the wall time of the whole process
+
+
+def import_seconds(stderr):
+    # Top-level modules are the lines whose name isn't indented
+    total = 0
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if not name[1:].startswith(' ') and cumulative.strip().isdigit():
+                total += int(cumulative)
+    return total / 1e6
+
+
+def run_command(args, cwd):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, capture_output=True, text=True,
+                            env={**os.environ, 'MPLBACKEND': 'Agg'})
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return import_seconds(result.stderr), elapsed
+
+
+def run(years=('2024',)):
+    repo = Path(__file__).resolve().parents[2]
+    with tempfile.TemporaryDirectory() as tmp:
+        common = ['-m', 'src.cli', '--store', f'{tmp}/store', '--features', f'{tmp}/features.parquet',
+                  '--years', *years, '--set', 'model_cache_dir=None']
+        commands = {
+            'collect': ['collect', '--synthetic'],
+            'features': ['features'],
+            'train': ['train', '--train-years', years[0], '--test-years', years[-1]],
+            'rank': ['rank'],
+            'plot': ['plot', '--headless', '--output-dir', tmp],
+        }
+
+        rows = [('python -c "import src.main"',) + run_command(['-c', 'import src.main'], repo)]
+        for name, args in commands.items():
+            rows.append((f'src.cli {name}',) + run_command(common + args, repo))
+
+    print(f"{'':30}{'imports (s)':>12}{'cold start (s)':>16}")
+    for name, imports, elapsed in rows:
+        print(f"{name:30}{imports:12.2f}{elapsed:16.2f}")
+
+
+if __name__ == "__main__":
+    run()
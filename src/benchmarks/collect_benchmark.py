@@ -0,0 +1,103 @@
+import time
+
+import pandas as pd
+
+from src.data.collect_data import TireRecord, process_race
+from src.utils.helpers import extract_sc_vsc_periods, is_valid_lap, calculate_baseline
+from src.utils.synthetic import make_session, make_races
+
+
+def legacy_process_race(session, race_name, year):
+    # Reference per-driver, per-stint, per-lap implementation that process_race replaced
+    sc_vsc_periods = extract_sc_vsc_periods(session.track_status)
+
+    driver_points = session.results.set_index('Abbreviation')['Points'].to_dict()
+    starting_positions = session.results.set_index('Abbreviation')['GridPosition'].to_dict()
+    finish_positions = session.results.set_index('Abbreviation')['Position'].to_dict()
+
+    records = []
+    for driver in session.results.Abbreviation.values:
+        laps = session.laps.pick_drivers(driver)
+
+        if laps.Position.empty:
+            continue
+
+        for stint_num in laps.Stint.unique():
+            stint_laps = laps[laps.Stint == stint_num]
+            lap_times = []
+            valid_indices = []
+
+            for index, lapNumber in stint_laps.LapNumber.items():
+                if is_valid_lap(index, stint_laps, sc_vsc_periods):
+                    lap_times.append(stint_laps.LapTime[index])
+                    valid_indices.append(index)
+
+            if len(valid_indices) <= 1:
+                continue
+
+            baseline_time = calculate_baseline(stint_laps, valid_indices)
+            degradation_pcts = [(lap_time - baseline_time) / baseline_time * 100
+                                for lap_time in lap_times]
+            smoothed_deg = pd.Series(degradation_pcts).rolling(window=3, min_periods=1).mean()
+            stint_length = stint_laps.shape[0]
+
+            for i, index in enumerate(valid_indices):
+                positions_gained = 0
+                if i > 0:
+                    prev_index = valid_indices[i - 1]
+                    positions_gained = stint_laps.Position[index] - stint_laps.Position[prev_index]
+
+                stint_lap_number = (stint_laps.loc[index, 'LapNumber'] -
+                                    stint_laps['LapNumber'].iloc[0] + 1)
+
+                records.append(TireRecord(
+                    Driver=driver,
+                    Race=race_name,
+                    Year=year,
+                    LapNumber=stint_laps.LapNumber[index],
+                    Stint=stint_num,
+                    StintLapNumber=stint_lap_number,
+                    LapTime=stint_laps.LapTime[index].total_seconds() * 1000,
+                    Compound=stint_laps.Compound[index],
+                    BaselineTime=baseline_time.total_seconds() * 1000,
+                    DegradationPct=degradation_pcts[i],
+                    SmoothedDeg=smoothed_deg[i],
+                    PositionsGained=positions_gained,
+                    RacePoints=driver_points.get(driver, 0),
+                    StintLength=stint_length,
+                    FinishPosition=finish_positions.get(driver, 1 + max(finish_positions.values())),
+                    StartingPosition=starting_positions.get(driver)
+                ).__dict__)
+
+    return pd.DataFrame.from_records(records)
+
+
+def build_fixture(n_races=20, n_drivers=20, n_laps=57):
+    return [(race[0], make_session(seed=i, n_drivers=n_drivers, n_laps=n_laps))
+            for i, race in enumerate(make_races(n_races))]
+
+
+def time_engine(process, fixture, year=2024):
+    start = time.perf_counter()
+    frames = [process(session, race_name, year) for race_name, session in fixture]
+    elapsed = time.perf_counter() - start
+    return pd.concat(frames, ignore_index=True), elapsed
+
+
+def run(n_races=20):
+    fixture = build_fixture(n_races)
+
+    legacy, legacy_time = time_engine(legacy_process_race, fixture)
+    vectorized, vectorized_time = time_engine(process_race, fixture)
+
+    # Both engines must produce the same rows in the same order
+    pd.testing.assert_frame_equal(legacy.astype({'PositionsGained': float}), vectorized, check_exact=True)
+
+    print(f"Synthetic fixture: {n_races} races, {len(vectorized)} tire records")
+    print(f"Per-lap loop:  {legacy_time:.3f}s")
+    print(f"Vectorized:    {vectorized_time:.3f}s")
+    print(f"Speedup:       {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+import contextlib
+import io
+import tempfile
+import time
+
+import numpy as np
+
+from src.data.collect_data import collect_data
+from src.data.degradation_fit import fit_stint_degradation, fuel_corrected_lap_times
+from src.data.tire_store import load_tire_matrix
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Batched fuel-corrected stint fits against one np.polyfit per stint, on synthetic seasons
+
+
+def per_stint_polyfit(tire_matrix, degree=1):
+    frame = tire_matrix.assign(Corrected=fuel_corrected_lap_times(tire_matrix),
+                               Age=tire_matrix['StintLapNumber'].astype(float) - 1)
+    stints = frame.groupby(['Year', 'Race', 'Driver', 'Stint'], observed=True, sort=False)
+    return stints[['Age', 'Corrected']].apply(lambda stint: np.polyfit(stint['Age'], stint['Corrected'], degree))
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024)):
+    with tempfile.TemporaryDirectory() as store, contextlib.redirect_stdout(io.StringIO()):
+        collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races, store=store)
+        tire_matrix = load_tire_matrix(store)
+
+    start = time.perf_counter()
+    fit = fit_stint_degradation(tire_matrix)
+    batched_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = per_stint_polyfit(tire_matrix)
+    loop_time = time.perf_counter() - start
+
+    keys = [tire_matrix[key] for key in ('Year', 'Race', 'Driver', 'Stint')]
+    stints = fit.groupby(keys, observed=True, sort=False).first()
+    expected = np.stack(expected.to_numpy())
+    slope_error = np.abs(stints['DegSlope'].to_numpy() - expected[:, 0]).max()
+    intercept_error = np.abs(stints['DegIntercept'].to_numpy() - expected[:, 1]).max()
+    # Normal equations lose a few digits on ~90 s intercepts, far below lap timing resolution
+    assert slope_error < 1e-5 and intercept_error < 1e-4
+
+    print(f"{len(stints)} stints, {len(tire_matrix)} laps")
+    print(f"{'batched least squares':24}{batched_time:8.3f}s")
+    print(f"{'np.polyfit per stint':24}{loop_time:8.3f}s  ({loop_time / batched_time:.0f}x)")
+    print(f"max difference: slope {slope_error:.1e} ms/lap, intercept {intercept_error:.1e} ms")
+    print(stints[['DegSlope', 'DegIntercept']].describe().round(1).to_string())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.collect_data import collect_data
+from src.data.feature_store import cached_features, entry_size, evict
+from src.data.prepare_features import prepare_features, tire_matrix_columns
+from src.data.tire_store import load_tire_matrix
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Feature store on five synthetic seasons: recomputing prepare_features from the store
+# against a miss (compute and write) and a hit (memory-mapped load), the memory each
+# allocates, loading a few columns only, invalidation when a race is added, and eviction
+
+
+def timed(func, repeat=3):
+    # Best wall time and peak traced memory (MiB) of func, and its last result
+    times, peak = [], 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] / 2 ** 20)
+        tracemalloc.stop()
+    return min(times), peak, result
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024)):
+    years = list(years)
+    with tempfile.TemporaryDirectory() as tmp:
+        store, root = f"{tmp}/store", f"{tmp}/features"
+
+        def collect(races_per_season):
+            with contextlib.redirect_stdout(io.StringIO()):
+                collect_data(years, session_loader=load_synthetic_race, store=store,
+                             race_lister=lambda year: get_synthetic_races(year, races_per_season))
+
+        collect(21)
+        expected = prepare_features(load_tire_matrix(store, years, columns=tire_matrix_columns))
+
+        def miss():
+            evict(root, max_mb=0)
+            return cached_features(store, years, root=root)
+
+        results = {
+            'prepare_features': timed(lambda: prepare_features(load_tire_matrix(store, years,
+                                                                                columns=tire_matrix_columns))),
+            'feature store miss': timed(miss),
+            'feature store hit': timed(lambda: cached_features(store, years, root=root)),
+            'hit, 3 columns': timed(lambda: cached_features(store, years, root=root,
+                                                            columns=['SmoothedDeg_mean', 'LapTime_min',
+                                                                     'RacePoints'])),
+        }
+        modeling_data = results['feature store hit'][2]
+        pd.testing.assert_frame_equal(expected, modeling_data, check_exact=True)
+        numeric = [col for col in modeling_data.columns if modeling_data[col].dtype.kind == 'f']
+        assert not any(modeling_data[col].to_numpy().flags.writeable for col in numeric)
+
+        print(f"{len(years)} seasons, {len(modeling_data)} feature rows, {len(modeling_data.columns)} columns")
+        print(f"{'':24}{'time (s)':>10}{'peak (MiB)':>12}")
+        for name, (seconds, peak, _) in results.items():
+            print(f"{name:24}{seconds:10.3f}{peak:12.1f}")
+        print(f"{len(numeric)} float columns loaded zero-copy from the memory-mapped entry")
+
+        # A new race changes the partitions hashed, so the next call computes a new entry
+        collect(22)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            grown = cached_features(store, years, root=root)
+        assert len(grown) > len(modeling_data) and 'computed' in output.getvalue()
+        sizes = {entry.name: entry_size(entry) for entry in Path(root).iterdir()}
+        print(f"after adding a race per season: {len(sizes)} entries, "
+              f"{np.mean(list(sizes.values())) / 2 ** 20:.1f} MiB each")
+
+        # The older entry goes once the cache is limited to about one entry
+        removed = evict(root, max_mb=max(sizes.values()) * 1.5 / 2 ** 20)
+        print(f"evicted {len(removed)} least recently used entry, {len(list(Path(root).iterdir()))} left")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import time
+
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from src.analysis.incremental import IncrementalModels, compare_with_full_retrain
+from src.analysis.train_model import model_predictors
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Incremental updates against full retraining on six synthetic seasons, races arriving a
+# few at a time through 2020-2024 with 2025 held out: the cost of each update against
+# retraining both models on every race so far, and the test metrics of both (the drift)
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024, 2025), target='StintLength', races_per_update=7):
+    with contextlib.redirect_stdout(io.StringIO()):
+        modeling_data = prepare_features(collect_data(list(years), session_loader=load_synthetic_race,
+                                                      race_lister=get_synthetic_races))
+    predictors = model_predictors(modeling_data)
+    test = modeling_data[modeling_data['Year'] == years[-1]]
+    arrivals = [(year, race) for year in years[:-1] for race, _ in get_synthetic_races(year)]
+
+    race_keys = list(zip(modeling_data['Year'].astype(int), modeling_data['Race'].astype(str)))
+    models = IncrementalModels(predictors, target)
+    arrived = set()
+    print(f"{len(arrivals)} races arriving {races_per_update} at a time, {len(test)} test rows, target {target}")
+    print(f"{'races':>6}{'rows':>7}{'trees':>7}{'update (s)':>12}{'retrain (s)':>13}"
+          f"{'Ridge R² inc/full':>20}{'Forest R² inc/full':>21}")
+    update_total = retrain_total = 0
+    for i in range(0, len(arrivals), races_per_update):
+        arrived |= set(arrivals[i:i + races_per_update])
+        seen = modeling_data[[key in arrived for key in race_keys]]
+
+        start = time.perf_counter()
+        models.update(seen)
+        update_seconds = time.perf_counter() - start
+        record = compare_with_full_retrain(models, seen, test)
+        update_total += update_seconds
+        retrain_total += record['retrain_seconds']
+        print(f"{len(models.seen_races):6}{models.n:7}{len(models.trees):7}{update_seconds:12.3f}"
+              f"{record['retrain_seconds']:13.3f}"
+              f"{record['Ridge R2 incremental']:11.3f}/{record['Ridge R2 full']:.3f}"
+              f"{record['Random Forest R2 incremental']:15.3f}/{record['Random Forest R2 full']:.3f}")
+
+    # Ridge from the merged moments is the full retrain, up to rounding
+    X, y = models.rows(seen)[:, :-1], seen[target].to_numpy(np.float64)
+    scaler = StandardScaler().fit(X)
+    full_ridge = Ridge(alpha=models.alpha).fit(scaler.transform(X), y)
+    assert np.allclose(models.scaler().mean_, scaler.mean_) and np.allclose(models.scaler().scale_, scaler.scale_)
+    assert np.allclose(models.ridge().coef_, full_ridge.coef_) and np.isclose(models.ridge().intercept_,
+                                                                             full_ridge.intercept_)
+    print(f"total: {update_total:.2f}s of updates against {retrain_total:.2f}s of full retrains; "
+          f"Ridge coefficients match the full retrain")
+
+
+if __name__ == "__main__":
+    run()
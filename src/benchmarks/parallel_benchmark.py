@@ -0,0 +1,33 @@
+import os
+import time
+
+from src.data.collect_data import collect_data
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def races_with_cancellation(year):
+    # A race whose session fails to load is reported without stopping the run (see
+    # tests/test_parallel_collection.py for the equivalence with sequential collection)
+    return get_synthetic_races(year) + [("Cancelled Grand Prix", "Nowhere")]
+
+
+def time_collection(years, n_workers):
+    start = time.perf_counter()
+    tire_matrix = collect_data(years, n_workers=n_workers, session_loader=load_synthetic_race,
+                               race_lister=races_with_cancellation)
+    return tire_matrix, time.perf_counter() - start
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024), n_workers=None):
+    n_workers = n_workers or os.cpu_count()
+
+    sequential, sequential_time = time_collection(years, 1)
+    parallel, parallel_time = time_collection(years, n_workers)
+
+    print(f"{len(years)} synthetic seasons, {len(sequential)} tire records")
+    print(f"Sequential:            {sequential_time:.2f}s")
+    print(f"Parallel ({n_workers} workers): {parallel_time:.2f}s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,78 @@
+import contextlib
+import copy
+import io
+import threading
+import time
+import weakref
+
+from src.data.collect_data import collect_data
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Session prefetching against strictly alternating load and process, offline. The stub
+# loader hands out pre-generated synthetic sessions after sleeping for a fixed delay,
+# standing in for FastF1's download and parse time, and counts how many sessions are alive
+# at once, the peak reported against the bound set by the prefetch queue. Equivalence with
+# sequential collection and that bound are checked in tests/test_prefetch.py
+
+races_per_season = 10
+
+
+class DelayedLoader:
+
+    def __init__(self, sessions, delay):
+        self.sessions = sessions
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.live = 0
+        self.peak_live = 0
+
+    def __call__(self, year, grand_prix, session_name):
+        time.sleep(self.delay)
+        session = copy.copy(self.sessions[(year, grand_prix)])
+        with self.lock:
+            self.live += 1
+            self.peak_live = max(self.peak_live, self.live)
+        weakref.finalize(session, self.release)
+        return session
+
+    def release(self):
+        with self.lock:
+            self.live -= 1
+
+
+def time_collection(years, sessions, delay, prefetch, repeat=3):
+    # Best wall time of repeat runs
+    times = []
+    for _ in range(repeat):
+        loader = DelayedLoader(sessions, delay)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tire_matrix = collect_data(list(years), session_loader=loader, prefetch=prefetch,
+                                       race_lister=lambda year: get_synthetic_races(year, races_per_season))
+        times.append(time.perf_counter() - start)
+    return tire_matrix, min(times), loader.peak_live
+
+
+def run(years=(2023, 2024), delays=(0.02, 0.05, 0.15), depths=(1, 2, 4)):
+    sessions = {(year, race[0]): load_synthetic_race(year, race[0], 'R')
+                for year in years for race in get_synthetic_races(year, races_per_season)}
+    _, process_time, _ = time_collection(years, sessions, 0, 0)
+    n = len(sessions)
+    process_time /= n
+    print(f"{n} races, collected in {process_time * 1000:.0f} ms per race without load delay")
+
+    # Ideal wall times: loads and processing strictly in turn, or fully overlapped but for
+    # the first load
+    print(f"\n{'load delay':>10}{'prefetch':>10}{'wall (s)':>10}{'ideal (s)':>11}{'speedup':>9}{'peak sessions':>15}")
+    for delay in delays:
+        _, serial_time, serial_peak = time_collection(years, sessions, delay, 0)
+        ideal = n * (delay + process_time)
+        print(f"{delay * 1000:8.0f}ms{'off':>10}{serial_time:10.2f}{ideal:11.2f}{1:9.2f}{serial_peak:15}")
+        for depth in depths:
+            _, elapsed, peak = time_collection(years, sessions, delay, depth)
+            ideal = n * max(delay, process_time) + min(delay, process_time)
+            print(f"{'':10}{depth:10}{elapsed:10.2f}{ideal:11.2f}{serial_time / elapsed:9.2f}{peak:15}")
+
+
+if __name__ == "__main__":
+    run()
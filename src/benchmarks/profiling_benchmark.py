@@ -0,0 +1,71 @@
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.analysis.rank_drivers import analyze_best_driver
+from src.data.collect_data import populate_tire_matrix
+from src.data.prepare_features import prepare_features
+from src.utils.profiling import Profiler
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Cost of the stage instrumentation: the same collect -> features -> ranking run with no
+# profiler (the markers only check for one), with a profiler timing stages only, and with
+# tracemalloc tracing the peak memory of each stage. Sessions are generated up front so
+# only processing is timed
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(years=(2023, 2024), repeat=3):
+    sessions = {(year, race[0]): load_synthetic_race(year, race[0], 'R')
+                for year in years for race in get_synthetic_races(year)}
+
+    def preloaded(year, grand_prix, session):
+        return sessions[(year, grand_prix)]
+
+    def pipeline():
+        tire_matrix = pd.concat([populate_tire_matrix(year, get_synthetic_races(year), pd.DataFrame(), n_workers=1,
+                                                      session_loader=preloaded) for year in years],
+                                ignore_index=True)
+        prepare_features(tire_matrix)
+        analyze_best_driver(tire_matrix)
+
+    def profiled_pipeline(memory):
+        def run_pipeline():
+            with Profiler(memory=memory) as profiler:
+                pipeline()
+            return profiler
+        return run_pipeline
+
+    plain = best_of(pipeline, repeat)
+    timed = best_of(profiled_pipeline(False), repeat)
+    traced = best_of(profiled_pipeline(True), repeat)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler = profiled_pipeline(True)()
+    with tempfile.TemporaryDirectory() as tmp:
+        report = profiler.write(Path(tmp) / 'profile.json')
+        assert report.stat().st_size > 0
+
+    print(f"{len(sessions)} races, {len(profiler.records)} stage records per run")
+    print(f"{'no profiler':28}{plain:8.2f}s")
+    print(f"{'profiler, timing only':28}{timed:8.2f}s  ({timed / plain - 1:+.1%})")
+    print(f"{'profiler with tracemalloc':28}{traced:8.2f}s  ({traced / plain - 1:+.1%})")
+    print()
+    print(pd.DataFrame(profiler.summary()).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    run()
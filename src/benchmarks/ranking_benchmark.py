@@ -0,0 +1,79 @@
+import contextlib
+import io
+import tempfile
+import time
+
+import pandas as pd
+
+from src.analysis.rank_drivers import analyze_best_driver, rank_drivers, score_drivers
+from src.data.collect_data import collect_data
+from src.data.race_summary import driver_race_summary, update_driver_race_summary
+from src.data.tire_store import load_driver_race_summary, load_tire_matrix
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+# Driver ranking from the per-race summary against the per-lap aggregation it replaced, on
+# five synthetic seasons. Equivalence is checked in tests/test_rankings.py
+
+
+def legacy_analyze_best_driver(tire_matrix, weighted=True):
+    # analyze_best_driver before the summary table: the same scoring over a per-lap aggregation
+    results = tire_matrix.drop_duplicates(subset=['Driver', 'Race'])
+    total_points = results.groupby('Driver', observed=True)['RacePoints'].sum().reset_index()
+    finish_position = results.groupby('Driver', observed=True)['FinishPosition'].mean().reset_index()
+    starting_position = results.groupby('Driver', observed=True)['StartingPosition'].mean().reset_index()
+
+    driver_stats = tire_matrix.groupby('Driver', observed=True).agg({
+        'SmoothedDeg': 'mean',
+        'DegradationPct': 'mean',
+        'Stint': 'count'
+    }).reset_index()
+    races = tire_matrix.groupby('Driver', observed=True)['Race'].nunique().reset_index()
+    races.rename(columns={'Race': 'RacesParticipated'}, inplace=True)
+
+    driver_stats = pd.merge(driver_stats, races, on='Driver')
+    driver_stats = pd.merge(driver_stats, total_points, on='Driver')
+    driver_stats = pd.merge(driver_stats, finish_position, on='Driver')
+    driver_stats = pd.merge(driver_stats, starting_position, on='Driver')
+    return score_drivers(driver_stats, weighted)
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024)):
+    with tempfile.TemporaryDirectory() as store, contextlib.redirect_stdout(io.StringIO()):
+        # All but the last race first, then the last race arrives as an incremental update
+        collect_data(list(years), session_loader=load_synthetic_race, race_lister=lambda year: (
+            get_synthetic_races(year)[:-1] if year == years[-1] else get_synthetic_races(year)), store=store)
+        collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races, store=store)
+
+        tire_matrix = load_tire_matrix(store, list(years))
+        stored_summary = load_driver_race_summary(store, list(years))
+
+    legacy_time, _ = best_of(lambda: legacy_analyze_best_driver(tire_matrix))
+    full_time, _ = best_of(lambda: analyze_best_driver(tire_matrix))
+    summary_time, _ = best_of(lambda: rank_drivers(stored_summary))
+
+    # Adding one race: update the summary with its laps instead of rebuilding from every lap
+    last_race = tire_matrix[(tire_matrix['Year'] == years[-1]) & (tire_matrix['Race'] == tire_matrix['Race'].iloc[-1])]
+    previous = stored_summary[(stored_summary['Year'] != years[-1])
+                              | (stored_summary['Race'] != last_race['Race'].iloc[0])]
+    update_time, _ = best_of(lambda: rank_drivers(update_driver_race_summary(previous, last_race)))
+    build_time, _ = best_of(lambda: driver_race_summary(tire_matrix))
+
+    print(f"{len(years)} synthetic seasons, {len(tire_matrix)} laps, {len(stored_summary)} driver races")
+    print(f"Legacy analyze_best_driver:          {legacy_time * 1000:7.1f} ms")
+    print(f"analyze_best_driver via summary:     {full_time * 1000:7.1f} ms")
+    print(f"rank_drivers on the stored summary:  {summary_time * 1000:7.1f} ms")
+    print(f"Build summary from every lap:        {build_time * 1000:7.1f} ms")
+    print(f"Add one race and re-rank:            {update_time * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
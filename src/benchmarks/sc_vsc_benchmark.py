@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.helpers import extract_sc_vsc_periods, extract_sc_vsc_intervals, neutralised_lap_mask
+from src.utils.synthetic import make_session, make_track_status
+
+
+def legacy_neutralised_lap_mask(laps, sc_vsc_periods):
+    # Per-lap linear scan over every period, as done inside is_valid_lap (also the reference
+    # for tests/test_sc_vsc.py)
+    overlaps = []
+    for index in laps.index:
+        lap_start_time = laps.loc[index, 'LapStartTime']
+        lap_end_time = laps.loc[index, 'Time']
+        overlaps.append(any(not ((lap_end_time < start) or (lap_start_time > end))
+                            for start, end in sc_vsc_periods))
+    return pd.Series(overlaps, index=laps.index, dtype=bool)
+
+
+def run(n_periods=40):
+    rng = np.random.default_rng(1)
+    laps = make_session(seed=1, n_drivers=20, n_laps=70).laps
+    track_status = make_track_status(rng, laps['LapStartTime'].min(), laps['Time'].max(), n_periods)
+
+    start = time.perf_counter()
+    periods = extract_sc_vsc_periods(track_status)
+    legacy_neutralised_lap_mask(laps, periods)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    intervals = extract_sc_vsc_intervals(track_status)
+    neutralised_lap_mask(laps, intervals)
+    indexed_time = time.perf_counter() - start
+
+    print(f"{len(laps)} laps, {len(periods)} SC/VSC periods")
+    print(f"Per-lap period scan: {legacy_time * 1000:.1f}ms")
+    print(f"Interval search:     {indexed_time * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    run()
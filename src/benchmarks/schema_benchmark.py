@@ -0,0 +1,41 @@
+import time
+
+from src.analysis.rank_drivers import analyze_best_driver
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.data.schema import apply_schema, TIRE_MATRIX_SCHEMA
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def best_of(func, tire_matrix, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(tire_matrix)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024)):
+    compact = collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races)
+
+    # What a bare read of tire_metrics.csv produces: object strings, int64 and float64
+    wide = compact.astype({col: 'object' if dtype == 'category' else 'float64' if dtype[0] in 'fI' else 'int64'
+                           for col, dtype in TIRE_MATRIX_SCHEMA.items()})
+    assert apply_schema(wide).equals(compact)
+
+    print(f"{len(years)} synthetic seasons, {len(compact)} tire records")
+    print(f"{'':26}{'wide':>10}{'compact':>10}")
+
+    wide_mem, compact_mem = (df.memory_usage(deep=True).sum() / 2 ** 20 for df in (wide, compact))
+    print(f"{'Memory (MiB)':26}{wide_mem:10.2f}{compact_mem:10.2f}")
+
+    for name, func in [('groupby D/R/C (ms)', lambda df: df.groupby(['Driver', 'Race', 'Compound'], observed=True)
+                        .agg({'SmoothedDeg': ['mean', 'max', 'std'], 'LapTime': ['mean', 'std', 'min']})),
+                       ('prepare_features (ms)', prepare_features),
+                       ('analyze_best_driver (ms)', analyze_best_driver)]:
+        print(f"{name:26}{best_of(func, wide) * 1000:10.1f}{best_of(func, compact) * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    run()
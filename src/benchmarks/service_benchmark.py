@@ -0,0 +1,118 @@
+import asyncio
+import contextlib
+import io
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from src.data.collect_data import collect_data
+from src.service.queries import QueryService
+from src.service.server import start_server
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Query service on two synthetic seasons: the cost of answering from scratch (what rerunning
+# main.py amounts to), in-process query latency with and without the cache, HTTP latency and
+# throughput for concurrent keep-alive clients, and invalidation when a race is added.
+# Clients and server share one event loop (and here one core), so throughput is a lower bound
+
+
+def query_pool(drivers, years):
+    # Dashboard-like mix of distinct queries
+    targets = [f"/degradation-curve?driver={driver}&compound={compound}&year={year}"
+               for driver in drivers for compound in ('SOFT', 'MEDIUM', 'HARD') for year in years]
+    targets += [f"/driver-stats?driver={driver}" for driver in drivers]
+    targets += [f"/top-drivers?n=10&PointsPerRace={weight}&FinishPosition={1 - weight}"
+                for weight in (0.2, 0.4, 0.6, 0.8)]
+    return targets
+
+
+async def client(host, port, targets, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for target in targets:
+        start = time.perf_counter()
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        length = 0
+        while (line := await reader.readline()) != b'\r\n':
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load_test(service, targets, n_clients, requests_per_client):
+    server = await start_server(service, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    rng = random.Random(0)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client('127.0.0.1', port, rng.choices(targets, k=requests_per_client), latencies)
+                           for _ in range(n_clients)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return np.array(latencies) * 1000, len(latencies) / elapsed
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def run(years=(2023, 2024), n_requests=2000):
+    with tempfile.TemporaryDirectory() as store:
+        def collect(races_per_season):
+            with contextlib.redirect_stdout(io.StringIO()):
+                collect_data(list(years), session_loader=load_synthetic_race, store=store,
+                             race_lister=lambda year: get_synthetic_races(year, races_per_season))
+
+        collect(21)
+        start = time.perf_counter()
+        service = QueryService(store, cache_size=256, check_interval=0)
+        print(f"load, index and prepare features (a main.py rerun's data work): "
+              f"{time.perf_counter() - start:.2f}s")
+
+        # In-process API, cold (cache emptied before each call) and cached
+        print(f"\n{'in-process query':28}{'cold (ms)':>10}{'cached (ms)':>12}")
+        calls = {
+            'degradation_curve': lambda: service.degradation_curve(driver='D03', compound='SOFT', year=years[-1]),
+            'driver_stats': lambda: service.driver_stats('D03'),
+            'top_drivers (custom)': lambda: service.top_drivers(10, weights={'PointsPerRace': 0.7,
+                                                                            'FinishPosition': 0.3}),
+        }
+        for name, call in calls.items():
+            cold = best_of(lambda: (service.cache.clear(), call()))
+            cached = best_of(call)
+            print(f"{name:28}{cold:10.3f}{cached:12.4f}")
+
+        # HTTP under concurrent load, without a cache (every request computed) and with one
+        targets = query_pool([f"D{i:02d}" for i in range(20)], years)
+        print(f"\n{len(targets)} distinct queries, {n_requests} requests per run")
+        print(f"{'HTTP':24}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for cache_size in (0, 256):
+            service.cache.maxsize = cache_size
+            for n_clients in (1, 8, 32):
+                service.cache.clear()
+                latencies, throughput = asyncio.run(load_test(service, targets, n_clients, n_requests // n_clients))
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                label = 'no cache' if cache_size == 0 else f'LRU cache ({cache_size})'
+                print(f"{label:24}{n_clients:8}{throughput:9.0f}{p50:9.2f}{p95:9.2f}{p99:9.2f}")
+
+        # A race written to the store changes the data version: the cache is emptied and
+        # the next answer includes the new race
+        before = service.driver_stats('D03')['races']
+        collect(22)
+        after = service.driver_stats('D03')['races']
+        assert after == before + len(years) and service.cache.stats()['size'] == 1
+        print(f"\ninvalidation: D03 races {before} -> {after} after adding a race per season")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,103 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data.collect_data import process_race
+from src.data.session_cache import SessionCache, extract_path, extract_session, session_columns
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Per-race session load time with and without the slim session-extract cache. Offline, a
+# synthetic session with its car data built stands in for a full FastF1 load and one
+# without for the slim load. With --fastf1 the same comparison runs on real races
+# (network or a populated FastF1 cache needed):
+#
+#   python -m src.benchmarks.session_cache_benchmark
+#   python -m src.benchmarks.session_cache_benchmark --fastf1 2023 --races 3
+
+
+def load_synthetic_full(year, grand_prix, session_name):
+    session = load_synthetic_race(year, grand_prix, session_name)
+    session.car_data  # built on first access
+    return session
+
+
+def time_loads(loader, races):
+    # Seconds per race for loading every race once
+    times = []
+    for year, race_name in races:
+        start = time.perf_counter()
+        loader(year, race_name, 'R')
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def compare(races, full_loader, slim_loader):
+    with tempfile.TemporaryDirectory() as root:
+        cache = SessionCache(root, slim_loader)
+        results = {
+            'full session': time_loads(full_loader, races),
+            'slim session': time_loads(slim_loader, races),
+            'slim + write extract': time_loads(cache, races),
+            'extract from cache': time_loads(cache, races),
+        }
+        size = sum(path.stat().st_size for path in extract_path(root, *races[0], 'R').iterdir())
+
+        # Records built from an extract match those built from the full session
+        for year, race_name in races:
+            pd.testing.assert_frame_equal(process_race(full_loader(year, race_name, 'R'), race_name, year),
+                                          process_race(cache(year, race_name, 'R'), race_name, year),
+                                          check_exact=True)
+
+    print(f"{len(races)} races, extract of {races[0][1]}: {size / 2 ** 10:.0f} KiB")
+    print(f"{'per race':24}{'mean (ms)':>11}{'max (ms)':>10}")
+    for name, times in results.items():
+        print(f"{name:24}{times.mean() * 1000:11.1f}{times.max() * 1000:10.1f}")
+    full, cached = results['full session'].mean(), results['extract from cache'].mean()
+    print(f"cached extract vs full session: {full / cached:.0f}x faster")
+    return results
+
+
+def compare_formats(races):
+    # Reading the extract's frames as Feather (stored) and as Parquet, per race
+    extracts = [extract_session(load_synthetic_race(year, race_name, 'R')) for year, race_name in races]
+    with tempfile.TemporaryDirectory() as root:
+        times = {}
+        for suffix, write, read in [('feather', 'to_feather', pd.read_feather),
+                                    ('parquet', 'to_parquet', pd.read_parquet)]:
+            paths = []
+            for i, extract in enumerate(extracts):
+                for name in session_columns:
+                    path = f"{root}/{i}_{name}.{suffix}"
+                    getattr(getattr(extract, name), write)(path)
+                    paths.append(path)
+            start = time.perf_counter()
+            for path in paths:
+                read(path)
+            times[suffix] = (time.perf_counter() - start) / len(extracts)
+    print(f"extract read per race: feather {times['feather'] * 1000:.1f} ms, parquet {times['parquet'] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session load time with and without the slim extract cache")
+    parser.add_argument('--fastf1', type=int, metavar='YEAR', help="time real FastF1 races of this season")
+    parser.add_argument('--races', type=int, default=3, help="races to time")
+    args = parser.parse_args()
+
+    if args.fastf1:
+        from src.utils.helpers import enable_cache, get_races, load_race, load_race_slim
+        enable_cache()
+        races = [(args.fastf1, race[0]) for race in get_races(args.fastf1)[:args.races]]
+        # Warm FastF1's own cache first, so the comparison is of deserializing, not downloading
+        time_loads(load_race, races)
+        compare(races, load_race, load_race_slim)
+    else:
+        races = [(year, race[0]) for year in (2023, 2024) for race in get_synthetic_races(year, args.races * 4)]
+        compare(races, load_synthetic_full, load_synthetic_race)
+        compare_formats(races)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import tempfile
+import time
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from src.data.collect_data import collect_data
+from src.data.stint_index import open_stint_index, update_stint_index
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Stint curve index on five synthetic seasons: building it, updating it after a race is
+# added to every season, and k-NN query latency of similar_stints. Then the index's scan of
+# one compound's vectors against a KD-tree search over them, for the stints of five seasons
+# and for many more (jittered copies of the real vectors): the scan is faster at the few
+# thousand stints per compound that several seasons give, and the tree only overtakes it
+# at tens of thousands. Equivalence is checked in tests/test_stint_index.py
+
+
+def scan(matrix, norms, vector, k):
+    # The index's search: candidates ranked by |x|² - 2 x·v, the k nearest partitioned out
+    # and sorted by their distance
+    nearest = np.argpartition(norms - 2 * (matrix @ vector), k - 1)[:k]
+    return nearest[np.argsort(np.sqrt(((matrix[nearest] - vector) ** 2).sum(axis=1)))]
+
+
+def per_query_ms(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024), k=10, n_queries=500, scales=(1, 3, 10, 50), seed=0):
+    years = list(years)
+    with tempfile.TemporaryDirectory() as tmp:
+        store, root = f"{tmp}/store", f"{tmp}/stint_index"
+
+        def collect(races_per_season):
+            with contextlib.redirect_stdout(io.StringIO()):
+                collect_data(years, session_loader=load_synthetic_race, store=store,
+                             race_lister=lambda year: get_synthetic_races(year, races_per_season))
+
+        def timed_update():
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                races = update_stint_index(root, store, years)
+            return races, time.perf_counter() - start
+
+        collect(21)
+        built, build_seconds = timed_update()
+        collect(22)
+        added, update_seconds = timed_update()
+        unchanged, noop_seconds = timed_update()
+
+        start = time.perf_counter()
+        stint_index = open_stint_index(root)
+        open_seconds = time.perf_counter() - start
+        print(f"{len(stint_index)} stints of {built + added} races, vectors of {stint_index.vectors.shape[1]} values")
+        print(f"{'':32}{'races':>6}{'time (s)':>10}")
+        for name, races, seconds in [('build', built, build_seconds), ('update after adding 5 races', added,
+                                                                        update_seconds),
+                                     ('update, nothing new', unchanged, noop_seconds),
+                                     ('open', 0, open_seconds)]:
+            print(f"{name:32}{races:6}{seconds:10.3f}")
+
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(stint_index), size=n_queries, replace=False)
+        stints = stint_index.stints
+        keys = [tuple(stints.iloc[row][['Year', 'Race', 'Driver', 'Stint']]) for row in rows]
+        print(f"\n{n_queries} queries, k = {k}{'ms per query':>25}")
+        timings = {
+            'similar_stints, same compound': per_query_ms(lambda key: stint_index.similar_stints(*key, k), keys),
+            'similar_stints, any compound': per_query_ms(lambda key: stint_index.similar_stints(*key, k, None),
+                                                         keys),
+            'similar_stints, same race': per_query_ms(
+                lambda key: stint_index.similar_stints(*key, k, in_race=key[1]), keys),
+        }
+        for name, ms in timings.items():
+            print(f"{name:40}{ms:8.3f}")
+
+        _, medium, _ = stint_index.by_compound['MEDIUM']
+        print(f"\nsearch alone, MEDIUM stints{'':5}{'tree build (s)':>16}{'KD-tree (ms)':>14}{'scan (ms)':>11}")
+        for scale in scales:
+            many = medium if scale == 1 else np.concatenate(
+                [medium + rng.normal(0, 0.02, medium.shape) for _ in range(scale)])
+            start = time.perf_counter()
+            tree = KDTree(many)
+            build = time.perf_counter() - start
+            queries = range(0, len(many), max(len(many) // n_queries, 1))
+            tree_ms = per_query_ms(lambda row: tree.query(many[row:row + 1], k + 1), queries)
+            norms = (many ** 2).sum(axis=1)
+            scan_ms = per_query_ms(lambda row: scan(many, norms, many[row], k + 1), queries)
+            print(f"{len(many):32}{build:16.3f}{tree_ms:14.3f}{scan_ms:11.3f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features, prepare_features_streaming
+from src.data.tire_store import iter_tire_matrix, load_tire_matrix
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def max_scaled_error(expected, actual):
+    # Largest difference relative to the magnitude of its column
+    numeric = expected.select_dtypes('number').columns
+    a, b = expected[numeric].to_numpy(float), actual[numeric].to_numpy(float)
+    assert np.array_equal(np.isnan(a), np.isnan(b))
+    scale = np.nanmax(np.abs(a), axis=0)
+    return float(np.nanmax(np.abs(a - b) / np.where(scale > 0, scale, 1)))
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024)):
+    with tempfile.TemporaryDirectory() as store, contextlib.redirect_stdout(io.StringIO()):
+        collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races, store=store)
+
+        in_memory, memory_time, memory_peak = measure(lambda: prepare_features(load_tire_matrix(store)))
+        streamed, stream_time, stream_peak = measure(lambda: prepare_features_streaming(iter_tire_matrix(store)))
+
+    # Equivalence is checked in tests/test_streaming_features.py
+    print(f"{len(years)} synthetic seasons, {len(in_memory)} feature rows")
+    print(f"{'':30}{'seconds':>10}{'peak MiB':>10}")
+    print(f"{'prepare_features':30}{memory_time:10.2f}{memory_peak:10.2f}")
+    print(f"{'streaming':30}{stream_time:10.2f}{stream_peak:10.2f}")
+    print(f"Max scaled error: {max_scaled_error(in_memory, streamed):.2e}, DegradationPct_median exact: "
+          f"{np.array_equal(in_memory['DegradationPct_median'], streamed['DegradationPct_median'], equal_nan=True)}")
+
+
+if __name__ == "__main__":
+    run()
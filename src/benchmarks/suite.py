@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import sklearn
+
+from src.analysis.rank_drivers import analyze_best_driver
+from src.analysis.train_model import model_predictors, train_and_evaluate_model
+from src.data.collect_data import populate_tire_matrix
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Offline benchmark suite for the main pipeline stages on synthetic FastF1 sessions.
+# Results are written as JSON so runs can be compared for regressions:
+#
+#   python -m src.benchmarks.suite --output before.json
+#   python -m src.benchmarks.suite --output after.json --compare before.json
+
+
+def best_time(func, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def benchmark_scale(n_seasons, races_per_season, repeat):
+    years = list(range(2024 - n_seasons + 1, 2025))
+
+    # Sessions are generated up front so only processing is timed
+    sessions = {(year, race[0]): load_synthetic_race(year, race[0], 'R')
+                for year in years for race in get_synthetic_races(year, races_per_season)}
+
+    def preloaded(year, grand_prix, session):
+        return sessions[(year, grand_prix)]
+
+    def collect():
+        frames = [populate_tire_matrix(year, get_synthetic_races(year, races_per_season), pd.DataFrame(),
+                                       n_workers=1, session_loader=preloaded) for year in years]
+        return pd.concat(frames, ignore_index=True)
+
+    collect_time, tire_matrix = best_time(collect, repeat)
+    features_time, modeling_data = best_time(lambda: prepare_features(tire_matrix), repeat)
+
+    # Rankings only keep drivers with at least 20 races
+    ranking_time = None
+    if n_seasons * races_per_season >= 20:
+        ranking_time, _ = best_time(lambda: analyze_best_driver(tire_matrix), repeat)
+
+    # Train on every season but the last, or on the first half of the races for a single season
+    if n_seasons > 1:
+        train_data = modeling_data[modeling_data['Year'] < years[-1]]
+        test_data = modeling_data[modeling_data['Year'] == years[-1]]
+    else:
+        split = modeling_data['Race'].isin(modeling_data['Race'].unique()[:races_per_season // 2])
+        train_data, test_data = modeling_data[split], modeling_data[~split]
+    # The predictors main trains on
+    predictors = model_predictors(modeling_data)
+    training_time, _ = best_time(lambda: train_and_evaluate_model(
+        train_data, test_data, predictors, 'StintLength', report=False, cache_dir=None), repeat)
+
+    scale = f"{n_seasons}x{races_per_season}"
+    return [
+        {'stage': 'populate_tire_matrix', 'scale': scale, 'seconds': collect_time,
+         'rows_in': sum(len(s.laps) for s in sessions.values()), 'rows_out': len(tire_matrix)},
+        {'stage': 'prepare_features', 'scale': scale, 'seconds': features_time,
+         'rows_in': len(tire_matrix), 'rows_out': len(modeling_data)},
+        {'stage': 'analyze_best_driver', 'scale': scale, 'seconds': ranking_time,
+         'rows_in': len(tire_matrix), 'rows_out': None},
+        {'stage': 'train_and_evaluate_model', 'scale': scale, 'seconds': training_time,
+         'rows_in': len(train_data), 'rows_out': len(test_data)},
+    ]
+
+
+def run_suite(scales=((1, 22), (2, 22), (5, 22)), repeat=3):
+    results = []
+    for n_seasons, races_per_season in scales:
+        results += benchmark_scale(n_seasons, races_per_season, repeat)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(previous, current, threshold=0.1):
+    # Per stage and scale timing ratios; slower than previous by more than threshold is a regression
+    previous_times = {(r['stage'], r['scale']): r['seconds'] for r in previous['results']}
+    rows = []
+    for r in current['results']:
+        before = previous_times.get((r['stage'], r['scale']))
+        ratio = r['seconds'] / before if before and r['seconds'] else None
+        rows.append({'stage': r['stage'], 'scale': r['scale'], 'previous': before, 'current': r['seconds'],
+                     'ratio': ratio, 'regression': ratio is not None and ratio > 1 + threshold})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks on synthetic sessions")
+    parser.add_argument('--scales', nargs='+', default=['1x22', '2x22', '5x22'],
+                        help="seasons x races per season, e.g. 5x22")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="previous results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    scales = [tuple(int(n) for n in scale.split('x')) for scale in args.scales]
+    report = run_suite(scales, args.repeat)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(pd.DataFrame(report['results']).to_string(index=False))
+
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare(json.load(f), report, args.threshold)
+        print()
+        print(comparison.to_string(index=False))
+        if comparison['regression'].any():
+            print(f"\n{comparison['regression'].sum()} stage(s) slower by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features, tire_matrix_columns
+from src.data.telemetry_features import join_telemetry_features, race_telemetry_features, telemetry_features
+from src.data.telemetry_store import channel_path, collect_telemetry, lap_telemetry, open_telemetry, \
+    telemetry_channels
+from src.data.tire_store import load_tire_matrix
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Telemetry store on synthetic seasons: extraction time, size on disk, the peak memory of
+# computing the binned degradation features through the memory maps against reading every
+# channel into memory first, and the latency of reading back a single lap
+
+
+def in_memory_features(root, n_bins=30):
+    # The same per-stint features with all channels loaded up front
+    index, _ = open_telemetry(root)
+    channels = {name: np.fromfile(channel_path(root, name), dtype=dtype) for name, dtype in telemetry_channels.items()}
+    return pd.concat([race_telemetry_features(race_index, channels, n_bins)
+                      for _, race_index in index.groupby(['Year', 'Race'], observed=True, sort=False)])
+
+
+def traced(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def run(years=(2023, 2024), races_per_season=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        store, root = f'{tmp}/store', f'{tmp}/telemetry'
+        with contextlib.redirect_stdout(io.StringIO()):
+            collect_data(list(years), session_loader=load_synthetic_race, store=store,
+                         race_lister=lambda year: get_synthetic_races(year, races_per_season))
+            start = time.perf_counter()
+            collect_telemetry(list(years), store, root, session_loader=load_synthetic_race)
+            collect_time = time.perf_counter() - start
+
+        index, channels = open_telemetry(root)
+        size = sum(path.stat().st_size for path in Path(root).iterdir()) / 2 ** 20
+        print(f"{len(index)} laps, {len(channels['Speed'])} samples, {size:.1f} MiB on disk, "
+              f"extracted in {collect_time:.2f}s ({collect_time / len(years) / races_per_season:.2f}s per race)")
+
+        mapped_time, mapped_peak, features = traced(lambda: telemetry_features(root))
+        loaded_time, loaded_peak, _ = traced(lambda: in_memory_features(root))
+        print(f"{'features via memmap':26}{mapped_time:8.2f}s  peak {mapped_peak:6.1f} MiB")
+        print(f"{'features, all in memory':26}{loaded_time:8.2f}s  peak {loaded_peak:6.1f} MiB")
+
+        laps = index.sample(200, random_state=0)
+        start = time.perf_counter()
+        for lap in laps.itertuples():
+            lap_telemetry(root, lap.Year, lap.Race, lap.Driver, lap.LapNumber)
+        print(f"single lap read: {(time.perf_counter() - start) / len(laps) * 1000:.2f} ms")
+
+        modeling_data = join_telemetry_features(prepare_features(load_tire_matrix(store, columns=tire_matrix_columns)),
+                                                features)
+        print(f"{modeling_data['SpeedDeg_mean'].notna().mean():.1%} of feature rows have telemetry features")
+        print(modeling_data[['SmoothedDeg_mean', 'SpeedDeg_mean', 'SpeedDeg_corner', 'SpeedDeg_straight']]
+              .describe().round(3).to_string())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import StandardScaler
+
+from src.analysis.train_model import model_predictors, random_forest_params
+from src.analysis.tuning import forest_candidates, tune_random_forest
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Budgeted successive halving against the fixed forest and against fitting every candidate
+# to 100 trees (the same search without halving, warm starts or early stopping), on five
+# synthetic seasons: train 2020-2023, test 2024
+
+
+def fit_every_candidate(X, y, n_candidates, n_trees=100):
+    # Best candidate by OOB R² when all are fully grown
+    best = None
+    for params in forest_candidates(n_candidates, random_forest_params['random_state']):
+        forest = RandomForestRegressor(n_estimators=n_trees, oob_score=True,
+                                       random_state=random_forest_params['random_state'], **params).fit(X, y)
+        if best is None or forest.oob_score_ > best.oob_score_:
+            best = forest
+    return best
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024), targets=('StintLength', 'RacePoints'), n_candidates=27):
+    with contextlib.redirect_stdout(io.StringIO()):
+        modeling_data = prepare_features(collect_data(list(years), session_loader=load_synthetic_race,
+                                                      race_lister=get_synthetic_races))
+    predictors = model_predictors(modeling_data)
+    train = modeling_data[modeling_data['Year'] != years[-1]]
+    test = modeling_data[modeling_data['Year'] == years[-1]]
+    scaler = StandardScaler().fit(train[predictors])
+    X_train, X_test = scaler.transform(train[predictors]), scaler.transform(test[predictors])
+
+    searches = {
+        'fixed (100 trees)': lambda X, y: RandomForestRegressor(**random_forest_params).fit(X, y),
+        f'all {n_candidates} x 100 trees': lambda X, y: fit_every_candidate(X, y, n_candidates),
+        'halving, 1500 trees': lambda X, y: tune_random_forest(X, y, n_candidates, budget_trees=1500)[0],
+        'halving, 10s': lambda X, y: tune_random_forest(X, y, n_candidates, budget_seconds=10)[0],
+    }
+    if os.cpu_count() > 1:
+        searches[f'halving, 10s, {os.cpu_count()} workers'] = lambda X, y: tune_random_forest(
+            X, y, n_candidates, budget_seconds=10, n_workers=os.cpu_count())[0]
+
+    print(f"{len(train)} training rows, {len(test)} test rows, {n_candidates} candidates")
+    for target in targets:
+        y_train, y_test = train[target].to_numpy(np.float64), test[target].to_numpy(np.float64)
+        print(f"\n{target:36}{'time (s)':>9}{'trees':>7}{'train R²':>10}{'test R²':>9}  configuration")
+        for name, search in searches.items():
+            start = time.perf_counter()
+            forest = search(X_train, y_train)
+            seconds = time.perf_counter() - start
+            params = {key: forest.get_params()[key] for key in ('max_depth', 'min_samples_leaf', 'max_features')}
+            print(f"{name:36}{seconds:9.1f}{forest.n_estimators:7}{r2_score(y_train, forest.predict(X_train)):10.3f}"
+                  f"{r2_score(y_test, forest.predict(X_test)):9.3f}  {params}")
+
+
+if __name__ == "__main__":
+    run()
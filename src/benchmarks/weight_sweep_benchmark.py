@@ -0,0 +1,44 @@
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.rank_drivers import analyze_best_driver, ranking_weights, normalized_metrics
+from src.analysis.weight_sweep import random_weights, weight_sweep
+from src.data.collect_data import collect_data
+from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+
+
+def run(years=(2020, 2021, 2022, 2023, 2024), n_vectors=10_000, repeat=5):
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(list(years), session_loader=load_synthetic_race, race_lister=get_synthetic_races)
+    ranked_drivers = analyze_best_driver(tire_matrix)
+
+    # The config and equal weights reproduce analyze_best_driver's order
+    for weighted in (True, False):
+        expected = analyze_best_driver(tire_matrix, weighted)['Driver'].astype(str).tolist()
+        ranks, _ = weight_sweep(ranked_drivers, pd.DataFrame([ranking_weights(weighted)]))
+        assert ranks[0].sort_values().index.tolist() == expected
+
+    weights = random_weights(n_vectors)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ranks, stability = weight_sweep(ranked_drivers, weights)
+        times.append(time.perf_counter() - start)
+
+    # Spot-check a few vectors against the per-vector pandas scoring
+    for i in np.random.default_rng(1).choice(n_vectors, 5, replace=False):
+        scores = sum(ranked_drivers[metric] * weights.at[i, metric] for metric in normalized_metrics)
+        order = ranked_drivers.assign(CompositeScore=scores).sort_values('CompositeScore', ascending=False,
+                                                                         kind='stable')
+        assert ranks[i].sort_values(kind='stable').index.tolist() == order['Driver'].astype(str).tolist()
+
+    print(f"{len(ranked_drivers)} drivers, {n_vectors} weight vectors: {min(times) * 1000:.1f} ms")
+    print(stability.round(3).to_string())
+
+
+if __name__ == "__main__":
+    run()
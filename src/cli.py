@@ -0,0 +1,377 @@
+import argparse
+import ast
+import time
+
+import src.config as config
+
+# Command line entry point with one subcommand per pipeline stage:
+#
+#   python -m src.cli collect            # fetch new or stale races into the store
+#   python -m src.cli telemetry          # car telemetry of the stored laps (memory-mapped)
+#   python -m src.cli features           # tire matrix -> modeling features (Parquet)
+#   python -m src.cli train              # fit and evaluate the models
+#   python -m src.cli rank --top 20      # driver rankings from the store's race summary
+#   python -m src.cli plot --headless    # ranking (and optionally model) charts
+#   python -m src.cli stints             # update the stint curve index (and query it)
+#   python -m src.cli serve              # HTTP query service (see src/service/server.py)
+#
+# Settings from src/config.py can be overridden with the options below or with
+# --set name=value. Stage modules, and with them pandas, scikit-learn, matplotlib and
+# FastF1, are only imported inside the stage that needs them, and after the overrides
+# are applied so their config defaults pick them up
+
+
+def collect(args):
+    from pathlib import Path
+    from src.data.collect_data import collect_data, PROCESSING_VERSION
+    from src.data.tire_store import read_manifest, import_csv
+
+    # Partition a tire_metrics.csv from before the store existed
+    legacy_csv_path = Path('data/processed/tire_metrics.csv')
+    if not read_manifest(config.tire_store_path) and legacy_csv_path.exists():
+        import_csv(legacy_csv_path, config.tire_store_path, PROCESSING_VERSION)
+
+    if args.synthetic:
+        from src.utils.synthetic import load_synthetic_race, get_synthetic_races
+        loaders = {'session_loader': load_synthetic_race, 'race_lister': get_synthetic_races}
+    else:
+        from src.data.session_cache import race_loader
+        from src.utils.helpers import enable_cache
+        enable_cache()
+        loaders = {'session_loader': race_loader(config.session_cache_path)}
+
+    collect_data(config.years, n_workers=config.collection_workers, store=config.tire_store_path,
+                 prefetch=config.prefetch_sessions, **loaders)
+
+
+def telemetry(args):
+    from src.data.telemetry_store import collect_telemetry, compact_telemetry
+
+    loaders = {}
+    if args.synthetic:
+        from src.utils.synthetic import load_synthetic_race
+        loaders = {'session_loader': load_synthetic_race}
+    else:
+        from src.utils.helpers import enable_cache
+        enable_cache()
+
+    collect_telemetry(config.years, config.tire_store_path, config.telemetry_store_path,
+                      n_workers=config.collection_workers, **loaders)
+    if args.compact:
+        compact_telemetry(config.telemetry_store_path)
+
+
+def build_features(streaming=False):
+    if not streaming:
+        from src.data.feature_store import cached_features
+        return cached_features(config.tire_store_path, config.years, telemetry=config.collect_telemetry_data,
+                               root=config.feature_store_path, telemetry_path=config.telemetry_store_path,
+                               n_bins=config.telemetry_bins, max_mb=config.feature_store_max_mb,
+                               max_age_days=config.feature_store_max_age_days)
+
+    # Streamed features are not cached: streaming is for stores too large to build them in memory
+    from src.data.prepare_features import prepare_features_streaming, tire_matrix_columns
+    from src.data.tire_store import iter_tire_matrix
+
+    modeling_data = prepare_features_streaming(iter_tire_matrix(config.tire_store_path, config.years,
+                                                                tire_matrix_columns))
+    if config.collect_telemetry_data:
+        from src.data.telemetry_features import telemetry_features, join_telemetry_features
+        modeling_data = join_telemetry_features(modeling_data, telemetry_features(
+            config.telemetry_store_path, config.years, config.telemetry_bins))
+    return modeling_data
+
+
+def features_fingerprint():
+    # What the features are built from: the store partitions of config.years (and the
+    # telemetry store when its features are added), hashed as the feature store keys them
+    from src.data.feature_store import features_key, telemetry_fingerprint
+
+    return {'store': features_key(config.tire_store_path, config.years),
+            'telemetry': telemetry_fingerprint(config.telemetry_store_path, config.telemetry_bins)
+            if config.collect_telemetry_data else None}
+
+
+def fingerprint_path():
+    from pathlib import Path
+    return Path(config.features_path).with_suffix('.json')
+
+
+def features(args):
+    import json
+    from pathlib import Path
+
+    modeling_data = build_features(args.streaming)
+    Path(config.features_path).parent.mkdir(parents=True, exist_ok=True)
+    modeling_data.to_parquet(config.features_path, index=False)
+    with open(fingerprint_path(), 'w') as f:
+        json.dump(features_fingerprint(), f, indent=2)
+    print(f"{len(modeling_data)} feature rows written to {config.features_path}")
+
+
+def load_features():
+    # Features from the features stage when they were built from the store as it is now,
+    # otherwise built from the store
+    import json
+    from pathlib import Path
+    import pandas as pd
+
+    if Path(config.features_path).exists():
+        try:
+            with open(fingerprint_path()) as f:
+                current = json.load(f) == features_fingerprint()
+        except FileNotFoundError:
+            current = False
+        if current:
+            return pd.read_parquet(config.features_path)
+        print(f"{config.features_path} is out of date with the store, building features from the store")
+    return build_features()
+
+
+def train_models(targets, charts=None):
+    from src.analysis.train_model import train_and_evaluate_model, model_predictors
+
+    modeling_data = load_features()
+    train_data = modeling_data[modeling_data['Year'].isin(config.train_years)].copy()
+    test_data = modeling_data[modeling_data['Year'].isin(config.test_years)].copy()
+    predictors = model_predictors(modeling_data)
+
+    for target in targets:
+        if config.incremental_training:
+            from src.analysis.incremental import update_models
+            update_models(train_data, test_data, predictors, target)
+        else:
+            train_and_evaluate_model(train_data, test_data, predictors, target, cache_dir=config.model_cache_dir,
+                                     charts=charts)
+    return modeling_data, predictors
+
+
+def train(args):
+    # Scatter charts are left to the plot stage
+    modeling_data, predictors = train_models(args.targets, charts=[])
+
+    if config.run_backtest:
+        from src.analysis.backtest import rolling_origin_backtest
+        for target in args.targets:
+            print()
+            print(f"Rolling-origin backtest (target = {target}):")
+            print(rolling_origin_backtest(modeling_data, predictors, target, config.years,
+                                          config.backtest_workers).to_string())
+
+
+def load_rankings():
+    from src.analysis.rank_drivers import rank_drivers
+    from src.data.tire_store import load_driver_race_summary
+
+    race_summary = load_driver_race_summary(config.tire_store_path, config.years)
+    return race_summary, rank_drivers(race_summary, weighted=config.use_weights)
+
+
+def rank(args):
+    race_summary, driver_rankings = load_rankings()
+
+    print(f"Top {args.top} Drivers (Overall Performance):")
+    print(driver_rankings[['Driver', 'CompositeScore', 'PointsPerRace',
+                           'DegradationPct', 'AvgPositionsGained']].head(args.top))
+
+    if config.weight_sweep_vectors > 0:
+        from src.analysis.weight_sweep import random_weights, weight_sweep
+        _, stability = weight_sweep(driver_rankings, random_weights(config.weight_sweep_vectors),
+                                    config.weight_sweep_top_n)
+        print(f"\nRank stability across {config.weight_sweep_vectors} random weight vectors:")
+        print(stability.head(args.top).round(3).to_string())
+
+    if config.bootstrap_replicates > 0:
+        from src.analysis.bootstrap import bootstrap_rankings
+        intervals = bootstrap_rankings(race_summary, config.bootstrap_replicates, weighted=config.use_weights,
+                                       seed=config.bootstrap_seed, n_workers=config.bootstrap_workers)
+        print(f"\n95% bootstrap intervals ({config.bootstrap_replicates} resamples of each driver's races):")
+        print(intervals.head(args.top).round(3).to_string())
+
+
+def plot(args):
+    from src.analysis.charts import render_charts
+    from src.analysis.rank_drivers import driver_ranking_charts
+
+    charts = []
+    if args.models:
+        train_models(['StintLength', 'RacePoints'], charts=charts)
+
+    _, driver_rankings = load_rankings()
+    charts += (driver_ranking_charts(driver_rankings, top_n=args.top) +
+               driver_ranking_charts(driver_rankings, top_n=6, radar=True))
+
+    render_charts(charts, headless=config.headless_plots, n_workers=config.plot_workers, output_dir=args.output_dir)
+    print(f"{len(charts)} charts written to {args.output_dir}")
+
+
+def stints(args):
+    from src.data.stint_index import open_stint_index, update_stint_index
+
+    update_stint_index(config.stint_index_path, config.tire_store_path, config.years, config.stint_curve_points,
+                       config.stint_length_weight, config.stint_index_min_laps)
+    if args.driver is None:
+        return
+    stint_index = open_stint_index(config.stint_index_path)
+    if stint_index is None:
+        print("No stints indexed")
+        return
+    compound = args.compound.lower()
+    compound = None if compound == 'any' else 'same' if compound == 'same' else compound.upper()
+    start = time.perf_counter()
+    neighbours = stint_index.similar_stints(args.year, args.race, args.driver, args.stint, args.k, compound,
+                                            args.in_race)
+    print(f"Stints most similar to {args.driver}'s stint {args.stint} in {args.year} {args.race} "
+          f"({len(stint_index)} indexed, {(time.perf_counter() - start) * 1000:.1f} ms):")
+    print(neighbours.round(3).to_string(index=False))
+
+
+def serve(args):
+    from src.service.queries import QueryService
+    from src.service.server import serve as serve_queries
+
+    service = QueryService(config.tire_store_path, config.years, config.service_cache_size,
+                           stint_index_path=config.stint_index_path)
+    serve_queries(service, config.service_host, config.service_port)
+
+
+def parse_override(item):
+    name, _, value = item.partition('=')
+    if not hasattr(config, name) or name.startswith('_'):
+        raise argparse.ArgumentTypeError(f"unknown setting '{name}' in src/config.py")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description="F1Insights pipeline stages")
+    parser.add_argument('--years', type=int, nargs='+', help="seasons to use (config: years)")
+    parser.add_argument('--store', dest='tire_store_path', help="tire metrics store (config: tire_store_path)")
+    parser.add_argument('--features', dest='features_path', help="modeling features file (config: features_path)")
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help="override any setting in src/config.py, e.g. --set use_weights=False")
+    parser.add_argument('--timing', action='store_true',
+                        help="report the time from CLI start to the end of the stage")
+    parser.add_argument('--profile', dest='profile_report', metavar='PATH',
+                        help="write a per-stage profile report, .json or .csv (config: profile_report)")
+    parser.add_argument('--cprofile', dest='cprofile_stage', metavar='STAGE',
+                        help="also dump cProfile stats of this stage to cprofile_path (config: cprofile_stage)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    collect_parser = subparsers.add_parser('collect', help="collect new or stale races into the store")
+    collect_parser.add_argument('--workers', dest='collection_workers', type=int,
+                                help="worker processes (config: collection_workers)")
+    collect_parser.add_argument('--prefetch', dest='prefetch_sessions', type=int, metavar='K',
+                                help="with one worker, load up to K sessions ahead while processing "
+                                     "(config: prefetch_sessions)")
+    collect_parser.add_argument('--synthetic', action='store_true',
+                                help="generate synthetic sessions instead of loading them with FastF1")
+    collect_parser.set_defaults(stage=collect)
+
+    telemetry_parser = subparsers.add_parser('telemetry', help="extract car telemetry of the stored races")
+    telemetry_parser.add_argument('--workers', dest='collection_workers', type=int,
+                                  help="worker processes (config: collection_workers)")
+    telemetry_parser.add_argument('--synthetic', action='store_true',
+                                  help="generate synthetic sessions instead of loading them with FastF1")
+    telemetry_parser.add_argument('--compact', action='store_true',
+                                  help="drop samples of laps collected again from the channel files")
+    telemetry_parser.set_defaults(stage=telemetry)
+
+    features_parser = subparsers.add_parser('features', help="prepare modeling features from the store")
+    features_parser.add_argument('--streaming', action='store_true',
+                                 help="aggregate one store partition at a time to bound memory")
+    features_parser.add_argument('--telemetry', dest='collect_telemetry_data', action='store_const', const=True,
+                                 help="add telemetry degradation features (config: collect_telemetry_data)")
+    features_parser.set_defaults(stage=features)
+
+    train_parser = subparsers.add_parser('train', help="train and evaluate the models")
+    train_parser.add_argument('--targets', nargs='+', default=['StintLength', 'RacePoints'],
+                              choices=['StintLength', 'RacePoints'])
+    train_parser.add_argument('--train-years', dest='train_years', type=int, nargs='+')
+    train_parser.add_argument('--test-years', dest='test_years', type=int, nargs='+')
+    train_parser.add_argument('--tune', dest='tuning_budget_seconds', type=float, metavar='SECONDS',
+                              help="tune the models within this much time per target "
+                                   "(config: tuning_budget_seconds)")
+    train_parser.add_argument('--tune-trees', dest='tuning_budget_trees', type=int, metavar='N',
+                              help="tune within N trees grown per target (config: tuning_budget_trees)")
+    train_parser.add_argument('--tune-workers', dest='tuning_workers', type=int,
+                              help="processes growing candidate forests (config: tuning_workers)")
+    train_parser.add_argument('--incremental', dest='incremental_training', action='store_const', const=True,
+                              help="update the persisted models with races not seen yet instead of retraining "
+                                   "(config: incremental_training)")
+    train_parser.add_argument('--backtest', dest='run_backtest', action='store_const', const=True,
+                              help="also run a rolling-origin backtest (config: run_backtest)")
+    train_parser.set_defaults(stage=train)
+
+    rank_parser = subparsers.add_parser('rank', help="rank drivers")
+    rank_parser.add_argument('--top', type=int, default=20)
+    rank_parser.add_argument('--unweighted', dest='use_weights', action='store_const', const=False,
+                             help="weigh every metric equally (config: use_weights)")
+    rank_parser.add_argument('--sweep', dest='weight_sweep_vectors', type=int,
+                             help="rank stability across this many random weightings (config: weight_sweep_vectors)")
+    rank_parser.add_argument('--bootstrap', dest='bootstrap_replicates', type=int,
+                             help="bootstrap intervals from this many replicates (config: bootstrap_replicates)")
+    rank_parser.set_defaults(stage=rank)
+
+    plot_parser = subparsers.add_parser('plot', help="render ranking charts")
+    plot_parser.add_argument('--top', type=int, default=20)
+    plot_parser.add_argument('--models', action='store_true', help="also train the models and plot predictions")
+    plot_parser.add_argument('--headless', dest='headless_plots', action='store_const', const=True,
+                             help="save charts without displaying them (config: headless_plots)")
+    plot_parser.add_argument('--workers', dest='plot_workers', type=int, help="config: plot_workers")
+    plot_parser.add_argument('--output-dir', default='src/resources')
+    plot_parser.set_defaults(stage=plot)
+
+    stints_parser = subparsers.add_parser('stints', help="index stint degradation curves and find similar stints")
+    stints_parser.add_argument('--points', dest='stint_curve_points', type=int,
+                               help="points each stint curve is resampled to (config: stint_curve_points)")
+    stints_parser.add_argument('--driver', help="find the stints most similar to this driver's stint")
+    stints_parser.add_argument('--year', type=int)
+    stints_parser.add_argument('--race')
+    stints_parser.add_argument('--stint', type=int, default=1)
+    stints_parser.add_argument('-k', type=int, default=10, help="number of similar stints")
+    stints_parser.add_argument('--compound', default='same',
+                               help="compound of the similar stints: same (default), any or a compound")
+    stints_parser.add_argument('--in-race', dest='in_race', help="only stints of this race")
+    stints_parser.set_defaults(stage=stints)
+
+    serve_parser = subparsers.add_parser('serve', help="answer degradation and ranking queries over HTTP")
+    serve_parser.add_argument('--host', dest='service_host', help="config: service_host")
+    serve_parser.add_argument('--port', dest='service_port', type=int, help="config: service_port")
+    serve_parser.add_argument('--cache-size', dest='service_cache_size', type=int,
+                              help="query results kept in the LRU cache (config: service_cache_size)")
+    serve_parser.set_defaults(stage=serve)
+
+    return parser
+
+
+def apply_overrides(args):
+    # Options named after a config setting override it when given, then --set overrides apply
+    for name, value in vars(args).items():
+        if value is not None and name != 'overrides' and hasattr(config, name):
+            setattr(config, name, value)
+    for name, value in args.overrides:
+        setattr(config, name, value)
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'stints' and args.driver is not None and (args.year is None or args.race is None):
+        parser.error("stints --driver also needs --year and --race")
+    apply_overrides(args)
+
+    from src.utils.profiling import run_profiled
+    run_profiled(lambda: args.stage(args), config.profile_report, config.profile_memory, config.cprofile_stage,
+                 config.cprofile_path)
+
+    if args.timing:
+        print(f"\n{args.command}: {time.perf_counter() - start:.2f}s since the CLI started")
+
+
+if __name__ == "__main__":
+    main()
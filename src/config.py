@@ -1,15 +1,92 @@
 # Configuration settings
 
-# Set to True to collect new data, False to use existing data
+# Set to True to collect races missing from the tire metrics store (or processed by
+# older code), False to use existing data only
 collect_new_data = False
 
+# Partitioned tire metrics store (one Parquet file per race plus a manifest)
+tire_store_path = 'data/processed/tire_metrics'
+
+# Set to True to also extract car telemetry (speed, throttle, brake) of every stored lap into
+# the memory-mapped telemetry store, and add distance-binned degradation features (see
+# src/data/telemetry_features.py) to the modeling data, with each lap cut into telemetry_bins bins
+collect_telemetry_data = False
+telemetry_store_path = 'data/processed/telemetry'
+telemetry_bins = 30
+
+# Set to True to keep a nearest-neighbour index of stint degradation curves (see
+# src/data/stint_index.py) up to date with the store. Each stint with at least
+# stint_index_min_laps valid laps has its SmoothedDeg curve resampled to stint_curve_points
+# points, plus its length times stint_length_weight as one more coordinate
+build_stint_index = False
+stint_index_path = 'data/processed/stint_index'
+stint_curve_points = 20
+stint_length_weight = 0.05
+stint_index_min_laps = 5
+
+# Modeling features written by the CLI's features stage and read by its train stage, as
+# long as the store is unchanged since (a fingerprint of it is kept next to them, as .json)
+features_path = 'data/processed/modeling_data.parquet'
+
+# prepare_features output is cached here, keyed by a hash of the store partitions it was
+# built from (None disables the cache). Entries unused for feature_store_max_age_days are
+# evicted, then the least recently used ones while the cache exceeds feature_store_max_mb
+feature_store_path = 'data/processed/features'
+feature_store_max_mb = 512
+feature_store_max_age_days = 30
+
 # List of years to collect data for
 years = [2020, 2021, 2022, 2023, 2024]
 
+# Number of worker processes used to collect races (1 collects them sequentially)
+collection_workers = 1
+
+# Sessions loaded ahead by a background thread while the current race is processed, when
+# collecting with one worker (0 loads and processes races strictly in turn)
+prefetch_sessions = 0
+
+# Laps, results and track status of every loaded race are kept here, so later collections
+# skip the FastF1 session load (None always loads full sessions)
+session_cache_path = 'data/raw/sessions'
+
 # Split train/test data for ML algorithms
 train_years = [2020, 2021, 2022, 2023]
 test_years = [2024]
 
+# Fitted scalers and models are cached here, keyed by a hash of their inputs (None disables the cache)
+model_cache_dir = 'data/models'
+
+# Set tuning_budget_seconds and/or tuning_budget_trees to tune both models within that budget
+# (per target) instead of using the fixed hyperparameters (see src/analysis/tuning.py):
+# Ridge's alpha by cross-validation, and the Random Forest's depth, leaf size and feature
+# fraction by successive halving over tuning_candidates forests, grown across tuning_workers processes
+tuning_budget_seconds = None
+tuning_budget_trees = None
+tuning_candidates = 27
+tuning_workers = 1
+
+# Set to True to update persisted models with the rows of races added since the last run
+# instead of retraining on the whole history (see src/analysis/incremental.py). Ridge uses a
+# fixed incremental_ridge_alpha; each update adds incremental_trees_per_update trees fitted on
+# the new rows and a sample of up to incremental_reservoir_size earlier ones. With
+# incremental_drift_check, each update is also compared against a full retrain
+incremental_training = False
+incremental_model_dir = 'data/models/incremental'
+incremental_ridge_alpha = 1.0
+incremental_trees_per_update = 10
+incremental_max_trees = 200
+incremental_reservoir_size = 1000
+incremental_drift_check = True
+
+# Set to True to also run a rolling-origin backtest (train on years up to N, test on N + 1)
+run_backtest = False
+backtest_workers = 1
+
+# Set to True to render charts without displaying them (Agg backend), e.g. for unattended runs.
+# Headless charts are rendered together at the end, in a process pool when plot_workers > 1
+headless_plots = False
+plot_workers = 1
+
 # Set to True to use weighted analysis
 use_weights = True
 
@@ -18,4 +95,35 @@ points_per_race_weight = 0.3
 tire_management_score_weight = 0.3
 starting_position_weight = 0.2
 finish_position_weight = 0.2
-avg_positions_gained_weight = 0.0
\ No newline at end of file
+avg_positions_gained_weight = 0.0
+
+# Set above 0 to also rank drivers under that many random weight vectors and report how
+# stable each driver's rank is (share of vectors placing them in the top weight_sweep_top_n)
+weight_sweep_vectors = 0
+weight_sweep_top_n = 10
+
+# Set above 0 to report bootstrap intervals of each driver's score and rank from that many
+# resamples of their races (seeded, spread over bootstrap_workers processes)
+bootstrap_replicates = 0
+bootstrap_workers = 1
+bootstrap_seed = 0
+
+# Set to a .json or .csv path to write a per-stage profile (wall time, CPU time, rows and
+# peak memory of each stage and race) of a run. profile_memory traces allocations for the
+# peaks, which slows the run down; cprofile_stage also dumps cProfile stats of that stage
+profile_report = None
+profile_memory = True
+cprofile_stage = None
+cprofile_path = 'profile.prof'
+
+# Fuel-corrected degradation fit of each stint (src/data/degradation_fit.py): fuel burns off
+# linearly from start_fuel_kg to empty over the race, costing fuel_time_per_kg seconds per kg,
+# and corrected lap times are fitted with a polynomial of this degree in the stint lap
+start_fuel_kg = 110.0
+fuel_time_per_kg = 0.03
+degradation_fit_degree = 1
+
+# Local query service (python -m src.cli serve): address, and how many query results it caches
+service_host = '127.0.0.1'
+service_port = 8050
+service_cache_size = 256
@@ -1,138 +1,300 @@
+import queue
+import threading
+
+import numpy as np
 import pandas as pd
 
-from src.utils.helpers import extract_sc_vsc_periods, get_races, load_race, is_valid_lap, calculate_baseline
-from dataclasses import dataclass, fields
+from concurrent.futures import ProcessPoolExecutor
+from src.config import collection_workers, prefetch_sessions
+from src.utils.helpers import (enable_cache, extract_sc_vsc_intervals, get_races, load_race, load_race_slim,
+                               valid_lap_mask, calculate_baselines)
+from src.data.schema import TireRecord, apply_schema
+from src.data.tire_store import stale_races, write_races, load_tire_matrix
+from src.utils.profiling import Profiler, current_profiler, profiled, profiling_options, stage
+from dataclasses import fields
+
+# Bump whenever process_race output changes so stored partitions get rebuilt
+PROCESSING_VERSION = 1
 
 
-@dataclass
-class TireRecord:
-    Driver: str
-    Race: str
-    Year: int
-    LapNumber: int
-    Stint: int
-    StintLapNumber: int
-    LapTime: float
-    Compound: str
-    BaselineTime: float
-    DegradationPct: float
-    SmoothedDeg: float
-    PositionsGained: int
-    RacePoints: float
-    StintLength: int
-    FinishPosition: int
-    StartingPosition: int
+class TireMatrixBuilder:
+    # Append-only columnar accumulator for tire records. Each TireRecord field is kept in
+    # its own preallocated, growable typed array, and the DataFrame is built once in to_frame()
 
+    def __init__(self, expected_batches=1):
+        self.columns = [field.name for field in fields(TireRecord)]
+        self.expected_batches = expected_batches
+        self.size = 0
+        self.arrays = None
 
-def collect_data(years):
-    tire_matrix = pd.DataFrame(columns=[field.name for field in fields(TireRecord)])
+    def append(self, records):
+        n = len(records)
+        if n == 0:
+            return
 
-    for year in years:
-        races = get_races(year)
-        yearly_tire_matrix = pd.DataFrame(columns=tire_matrix.columns)
+        if self.arrays is None:
+            # Column dtypes are fixed by the first batch, capacity is sized from it
+            capacity = n * max(self.expected_batches, 1)
+            self.arrays = {col: np.empty(capacity, dtype=records[col].to_numpy().dtype) for col in self.columns}
+        elif self.size + n > len(self.arrays[self.columns[0]]):
+            self.grow(self.size + n)
 
-        # Populate Tire Matrix
-        yearly_tire_matrix = populate_tire_matrix(year, races, yearly_tire_matrix)
+        for col in self.columns:
+            values = records[col].to_numpy()
+            array = self.arrays[col]
+            if not np.can_cast(values.dtype, array.dtype, casting='same_kind'):
+                array = self.arrays[col] = array.astype(np.result_type(array.dtype, values.dtype))
+            array[self.size:self.size + n] = values
 
-        # Append to the main tire matrix
-        tire_matrix = pd.concat([tire_matrix, yearly_tire_matrix], ignore_index=True)
+        self.size += n
 
-    return tire_matrix
+    def grow(self, required):
+        capacity = max(required, len(self.arrays[self.columns[0]]) * 3 // 2)
+        for col in self.columns:
+            array = np.empty(capacity, dtype=self.arrays[col].dtype)
+            array[:self.size] = self.arrays[col][:self.size]
+            self.arrays[col] = array
 
+    def to_frame(self):
+        if self.arrays is None:
+            return pd.DataFrame(columns=self.columns)
+        # Hand the filled part of each array to pandas without copying it
+        return pd.DataFrame({col: self.arrays[col][:self.size] for col in self.columns}, copy=False)
 
-def populate_tire_matrix(year, races, tire_matrix):
-    for index, race in enumerate(races):
-        session = load_race(year, race[0], 'R')
 
-        print(f"Loading race {index + 1} / {len(races)}")
-        print("Loading " + race[0])
+@profiled('collect_data', rows='output')
+def collect_data(years, n_workers=collection_workers, session_loader=load_race, race_lister=get_races, store=None,
+                 prefetch=prefetch_sessions):
+    # Races from every year are collected as one batch so workers stay busy across year boundaries
+    schedule = {(year, race[0]): order for year in years for order, race in enumerate(race_lister(year))}
+    races = list(schedule)
+
+    # With a partitioned store, only fetch races that are missing or were processed by older code
+    if store is not None:
+        races = stale_races(store, races, PROCESSING_VERSION)
+        print(f"{len(schedule) - len(races)} / {len(schedule)} races already up to date in {store}")
         print()
 
-        sc_vsc_periods = extract_sc_vsc_periods(session.track_status)
-
-        driver_points = session.results.set_index('Abbreviation')['Points'].to_dict()
-
-        starting_positions = session.results.set_index('Abbreviation')['GridPosition'].to_dict()
-        finish_positions = session.results.set_index('Abbreviation')['Position'].to_dict()
-
-        for driver in session.results.Abbreviation.values:
-            laps = session.laps.pick_drivers(driver)
-
-            if laps.Position.empty:
-                continue
-
-            # Process each stint separately
-            for stint_num in laps.Stint.unique():
-                stint_laps = laps[laps.Stint == stint_num]
-                lap_times = []
-                valid_indices = []
-                stint_records = []
-
-                # Collect valid lap data
-                for index, lapNumber in stint_laps.LapNumber.items():
-                    if is_valid_lap(index, stint_laps, sc_vsc_periods):
-                        lap_times.append(stint_laps.LapTime[index])
-                        valid_indices.append(index)
-
-                # Skip stints with 1 or fewer valid laps
-                if len(valid_indices) <= 1:
-                    continue
-
-                # Calculate baseline time
-                baseline_time = calculate_baseline(stint_laps, valid_indices)
-
-                # Calculate degradation
-                degradation_pcts = [(lap_time - baseline_time) / baseline_time * 100
-                                    for lap_time in lap_times]
-
-                # Calculate smoothed degradation using 3-lap rolling average
-                smoothed_deg = pd.Series(degradation_pcts).rolling(window=3, min_periods=1).mean()
-
-                stint_length = stint_laps.shape[0]
-
-                # Populate tire_matrix with processed data
-                for i, index in enumerate(valid_indices):
-                    positions_gained = 0
-                    if i > 0:  # If not the first valid lap
-                        prev_index = valid_indices[i - 1]
-                        positions_gained = stint_laps.Position[index] - stint_laps.Position[prev_index]
-
-                    # Get the lap number within this stint
-                    stint_lap_number = (stint_laps.loc[index, 'LapNumber'] -
-                                        stint_laps['LapNumber'].iloc[0] + 1)
-
-                    # Convert LapTime and BaselineTime to milliseconds
-                    lap_time_ms = stint_laps.LapTime[index].total_seconds() * 1000
-                    baseline_time_ms = baseline_time.total_seconds() * 1000
-                    race_points = driver_points.get(driver, 0)
-
-                    finish_position = finish_positions.get(driver, 1 + max(finish_positions.values()))
-                    starting_position = starting_positions.get(driver)
-
-                    stint_records.append(TireRecord(
-                        Driver=driver,
-                        Race=race[0],
-                        Year=year,
-                        LapNumber=stint_laps.LapNumber[index],
-                        Stint=stint_num,
-                        StintLapNumber=stint_lap_number,
-                        LapTime=lap_time_ms,
-                        Compound=stint_laps.Compound[index],
-                        BaselineTime=baseline_time_ms,
-                        DegradationPct=degradation_pcts[i],
-                        SmoothedDeg=smoothed_deg[i],
-                        PositionsGained=positions_gained,
-                        RacePoints=race_points,
-                        StintLength=stint_length,
-                        FinishPosition=finish_position,
-                        StartingPosition=starting_position
-                    ).__dict__)
-
-                # Add stint records to tire_matrix
-                stint_df = pd.DataFrame.from_records(stint_records)
-                if not tire_matrix.empty:
-                    tire_matrix = pd.concat([tire_matrix, stint_df], ignore_index=True)
-                else:
-                    tire_matrix = stint_df
-
-    return tire_matrix
+    collected = collect_races(races, n_workers, session_loader, prefetch)
+
+    if store is not None:
+        write_races(store, collected, PROCESSING_VERSION, schedule)
+        return load_tire_matrix(store, years)
+
+    builder = TireMatrixBuilder(expected_batches=len(races))
+    for _, _, records in collected:
+        builder.append(records)
+
+    return apply_schema(builder.to_frame())
+
+
+def populate_tire_matrix(year, races, tire_matrix, n_workers=collection_workers, session_loader=load_race,
+                         prefetch=prefetch_sessions):
+    builder = TireMatrixBuilder(expected_batches=len(races) + 1)
+    builder.append(tire_matrix)
+    for _, _, records in collect_races([(year, race[0]) for race in races], n_workers, session_loader, prefetch):
+        builder.append(records)
+
+    return apply_schema(builder.to_frame())
+
+
+def collect_races(races, n_workers=1, session_loader=load_race, prefetch=0):
+    # Load and process (year, race name) pairs, in parallel when n_workers > 1. Yields
+    # (year, race name, records) in the order of races; failed races are reported and left out.
+    # With one worker and prefetch > 0, a background thread loads up to prefetch sessions
+    # ahead while the current one is processed
+    tasks = [(year, race_name, session_loader, profiling_options()) for year, race_name in races]
+    failures = []
+
+    if n_workers > 1:
+        # Workers started with spawn/forkserver do not inherit the FastF1 cache setting
+        initializer = enable_cache if uses_fastf1(session_loader) else None
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=initializer) as executor:
+            yield from gather_race_results(executor.map(collect_race, tasks), len(tasks), failures)
+    elif prefetch > 0:
+        results = (process_session(task, *loaded) for task, loaded in prefetch_sessions_ahead(tasks, prefetch))
+        yield from gather_race_results(results, len(tasks), failures)
+    else:
+        yield from gather_race_results(map(collect_race, tasks), len(tasks), failures)
+
+    if failures:
+        print(f"Failed to collect {len(failures)} / {len(tasks)} races:")
+        for year, race_name, error in failures:
+            print(f"  {year} {race_name}: {error}")
+        print()
+
+
+def uses_fastf1(session_loader):
+    # Also true of a SessionCache loading through FastF1
+    return getattr(session_loader, 'loader', session_loader) in (load_race, load_race_slim)
+
+
+def collect_race(task):
+    # Worker entry point: returns only the compact per-race record table, or the error.
+    # When the caller is profiling, a worker process records its stages itself and returns them
+    year, race_name, session_loader, profiling = task
+    if profiling is not None and current_profiler() is None:
+        with Profiler(**profiling) as profiler:
+            result = collect_race((year, race_name, session_loader, None))
+        return result[:4] + (profiler.records,)
+
+    return process_session(task, *load_session(task))
+
+
+def load_session(task):
+    # (session, None), or (None, error) when the loader fails
+    year, race_name, session_loader, _ = task
+    try:
+        with stage('load_race', year=year, race=race_name):
+            return session_loader(year, race_name, 'R'), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+def process_session(task, session, error):
+    # The 5-tuple returned by collect_race for a loaded session (or a failed load)
+    year, race_name = task[:2]
+    if error is not None:
+        return year, race_name, None, error, []
+    try:
+        with stage('process_race', year=year, race=race_name) as record:
+            records = process_race(session, race_name, year)
+            record['rows'] = len(records)
+        return year, race_name, records, None, []
+    except Exception as error:
+        return year, race_name, None, f"{type(error).__name__}: {error}", []
+
+
+def prefetch_sessions_ahead(tasks, depth):
+    # Yields (task, (session, error)) in task order while a daemon thread loads the next
+    # sessions into a queue of depth entries. The loader blocks while the queue is full,
+    # so at most depth + 2 sessions are held at once: the queued ones, the one being
+    # loaded and the one being processed. Loading is mostly network and disk I/O, which
+    # releases the GIL, so it overlaps with processing on the consumer side
+    loaded = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    done = object()
+    failures = []
+
+    def put(item):
+        # Gives up once the consumer has stopped, rather than blocking forever on a full queue
+        while not stopped.is_set():
+            try:
+                loaded.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def load_all():
+        # load_session catches loader errors; anything else (e.g. SystemExit) ends the
+        # thread, and is raised in the consumer once the end marker, always queued, is reached
+        try:
+            for task in tasks:
+                if not put((task, load_session(task))):
+                    return
+        except BaseException as error:
+            failures.append(error)
+        finally:
+            put(done)
+
+    loader = threading.Thread(target=load_all, name='session-prefetch', daemon=True)
+    loader.start()
+    try:
+        while (item := loaded.get()) is not done:
+            yield item
+        if failures:
+            raise failures[0]
+    finally:
+        # Reached at the end, or when the consumer stops early or raises
+        stopped.set()
+        loader.join()
+
+
+def gather_race_results(results, n_races, failures):
+    for index, (year, race_name, records, error, stage_records) in enumerate(results):
+        print(f"Loading race {index + 1} / {n_races}")
+        print(f"Loading {year} {race_name}")
+        print()
+
+        if stage_records and current_profiler() is not None:
+            current_profiler().add_records(stage_records)
+
+        if error is None:
+            yield year, race_name, records
+        else:
+            failures.append((year, race_name, error))
+
+
+def process_race(session, race_name, year):
+    # Columnar equivalent of processing every driver, stint and lap of a session in turn
+    results = session.results.set_index('Abbreviation')
+    driver_order = {driver: i for i, driver in enumerate(session.results.Abbreviation.values)}
+
+    laps = session.laps[session.laps['Driver'].isin(driver_order)]
+    laps = laps[laps['Stint'].notnull()]
+
+    # Order rows driver by driver (results order), stint by stint (first appearance), lap by lap
+    stint_ids = laps.groupby(['Driver', 'Stint'], sort=False).ngroup()
+    order = np.lexsort((np.arange(len(laps)), stint_ids.values, laps['Driver'].map(driver_order).values))
+    laps = laps.iloc[order]
+    stint_ids = stint_ids.iloc[order]
+
+    # Stint-level values use every lap of the stint, valid or not
+    stint_groups = laps.groupby(stint_ids, sort=False)
+    stint_length = stint_groups['LapNumber'].transform('size')
+    stint_first_lap = stint_groups['LapNumber'].transform('first')
+
+    with stage('extract_sc_vsc_intervals', rows=len(session.track_status)):
+        sc_vsc_intervals = extract_sc_vsc_intervals(session.track_status)
+    valid = valid_lap_mask(laps, sc_vsc_intervals)
+
+    # Skip stints with 1 or fewer valid laps
+    valid &= valid.groupby(stint_ids, sort=False).transform('sum') > 1
+
+    laps = laps[valid]
+    stint_ids = stint_ids[valid]
+    stint_length = stint_length[valid]
+    stint_first_lap = stint_first_lap[valid]
+
+    lap_time_ns = laps['LapTime'].values.astype('int64').astype(float)
+    baseline_ns = calculate_baselines(lap_time_ns, stint_ids.values)
+
+    # Calculate degradation and its 3-lap rolling average within each stint
+    degradation_pct = pd.Series((lap_time_ns - baseline_ns) / baseline_ns * 100, index=laps.index)
+    smoothed_deg = (degradation_pct.groupby(stint_ids, sort=False)
+                    .rolling(window=3, min_periods=1).mean()
+                    .droplevel(0))
+
+    positions_gained = (laps['Position'] - laps['Position'].groupby(stint_ids, sort=False).shift(1))
+    positions_gained[stint_ids != stint_ids.shift(1)] = 0
+
+    drivers = laps['Driver']
+
+    # LapTime and BaselineTime are stored in milliseconds
+    records = pd.DataFrame({
+        'Driver': drivers.values,
+        'Race': race_name,
+        'Year': year,
+        'LapNumber': laps['LapNumber'].values,
+        'Stint': laps['Stint'].values,
+        'StintLapNumber': (laps['LapNumber'] - stint_first_lap + 1).values,
+        'LapTime': total_milliseconds(lap_time_ns),
+        'Compound': laps['Compound'].values,
+        'BaselineTime': total_milliseconds(baseline_ns),
+        'DegradationPct': degradation_pct.values,
+        'SmoothedDeg': smoothed_deg.values,
+        'PositionsGained': positions_gained.values,
+        'RacePoints': drivers.map(results['Points']).values,
+        'StintLength': stint_length.values,
+        'FinishPosition': drivers.map(results['Position']).values,
+        'StartingPosition': drivers.map(results['GridPosition']).values,
+    }, columns=[field.name for field in fields(TireRecord)])
+
+    return records
+
+
+def total_milliseconds(ns):
+    # Same arithmetic as Timedelta.total_seconds() * 1000, which works at microsecond resolution
+    microseconds = ns // 1000
+    return (microseconds // 10 ** 6 + (microseconds % 10 ** 6) / 1e6) * 1000
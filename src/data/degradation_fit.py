@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from src.config import degradation_fit_degree, fuel_time_per_kg, start_fuel_kg
+
+# Fuel-corrected degradation trend of every stint, as an alternative to measuring laps
+# against the single baseline lap picked by calculate_baselines. Lap times are first
+# corrected for the weight of the fuel on board, which burns off linearly from
+# start_fuel_kg on lap 1 to empty on the race's last lap and costs fuel_time_per_kg
+# seconds per kg. Each stint's corrected times (ms) are then fitted with a polynomial of
+# its stint lap (0 on the first lap of the stint) by least squares:
+#
+#   DegIntercept   fitted fuel-corrected lap time at the start of the stint (ms)
+#   DegSlope       fitted lap time lost per lap of tire age (ms per lap)
+#
+# The normal equations of all stints are built with one bincount per power of the stint
+# lap and solved as one stacked system, so a season's stints are fitted in a single pass
+
+
+def fuel_corrected_lap_times(tire_matrix, fuel_time_per_kg=fuel_time_per_kg, start_fuel_kg=start_fuel_kg):
+    # LapTime (ms) minus the time cost of the fuel still on board. The race distance is
+    # taken as the last lap number recorded for the race
+    races = group_ids(tire_matrix, ['Year', 'Race'])
+    lap_number = tire_matrix['LapNumber'].to_numpy(np.float64)
+    race_laps = np.zeros(races.max() + 1 if len(races) else 0)
+    np.maximum.at(race_laps, races, lap_number)
+    race_laps = race_laps[races]
+
+    fuel_kg = start_fuel_kg * (1 - (lap_number - 1) / np.maximum(race_laps - 1, 1))
+    return tire_matrix['LapTime'].to_numpy(np.float64) - fuel_time_per_kg * 1000 * fuel_kg
+
+
+def fit_stint_degradation(tire_matrix, degree=degradation_fit_degree, fuel_time_per_kg=fuel_time_per_kg,
+                          start_fuel_kg=start_fuel_kg):
+    # Per-lap DegIntercept and DegSlope of the lap's stint, one least-squares fit per
+    # (Year, Race, Driver, Stint). Stints with too few laps for the degree get the
+    # minimum-norm solution rather than NaN
+    if int(degree) != degree or degree < 1:
+        raise ValueError(f"degree must be an integer of at least 1 (DegSlope needs a linear term), got {degree!r}")
+    degree = int(degree)
+    if tire_matrix.empty:
+        return pd.DataFrame({'DegIntercept': [], 'DegSlope': []}, index=tire_matrix.index, dtype=np.float64)
+
+    lap_stints = group_ids(tire_matrix, ['Year', 'Race', 'Driver', 'Stint'])
+    n_stints = lap_stints.max() + 1
+
+    y = fuel_corrected_lap_times(tire_matrix, fuel_time_per_kg, start_fuel_kg)
+    x = tire_matrix['StintLapNumber'].to_numpy(np.float64) - 1
+    known = ~np.isnan(y)
+    stint_ids, x, y = lap_stints[known], x[known], y[known]
+
+    # Normal equations A c = b per stint, with A[i, j] = sum x^(i + j) and b[i] = sum x^i y
+    powers = [np.bincount(stint_ids, weights=x ** p, minlength=n_stints) for p in range(2 * degree + 1)]
+    moments = [np.bincount(stint_ids, weights=x ** p * y, minlength=n_stints) for p in range(degree + 1)]
+    A = np.stack([np.stack(powers[i:i + degree + 1], axis=-1) for i in range(degree + 1)], axis=1)
+    b = np.stack(moments, axis=-1)[..., None]
+    coefficients = (np.linalg.pinv(A) @ b)[..., 0]
+
+    return pd.DataFrame({
+        'DegIntercept': coefficients[lap_stints, 0],
+        'DegSlope': coefficients[lap_stints, 1],
+    }, index=tire_matrix.index)
+
+
+def group_ids(frame, keys):
+    # Dense id of each row's combination of keys, from the factorized key columns
+    # (lighter than a multi-key groupby over the whole tire matrix)
+    combined = np.zeros(len(frame), dtype=np.int64)
+    for key in keys:
+        codes, uniques = pd.factorize(frame[key])
+        combined = combined * (len(uniques) + 1) + codes + 1
+    return np.unique(combined, return_inverse=True)[1].reshape(-1)
+
+
+def add_degradation_fit(tire_matrix, **options):
+    # tire_matrix with the per-lap stint fit columns, as float32 like the other metrics
+    fit = fit_stint_degradation(tire_matrix, **options)
+    return tire_matrix.assign(**{col: fit[col].astype(np.float32) for col in fit.columns})
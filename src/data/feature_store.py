@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from src.config import (degradation_fit_degree, feature_store_max_age_days, feature_store_max_mb, feature_store_path,
+                        fuel_time_per_kg, start_fuel_kg, telemetry_bins, telemetry_store_path)
+from src.data.prepare_features import FEATURE_VERSION, group_keys, prepare_features, tire_matrix_columns
+from src.data.telemetry_features import join_telemetry_features, telemetry_feature_columns, telemetry_features
+from src.data.tire_store import load_tire_matrix, store_entries
+from src.utils.profiling import profiled
+
+# Content-addressed cache of prepare_features output. An entry is keyed by a hash of the
+# bytes of the tire store partitions it was built from, FEATURE_VERSION and the settings
+# that shape the features, so it is reused until any of them changes:
+#
+#   modeling_data = cached_features('data/processed/tire_metrics', [2023, 2024])
+#
+# Each column is one uncompressed Arrow IPC file in the entry's directory. On a hit the
+# requested columns are memory-mapped and numeric ones handed to pandas without copying,
+# so the returned frame's numeric columns are read-only. Columns are cached in groups:
+# 'base' (prepare_features, including the Tire_* dummies and RelativePerformance) and
+# 'telemetry' (telemetry_features joined onto the base rows, keyed by the telemetry index
+# as well). Requested columns missing from an entry, or of a group whose inputs changed,
+# are computed on demand and added to it. Entries are evicted by age and total size
+
+metadata_file = 'meta.json'
+
+
+def file_digest(digest, path):
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    except FileNotFoundError:
+        digest.update(b'missing')
+
+
+def features_key(store_path, years):
+    # Hash of the partitions load_tire_matrix reads for years, and of the feature definitions
+    digest = hashlib.sha256()
+    for entry in store_entries(store_path, years):
+        digest.update(json.dumps([entry['year'], entry['race'], entry['version']]).encode())
+        file_digest(digest, Path(store_path) / entry['path'])
+    digest.update(json.dumps({
+        'feature_version': FEATURE_VERSION,
+        'columns': tire_matrix_columns,
+        'start_fuel_kg': start_fuel_kg,
+        'fuel_time_per_kg': fuel_time_per_kg,
+        'degradation_fit_degree': degradation_fit_degree,
+    }, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def telemetry_fingerprint(telemetry_path, n_bins):
+    # The telemetry index changes whenever races are appended to or compacted in the store
+    digest = hashlib.sha256()
+    file_digest(digest, Path(telemetry_path) / 'index.parquet')
+    digest.update(json.dumps({'feature_version': FEATURE_VERSION, 'bins': n_bins}).encode())
+    return digest.hexdigest()
+
+
+def read_metadata(entry_path):
+    try:
+        with open(entry_path / metadata_file) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_metadata(entry_path, metadata):
+    tmp_path = entry_path / f"{metadata_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    tmp_path.replace(entry_path / metadata_file)
+
+
+def column_path(entry_path, col):
+    return entry_path / f"{col}.arrow"
+
+
+def write_columns(entry_path, frame):
+    # One Arrow file per column. NumPy numeric columns are written from their values, so
+    # NaN stays a value (not a null) and reads back without copying; other columns keep
+    # pandas metadata to restore their dtype (categories, nullable integers, bool)
+    for col in frame.columns:
+        values = frame[col]
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iuf':
+            table = pa.table({col: pa.array(values.to_numpy())})
+        else:
+            table = pa.Table.from_pandas(frame[[col]], preserve_index=False)
+        tmp_path = column_path(entry_path, col).with_suffix('.arrow.tmp')
+        with ipc.new_file(tmp_path, table.schema) as writer:
+            writer.write_table(table)
+        tmp_path.replace(column_path(entry_path, col))
+
+
+def read_column(entry_path, col):
+    # Zero-copy view of a numeric column in the memory-mapped file, or a Series for others
+    table = ipc.open_file(pa.memory_map(str(column_path(entry_path, col)))).read_all()
+    if table.schema.pandas_metadata is None:
+        return table.column(0).combine_chunks().to_numpy(zero_copy_only=True)
+    return table.to_pandas()[col]
+
+
+def missing_columns(entry_path, metadata, columns):
+    # The columns an entry lacks, or whose files are gone
+    return [col for col in columns if col not in metadata['columns'] or not column_path(entry_path, col).exists()]
+
+
+def base_features(store_path, years):
+    return prepare_features(load_tire_matrix(store_path, years, columns=tire_matrix_columns))
+
+
+def telemetry_columns(keys, years, telemetry_path, n_bins):
+    # Telemetry features of the base rows (given by their group keys), in the same order
+    joined = join_telemetry_features(keys, telemetry_features(telemetry_path, years, n_bins))
+    return joined[telemetry_feature_columns]
+
+
+@profiled('cached_features', rows='output')
+def cached_features(store_path, years, columns=None, telemetry=False, root=feature_store_path,
+                    telemetry_path=telemetry_store_path, n_bins=telemetry_bins, max_mb=feature_store_max_mb,
+                    max_age_days=feature_store_max_age_days):
+    # prepare_features output for the store's races in years, plus the telemetry features
+    # when telemetry is True; or only the group keys and the requested columns
+    wanted = None if columns is None else group_keys + [col for col in columns if col not in group_keys]
+    if root is None:
+        modeling_data = base_features(store_path, years)
+        if telemetry or set(wanted or []) & set(telemetry_feature_columns):
+            modeling_data = join_telemetry_features(modeling_data, telemetry_features(telemetry_path, years, n_bins))
+        return modeling_data if wanted is None else modeling_data[wanted]
+
+    start = time.perf_counter()
+    key = features_key(store_path, years)
+    entry_path = Path(root) / key[:24]
+    metadata = read_metadata(entry_path)
+    fingerprints = {'base': key, 'telemetry': None}
+    computed, base = [], None
+
+    if metadata is None or metadata['fingerprints'].get('base') != key:
+        # Built in a temporary directory and renamed, so readers never see a partial entry
+        base = base_features(store_path, years)
+        tmp_path = Path(root) / f"{key[:24]}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        write_columns(tmp_path, base)
+        metadata = {'years': years, 'rows': len(base),
+                    'columns': {col: 'base' for col in base.columns}, 'fingerprints': {'base': key}}
+        write_metadata(tmp_path, metadata)
+        shutil.rmtree(entry_path, ignore_errors=True)
+        tmp_path.rename(entry_path)
+        computed.append('base')
+
+    if wanted is None:
+        wanted = [col for col, group in metadata['columns'].items() if group == 'base']
+        wanted += telemetry_feature_columns if telemetry else []
+
+    # Telemetry columns are (re)computed when requested and missing or out of date
+    if set(wanted) & set(telemetry_feature_columns):
+        fingerprints['telemetry'] = telemetry_fingerprint(telemetry_path, n_bins)
+        if metadata['fingerprints'].get('telemetry') != fingerprints['telemetry'] or missing_columns(
+                entry_path, metadata, [col for col in wanted if col in telemetry_feature_columns]):
+            keys = pd.DataFrame({col: read_column(entry_path, col) for col in group_keys}, copy=False)
+            write_columns(entry_path, telemetry_columns(keys, years, telemetry_path, n_bins))
+            metadata['columns'].update({col: 'telemetry' for col in telemetry_feature_columns})
+            metadata['fingerprints']['telemetry'] = fingerprints['telemetry']
+            write_metadata(entry_path, metadata)
+            computed.append('telemetry')
+
+    # Any other missing column goes through prepare_features, and is an error if it is not
+    # one of its columns
+    missing = missing_columns(entry_path, metadata, [col for col in wanted if col not in telemetry_feature_columns])
+    if missing:
+        base = base_features(store_path, years) if base is None else base
+        unknown = [col for col in missing if col not in base.columns]
+        if unknown:
+            raise KeyError(f"Unknown feature columns {unknown}, supported columns are "
+                           f"{list(base.columns) + telemetry_feature_columns}")
+        write_columns(entry_path, base[missing])
+        metadata['columns'].update({col: 'base' for col in missing})
+        write_metadata(entry_path, metadata)
+        computed.append('missing base')
+
+    modeling_data = pd.DataFrame({col: read_column(entry_path, col) for col in wanted}, copy=False)
+    os.utime(entry_path / metadata_file)
+    evict(root, max_mb, max_age_days, keep=entry_path.name)
+
+    state = f"computed {' and '.join(computed)} features" if computed else "hit"
+    print(f"Feature store {state}: {len(modeling_data)} rows in {time.perf_counter() - start:.3f}s")
+    return modeling_data
+
+
+def entry_size(entry_path):
+    return sum(path.stat().st_size for path in entry_path.iterdir())
+
+
+def evict(root, max_mb=feature_store_max_mb, max_age_days=feature_store_max_age_days, keep=None):
+    # Remove entries unused for max_age_days, then the least recently used ones until the
+    # cache fits in max_mb. Returns the names of the removed entries
+    if not Path(root).exists():
+        return []
+    entries = []
+    for entry_path in Path(root).iterdir():
+        metadata_path = entry_path / metadata_file
+        if entry_path.name != keep and metadata_path.exists():
+            entries.append((metadata_path.stat().st_mtime, entry_size(entry_path), entry_path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries) + (entry_size(Path(root) / keep) if keep else 0)
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for used, size, entry_path in entries:
+        if used >= cutoff and total <= max_mb * 2 ** 20:
+            break
+        shutil.rmtree(entry_path, ignore_errors=True)
+        total -= size
+        removed.append(entry_path.name)
+    return removed
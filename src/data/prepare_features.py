@@ -1,9 +1,23 @@
+import numpy as np
 import pandas as pd
 
+from src.data.degradation_fit import add_degradation_fit, fit_stint_degradation
+from src.utils.profiling import profiled
 
+# Bump whenever prepare_features (or telemetry feature) output changes so cached features get rebuilt
+FEATURE_VERSION = 2
+
+# Tire matrix columns used by feature preparation (ranking uses the store's driver race summary)
+tire_matrix_columns = [
+    'Driver', 'Race', 'Year', 'Compound', 'LapTime', 'DegradationPct', 'SmoothedDeg',
+    'PositionsGained', 'RacePoints', 'StintLength', 'LapNumber', 'Stint', 'StintLapNumber'
+]
+
+
+@profiled('prepare_features')
 def prepare_features(df):
-    # Group by driver and race
-    driver_race_stats = df.groupby(['Driver', 'Race', 'Compound']).agg({
+    # Group by driver and race, carrying the year along as an integer key
+    driver_race_stats = df.groupby(['Driver', 'Race', 'Year', 'Compound'], observed=True).agg({
         'SmoothedDeg': ['mean', 'max', 'std'],
         'LapTime': ['mean', 'std', 'min'],
         'DegradationPct': ['mean', 'max', 'median'],
@@ -13,17 +27,30 @@ def prepare_features(df):
     }).reset_index()
 
     # Flatten columns
-    driver_race_stats.columns = ['Driver', 'Race', 'Compound'] + [
-        f'{col[0]}_{col[1]}' for col in driver_race_stats.columns[3:]
+    driver_race_stats.columns = ['Driver', 'Race', 'Year', 'Compound'] + [
+        f'{col[0]}_{col[1]}' for col in driver_race_stats.columns[4:]
     ]
 
+    # Fuel-corrected trend of each stint, fitted for all stints at once and averaged over
+    # the laps of each group like the columns above (same grouping, so same row order)
+    fit = fit_stint_degradation(df)
+    fit_means = fit.groupby([df[key] for key in group_keys], observed=True).mean()
+    position = driver_race_stats.columns.get_loc('DegradationPct_median') + 1
+    for offset, col in enumerate(['DegSlope', 'DegIntercept']):
+        driver_race_stats.insert(position + offset, f'{col}_mean', fit_means[col].to_numpy())
+
+    return add_derived_features(driver_race_stats)
+
+
+def add_derived_features(driver_race_stats):
     # Create tire-specific features
     tire_dummies = pd.get_dummies(driver_race_stats['Compound'], prefix='Tire')
     driver_race_stats = pd.concat([driver_race_stats, tire_dummies], axis=1)
 
-    # Add a relative performance metric
-    driver_race_stats['RelativePerformance'] = driver_race_stats['LapTime_min'] / driver_race_stats.groupby('Race')[
-        'LapTime_min'].transform('mean')
+    # Add a relative performance metric, against the field of the same race (races are keyed
+    # by year too, as most keep their name from season to season)
+    driver_race_stats['RelativePerformance'] = driver_race_stats['LapTime_min'] / driver_race_stats.groupby(
+        ['Year', 'Race'], observed=True)['LapTime_min'].transform('mean')
 
     driver_race_stats.rename(columns={
         'RacePoints_max': 'RacePoints',
@@ -32,3 +59,156 @@ def prepare_features(df):
     }, inplace=True)
 
     return driver_race_stats
+
+
+group_keys = ['Driver', 'Race', 'Year', 'Compound']
+
+# Columns aggregated with mergeable moments (count, mean and M2) plus min/max
+moment_columns = {'SmoothedDeg': ['mean', 'max', 'std'],
+                  'LapTime': ['mean', 'std', 'min'],
+                  'DegradationPct': ['mean', 'max'],
+                  'DegSlope': ['mean'],
+                  'DegIntercept': ['mean']}
+
+
+class FeatureAccumulator:
+    # Mergeable per-group state for prepare_features, fed one batch of tire records at a time.
+    # Groups get a global id on first sight and every statistic is a growable float64 array
+    # indexed by it, so memory scales with the number of groups rather than with laps.
+    # Batches must hold whole races (as the degradation fit needs whole stints anyway), so
+    # each group's DegradationPct values all arrive in one batch and its exact median is
+    # taken there; a group seen again in a later batch raises ValueError.
+
+    def __init__(self):
+        self.group_ids = {}
+        self.size = 0
+        self.arrays = {}
+
+    def allocate(self, capacity):
+        names = [f'{col}_{stat}' for col in moment_columns for stat in ('n', 'mean', 'm2', 'min', 'max')]
+        names += ['RacePoints_max', 'StintLength_n', 'StintLength_sum', 'PositionsGained_sum',
+                  'DegradationPct_median']
+        for name in names:
+            initial = np.nan if name.endswith(('_min', '_max', '_median')) else 0
+            array = np.full(capacity, initial, dtype=np.float64)
+            if name in self.arrays:
+                array[:self.size] = self.arrays[name][:self.size]
+            self.arrays[name] = array
+
+    def ids_for(self, keys):
+        ids = np.empty(len(keys), dtype=np.int32)
+        for i, key in enumerate(keys):
+            ids[i] = self.group_ids.setdefault(key, len(self.group_ids))
+        if len(self.group_ids) > len(self.arrays.get('StintLength_n', ())):
+            self.allocate(max(len(self.group_ids), len(self.arrays.get('StintLength_n', ())) * 3 // 2))
+        self.size = len(self.group_ids)
+        return ids
+
+    def add(self, batch):
+        batch = batch.dropna(subset=group_keys)
+        if batch.empty:
+            return
+
+        # Group locally, then map each local group to its global id
+        local = batch.groupby(group_keys, sort=False, observed=True)
+        codes = local.ngroup().to_numpy()
+        keys = [(str(d), str(r), int(y), str(c)) for d, r, y, c in local.size().index]
+        size_before = self.size
+        ids = self.ids_for(keys)
+        if (ids < size_before).any():
+            key = keys[int(np.flatnonzero(ids < size_before)[0])]
+            raise ValueError(f"Group {key} spans batches; batches must hold whole races")
+
+        # Per-group reductions with bincount, and min/max with reduceat over rows sorted by group
+        n_groups = len(keys)
+        order = np.argsort(codes, kind='stable')
+        starts = np.r_[0, np.flatnonzero(np.diff(codes[order])) + 1]
+
+        def reduce(ufunc, values):
+            return ufunc.reduceat(values[order], starts)
+
+        for col in moment_columns:
+            values = batch[col].to_numpy(np.float64, na_value=np.nan)
+            present = ~np.isnan(values)
+            n_b = np.bincount(codes[present], minlength=n_groups).astype(np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_b = np.nan_to_num(np.bincount(codes[present], weights=values[present], minlength=n_groups) / n_b)
+            m2_b = np.bincount(codes[present], weights=(values[present] - mean_b[codes[present]]) ** 2,
+                               minlength=n_groups)
+
+            # Chan et al.'s parallel update of count, mean and M2
+            n_a, mean_a, m2_a = (self.arrays[f'{col}_{stat}'][ids] for stat in ('n', 'mean', 'm2'))
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            with np.errstate(invalid='ignore', divide='ignore'):
+                shift = np.where(n > 0, n_b / n, 0)
+            self.arrays[f'{col}_n'][ids] = n
+            self.arrays[f'{col}_mean'][ids] = mean_a + delta * shift
+            self.arrays[f'{col}_m2'][ids] = m2_a + m2_b + delta ** 2 * n_a * shift
+
+            with np.errstate(invalid='ignore'):
+                self.arrays[f'{col}_min'][ids] = np.fmin(self.arrays[f'{col}_min'][ids], reduce(np.fmin, values))
+                self.arrays[f'{col}_max'][ids] = np.fmax(self.arrays[f'{col}_max'][ids], reduce(np.fmax, values))
+
+        race_points = batch['RacePoints'].to_numpy(np.float64, na_value=np.nan)
+        self.arrays['RacePoints_max'][ids] = np.fmax(self.arrays['RacePoints_max'][ids],
+                                                     reduce(np.fmax, race_points))
+        stint_length = batch['StintLength'].to_numpy(np.float64, na_value=np.nan)
+        known = ~np.isnan(stint_length)
+        self.arrays['StintLength_n'][ids] += np.bincount(codes[known], minlength=n_groups)
+        self.arrays['StintLength_sum'][ids] += np.bincount(codes[known], weights=stint_length[known],
+                                                           minlength=n_groups)
+        positions_gained = batch['PositionsGained'].to_numpy(np.float64, na_value=np.nan)
+        known = ~np.isnan(positions_gained)
+        self.arrays['PositionsGained_sum'][ids] += np.bincount(codes[known], weights=positions_gained[known],
+                                                               minlength=n_groups)
+
+        # float32 values as stored, like the in-memory groupby
+        median = pd.Series(batch['DegradationPct'].to_numpy(np.float32, na_value=np.nan)).groupby(codes).median()
+        self.arrays['DegradationPct_median'][ids] = median.reindex(range(n_groups)).to_numpy(np.float64)
+
+    def to_frame(self):
+        keys = list(self.group_ids)
+        driver_race_stats = pd.DataFrame(keys, columns=group_keys)
+        state = {name: array[:self.size] for name, array in self.arrays.items()}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for col, stats in moment_columns.items():
+                n = state[f'{col}_n']
+                for stat in stats:
+                    if stat == 'mean':
+                        driver_race_stats[f'{col}_mean'] = np.where(n > 0, state[f'{col}_mean'], np.nan)
+                    elif stat == 'std':
+                        driver_race_stats[f'{col}_std'] = np.where(n > 1, np.sqrt(state[f'{col}_m2'] / (n - 1)),
+                                                                   np.nan)
+                    else:
+                        driver_race_stats[f'{col}_{stat}'] = state[f'{col}_{stat}']
+                if col == 'DegradationPct':
+                    driver_race_stats['DegradationPct_median'] = state['DegradationPct_median']
+
+            driver_race_stats['RacePoints_max'] = state['RacePoints_max']
+            driver_race_stats['StintLength_mean'] = np.where(state['StintLength_n'] > 0, state['StintLength_sum']
+                                                             / state['StintLength_n'], np.nan)
+            driver_race_stats['PositionsGained_sum'] = state['PositionsGained_sum']
+
+        # Same key dtypes and row order as the in-memory groupby
+        driver_race_stats = driver_race_stats.astype({'Driver': 'category', 'Race': 'category',
+                                                      'Year': 'int16', 'Compound': 'category'})
+        return driver_race_stats.sort_values(group_keys, ignore_index=True)
+
+
+@profiled('prepare_features_streaming', rows='output')
+def prepare_features_streaming(batches):
+    # Single-pass equivalent of prepare_features over an iterable of tire matrix batches
+    # (e.g. iter_tire_matrix partitions, or read_csv chunks holding whole races, as each
+    # batch's stints are fitted on their own). Memory is O(groups), plus one batch.
+    #
+    # Tolerance: means, stds, mins, maxes and sums match prepare_features to within 1e-6 of
+    # each column's largest magnitude, the float32 precision of the tire matrix (accumulators
+    # and results here are float64, so means near zero can differ from the float32 ones).
+    # DegradationPct_median is exact.
+    accumulator = FeatureAccumulator()
+    for batch in batches:
+        accumulator.add(add_degradation_fit(batch))
+
+    return add_derived_features(accumulator.to_frame())
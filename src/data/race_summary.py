@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.profiling import profiled
+
+# Per-(Driver, Year, Race) summary of the tire matrix: everything driver ranking needs, in
+# one row per driver and race instead of one per lap. Races are keyed by year as well as
+# name, as most Grands Prix keep their name from season to season. The race result columns
+# come from the driver's first record in the race, and degradation is kept as sums and
+# counts so races can be added or replaced without touching the rest
+
+race_keys = ['Driver', 'Race', 'Year']
+race_result_columns = ['RacePoints', 'FinishPosition', 'StartingPosition']
+
+
+@profiled('driver_race_summary')
+def driver_race_summary(tire_matrix):
+    results = tire_matrix.drop_duplicates(subset=race_keys)[race_keys + race_result_columns]
+
+    # Sums are accumulated in float64 so they can be combined across races without drift
+    laps = tire_matrix[race_keys + ['Stint']].assign(
+        SmoothedDeg=tire_matrix['SmoothedDeg'].astype(np.float64),
+        DegradationPct=tire_matrix['DegradationPct'].astype(np.float64))
+    sums = laps.groupby(race_keys, observed=True, sort=False).agg(
+        SmoothedDeg_sum=('SmoothedDeg', 'sum'),
+        SmoothedDeg_count=('SmoothedDeg', 'count'),
+        DegradationPct_sum=('DegradationPct', 'sum'),
+        DegradationPct_count=('DegradationPct', 'count'),
+        Stints=('Stint', 'count')
+    ).reset_index()
+
+    return plain_keys(results).merge(plain_keys(sums), on=race_keys, how='left', sort=False)
+
+
+def update_driver_race_summary(summary, tire_records):
+    # Replace the rows of any (Year, Race) in tire_records (e.g. a re-collected race) and
+    # append the rest
+    new_rows = driver_race_summary(tire_records)
+    updated = set(zip(new_rows['Year'].astype(int), new_rows['Race']))
+    kept = summary[[key not in updated for key in zip(summary['Year'].astype(int), summary['Race'].astype(str))]]
+    if kept.empty:
+        return new_rows
+    return pd.concat([kept, new_rows], ignore_index=True)
+
+
+def plain_keys(frame):
+    # Categories differ between tire matrices, so keys are kept as plain strings
+    return frame.astype({'Driver': str, 'Race': str})
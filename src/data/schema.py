@@ -0,0 +1,49 @@
+import pandas as pd
+
+from dataclasses import dataclass, field, fields
+
+
+# Each field's metadata holds its compact tire matrix dtype: categoricals for the
+# string keys, narrow integers for lap and position columns (nullable where FastF1
+# can leave them missing) and float32 for times and degradation
+@dataclass
+class TireRecord:
+    Driver: str = field(metadata={'dtype': 'category'})
+    Race: str = field(metadata={'dtype': 'category'})
+    Year: int = field(metadata={'dtype': 'int16'})
+    LapNumber: int = field(metadata={'dtype': 'int8'})
+    Stint: int = field(metadata={'dtype': 'int8'})
+    StintLapNumber: int = field(metadata={'dtype': 'int8'})
+    LapTime: float = field(metadata={'dtype': 'float32'})
+    Compound: str = field(metadata={'dtype': 'category'})
+    BaselineTime: float = field(metadata={'dtype': 'float32'})
+    DegradationPct: float = field(metadata={'dtype': 'float32'})
+    SmoothedDeg: float = field(metadata={'dtype': 'float32'})
+    PositionsGained: int = field(metadata={'dtype': 'Int8'})
+    RacePoints: float = field(metadata={'dtype': 'float32'})
+    StintLength: int = field(metadata={'dtype': 'int8'})
+    FinishPosition: int = field(metadata={'dtype': 'Int8'})
+    StartingPosition: int = field(metadata={'dtype': 'Int8'})
+
+
+TIRE_MATRIX_SCHEMA = {f.name: f.metadata['dtype'] for f in fields(TireRecord)}
+
+
+def apply_schema(tire_matrix):
+    # Cast whichever TireRecord columns are present to their compact dtypes, skipping the
+    # ones that already have them (e.g. partitions read back from the store)
+    dtypes = {col: dtype for col, dtype in TIRE_MATRIX_SCHEMA.items() if col in tire_matrix.columns}
+    casts = {col: dtype for col, dtype in dtypes.items() if tire_matrix[col].dtype != dtype}
+    tire_matrix = tire_matrix.astype(casts) if casts else tire_matrix.copy()
+
+    # Categories of concatenated or projected frames may include unused values
+    for col, dtype in dtypes.items():
+        if dtype == 'category':
+            tire_matrix[col] = tire_matrix[col].cat.remove_unused_categories()
+
+    return tire_matrix
+
+
+def empty_tire_matrix(columns=None):
+    columns = columns or list(TIRE_MATRIX_SCHEMA)
+    return apply_schema(pd.DataFrame(columns=columns))
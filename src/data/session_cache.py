@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import session_cache_path
+from src.data.tire_store import race_slug
+from src.utils.helpers import load_race, load_race_slim
+
+# Slim session extracts: the laps, results and track_status columns that process_race
+# reads, stored per race as one Feather file per frame under
+# <root>/<year>/<race slug>_<session>/. A race is loaded with FastF1 once, without
+# telemetry or weather, and later collections (e.g. after PROCESSING_VERSION changes) read
+# the extract from local disk instead of deserializing the whole session again:
+#
+#   collect_data(years, session_loader=SessionCache('data/raw/sessions'))
+#
+# extract.json is written after the frames and marks the extract complete; extracts of
+# another EXTRACT_VERSION are loaded again
+
+# Bump whenever session_columns or the stored types change
+EXTRACT_VERSION = 1
+
+session_columns = {
+    'laps': ['Driver', 'LapNumber', 'Stint', 'LapTime', 'LapStartTime', 'Time', 'PitInTime', 'PitOutTime',
+             'Compound', 'Deleted', 'Position'],
+    'results': ['Abbreviation', 'GridPosition', 'Position', 'Points'],
+    'track_status': ['Time', 'Status', 'Message'],
+}
+
+
+class SessionExtract:
+    # The part of a FastF1 session used to build tire records
+
+    def __init__(self, laps, results, track_status):
+        self.laps = laps
+        self.results = results
+        self.track_status = track_status
+
+
+def extract_session(session):
+    # Plain DataFrames: FastF1's Laps and SessionResults subclasses do not survive Feather
+    frames = {name: pd.DataFrame(getattr(session, name)[columns]).reset_index(drop=True)
+              for name, columns in session_columns.items()}
+    # Deleted is missing (None) for laps FastF1 could not check; stored the way
+    # valid_lap_mask reads it, as Feather would turn None into False
+    frames['laps']['Deleted'] = frames['laps']['Deleted'].astype(bool)
+    return SessionExtract(frames['laps'], frames['results'], frames['track_status'])
+
+
+def extract_path(root, year, race_name, session_name):
+    return Path(root) / str(year) / f"{race_slug(race_name)}_{session_name}"
+
+
+def read_extract(path):
+    # The stored extract, or None when it is missing, incomplete or of another version
+    try:
+        with open(path / 'extract.json') as f:
+            if json.load(f).get('version') != EXTRACT_VERSION:
+                return None
+    except FileNotFoundError:
+        return None
+    return SessionExtract(*(pd.read_feather(path / f"{name}.feather") for name in session_columns))
+
+
+def write_extract(path, extract):
+    path.mkdir(parents=True, exist_ok=True)
+    for name in session_columns:
+        tmp_path = path / f"{name}.feather.tmp"
+        getattr(extract, name).to_feather(tmp_path)
+        tmp_path.replace(path / f"{name}.feather")
+    with open(path / 'extract.json', 'w') as f:
+        json.dump({'version': EXTRACT_VERSION}, f)
+
+
+class SessionCache:
+    # Session loader returning stored extracts, and loading, extracting and storing the
+    # sessions it does not have yet with loader. Picklable, so worker processes can use it
+
+    def __init__(self, root=session_cache_path, loader=load_race_slim):
+        self.root = root
+        self.loader = loader
+
+    def __call__(self, year, grand_prix, session_name):
+        path = extract_path(self.root, year, grand_prix, session_name)
+        extract = read_extract(path)
+        if extract is None:
+            extract = extract_session(self.loader(year, grand_prix, session_name))
+            write_extract(path, extract)
+        return extract
+
+
+def race_loader(root=session_cache_path):
+    # The FastF1 session loader to collect with: through the extract cache at root, or
+    # full session loads when root is None
+    return load_race if root is None else SessionCache(root)
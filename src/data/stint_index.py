@@ -0,0 +1,241 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import stint_curve_points, stint_index_min_laps, stint_length_weight
+from src.data.schema import apply_schema
+from src.data.tire_store import partition_key, read_manifest, store_entries, write_manifest
+from src.utils.profiling import profiled, stage
+
+# Nearest-neighbour index of stint degradation curves, for "which stints degraded most like
+# this one" queries. Each stint's SmoothedDeg is resampled at n_points evenly spaced
+# fractions of the stint (lap 1 to StintLength, so laps dropped as invalid are
+# interpolated over, and before its first or after its last valid lap the curve is held
+# at that lap's value), and its StintLength times length_weight is appended, giving one
+# vector per stint. Under <root>/:
+#
+#   stints.parquet          one row per stint: Year, Race, Driver, Stint, Compound,
+#                           StintLength and Laps (valid laps)
+#   vectors.npy             the stints' vectors, float32, in stints.parquet row order
+#   manifest.json           the tire store partitions covered, with their version and the
+#                           curve parameters they were indexed with
+#
+# When races are added (or reprocessed) only their stints are computed; changing the
+# parameters (or STINT_INDEX_VERSION) reindexes every race. There is no search tree:
+# queries scan the vectors of the candidate stints. Five seasons hold about 1.4k stints
+# per compound, and a KD-tree only beats the scan somewhere between 14k and 70k: per
+# query, the tree takes 0.5 ms and the scan 0.3 ms at 14k stints, and 0.3 ms against
+# 2 ms at 70k (src/benchmarks/stint_index_benchmark.py). Add a tree only past that size
+
+# Increment when the curves change for the same parameters, to reindex every race
+STINT_INDEX_VERSION = 2
+
+stint_columns = ['Year', 'Race', 'Driver', 'Stint', 'Compound', 'StintLength', 'Laps']
+
+
+def index_params(n_points=stint_curve_points, length_weight=stint_length_weight, min_laps=stint_index_min_laps):
+    return {'points': n_points, 'length_weight': length_weight, 'min_laps': min_laps,
+            'version': STINT_INDEX_VERSION}
+
+
+def resample_curves(stint_ids, stint_lap, stint_length, values, n_points):
+    # SmoothedDeg of each stint at n_points fractions of its length, for laps sorted by stint
+    # and lap. Stints are laid end to end on one axis (stint id * 2 + fraction), and each
+    # stint's fractions are clipped to the range of its valid laps, so a single np.interp
+    # call resamples them all without interpolating across stints
+    fraction = (stint_lap - 1) / np.maximum(stint_length - 1, 1)
+    starts = np.r_[0, np.flatnonzero(np.diff(stint_ids)) + 1]
+    low = np.minimum.reduceat(fraction, starts)[:, None]
+    high = np.maximum.reduceat(fraction, starts)[:, None]
+    grid = (stint_ids[starts, None] * 2 + np.clip(np.linspace(0, 1, n_points), low, high)).ravel()
+    return np.interp(grid, stint_ids * 2 + fraction, values).reshape(len(starts), n_points)
+
+
+def stint_curves(partition, n_points=stint_curve_points, min_laps=stint_index_min_laps):
+    # The stints of a tire store partition with at least min_laps valid laps, and their curves
+    laps = partition.dropna(subset=['SmoothedDeg']).sort_values(['Driver', 'Stint', 'StintLapNumber'])
+    if laps.empty:
+        return pd.DataFrame(columns=stint_columns), np.empty((0, n_points))
+    stint_ids = laps.groupby(['Driver', 'Stint'], sort=False, observed=True).ngroup().to_numpy()
+    first = np.r_[0, np.flatnonzero(np.diff(stint_ids)) + 1]
+
+    stints = laps.iloc[first][['Year', 'Race', 'Driver', 'Stint', 'Compound', 'StintLength']].reset_index(drop=True)
+    stints['Laps'] = np.bincount(stint_ids, minlength=len(first)).astype(np.int16)
+    curves = resample_curves(stint_ids, laps['StintLapNumber'].to_numpy(np.float64),
+                             laps['StintLength'].to_numpy(np.float64), laps['SmoothedDeg'].to_numpy(np.float64),
+                             n_points)
+
+    keep = stints['Laps'].to_numpy() >= min_laps
+    return stints[keep].reset_index(drop=True), curves[keep]
+
+
+def stint_vectors(curves, stint_length, length_weight=stint_length_weight):
+    return np.column_stack([curves, np.asarray(stint_length, dtype=np.float64) * length_weight]).astype(np.float32)
+
+
+def write_array(path, array):
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    tmp_path.replace(path)
+
+
+def stale_stint_races(root, tire_store_path, years=None, params=None):
+    # Tire store partitions not indexed, indexed from another version or with other parameters
+    params = params or index_params()
+    manifest = read_manifest(root)
+    indexed = [(entry, manifest.get(partition_key(entry['year'], entry['race']), {}))
+               for entry in store_entries(tire_store_path, years)]
+    return [entry for entry, done in indexed
+            if done.get('version') != entry['version'] or done.get('params') != params]
+
+
+@profiled('update_stint_index')
+def update_stint_index(root, tire_store_path, years=None, n_points=stint_curve_points,
+                       length_weight=stint_length_weight, min_laps=stint_index_min_laps):
+    # Index the stints of stale races, replacing any stints indexed for them before. Returns
+    # the number of races indexed
+    root = Path(root)
+    params = index_params(n_points, length_weight, min_laps)
+    entries = stale_stint_races(root, tire_store_path, years, params)
+    if not entries:
+        return 0
+
+    manifest = read_manifest(root)
+    stints, vectors = read_stints(root)
+    # Indexed with other parameters, every stint has to be recomputed
+    if any(entry.get('params') != params for entry in manifest.values()):
+        manifest = {}
+        stints, vectors = stints.iloc[:0], vectors[:0, :0]
+
+    new_stints, new_vectors = [], []
+    with stage('stint_curves', races=len(entries)):
+        for entry in entries:
+            partition = apply_schema(pd.read_parquet(Path(tire_store_path) / entry['path']))
+            race_stints, curves = stint_curves(partition, n_points, min_laps)
+            new_stints.append(race_stints)
+            new_vectors.append(stint_vectors(curves, race_stints['StintLength'], length_weight))
+            manifest[partition_key(entry['year'], entry['race'])] = {
+                'year': entry['year'],
+                'race': entry['race'],
+                'version': entry['version'],
+                'params': params,
+                'stints': len(race_stints),
+            }
+
+    # Stints of the races indexed again are replaced
+    updated = {(entry['year'], entry['race']) for entry in entries}
+    keys = list(zip(stints['Year'].astype(int), stints['Race'].astype(str)))
+    kept = np.array([key not in updated for key in keys], dtype=bool)
+
+    frames = [frame for frame in [stints[kept]] + new_stints if len(frame)]
+    stints = apply_schema(pd.concat(frames, ignore_index=True)[stint_columns] if frames
+                          else pd.DataFrame(columns=stint_columns)).astype({'Laps': 'int16'})
+    vectors = np.concatenate([vectors[kept].reshape(-1, n_points + 1)] + new_vectors)
+
+    root.mkdir(parents=True, exist_ok=True)
+    write_array(root / 'vectors.npy', vectors)
+    tmp_path = root / 'stints.parquet.tmp'
+    stints.to_parquet(tmp_path, index=False)
+    tmp_path.replace(root / 'stints.parquet')
+
+    write_manifest(root, manifest)
+    print(f"Stint index: {len(entries)} races indexed, {len(stints)} stints in total")
+    return len(entries)
+
+
+def read_stints(root):
+    # Indexed stints and their vectors (memory-mapped), empty when nothing is indexed yet
+    stints_path = Path(root) / 'stints.parquet'
+    if not stints_path.exists():
+        return pd.DataFrame(columns=stint_columns), np.empty((0, 0), dtype=np.float32)
+    return pd.read_parquet(stints_path), np.load(Path(root) / 'vectors.npy', mmap_mode='r')
+
+
+def open_stint_index(root):
+    # The persisted index, or None when nothing is indexed
+    stints, vectors = read_stints(root)
+    if stints.empty:
+        return None
+    params = next(iter(read_manifest(root).values()))['params']
+    return StintIndex(stints, np.asarray(vectors), params)
+
+
+class StintIndex:
+    # k-nearest-neighbour queries over the indexed stints, scanning the vectors of the
+    # candidate stints (all, one compound's, one race's or both)
+
+    def __init__(self, stints, vectors, params):
+        self.stints = stints
+        self.vectors = vectors
+        self.params = params
+        keys = zip(stints['Year'].astype(int), stints['Race'].astype(str), stints['Driver'].astype(str),
+                   stints['Stint'].astype(int))
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.race_rows = stints.groupby(stints['Race'].astype(str), sort=False).indices
+        self.compounds = stints['Compound'].astype(str).to_numpy()
+        # Candidates are ranked in float64 by |x|² - 2 x·v (the squared distance to v, less
+        # |v|²), one matrix-vector product over their vectors, kept per compound
+        self.matrix = vectors.astype(np.float64)
+        self.norms = (self.matrix ** 2).sum(axis=1)
+        self.all = (np.arange(len(self.matrix)), self.matrix, self.norms)
+        self.by_compound = {}
+        for compound in np.unique(self.compounds):
+            rows = np.flatnonzero(self.compounds == compound)
+            self.by_compound[compound] = (rows, self.matrix[rows], self.norms[rows])
+
+    def __len__(self):
+        return len(self.stints)
+
+    def vector(self, smoothed_deg, stint_length=None):
+        # Query vector of a curve given as the SmoothedDeg of consecutive stint laps 1, 2, ...
+        values = np.asarray(smoothed_deg, dtype=np.float64)
+        stint_length = stint_length or len(values)
+        curve = resample_curves(np.zeros(len(values), dtype=np.int64), np.arange(1, len(values) + 1),
+                                np.full(len(values), stint_length), values, self.params['points'])
+        return stint_vectors(curve, [stint_length], self.params['length_weight'])[0]
+
+    def stint_vector(self, year, race, driver, stint):
+        key = (int(year), str(race), str(driver), int(stint))
+        if key not in self.rows:
+            raise KeyError(f"No indexed stint {stint} of {driver} in {year} {race}")
+        return self.rows[key], self.vectors[self.rows[key]]
+
+    def candidates(self, compound=None, race=None):
+        # Rows, vectors and squared norms of the stints a query compares against
+        if race is None:
+            if compound is None:
+                return self.all
+            return self.by_compound.get(str(compound), (np.empty(0, dtype=np.int64), self.matrix[:0], self.norms[:0]))
+        rows = self.race_rows.get(str(race), np.empty(0, dtype=np.int64))
+        if compound is not None:
+            rows = rows[self.compounds[rows] == str(compound)]
+        return rows, self.matrix[rows], self.norms[rows]
+
+    def query(self, vector, k=10, compound=None, race=None, exclude=None):
+        # The k stints nearest to vector (with a Distance column), optionally only on one
+        # compound and/or race, leaving out the stint at row exclude. Ties are returned in
+        # row order
+        vector = np.asarray(vector, dtype=np.float64)
+        n = k + (exclude is not None)
+        rows, matrix, norms = self.candidates(compound, race)
+        if len(rows) > n:
+            nearest = np.argpartition(norms - 2 * (matrix @ vector), n - 1)[:n]
+            rows, matrix = rows[nearest], matrix[nearest]
+        distances = np.sqrt(((matrix - vector) ** 2).sum(axis=1))
+        order = np.lexsort((rows, distances))
+        rows, distances = rows[order], distances[order]
+
+        keep = rows != exclude
+        result = self.stints.iloc[rows[keep][:k]].reset_index(drop=True)
+        result['Distance'] = distances[keep][:k]
+        return result
+
+    def similar_stints(self, year, race, driver, stint, k=10, compound='same', in_race=None):
+        # The k stints that degraded most like a given one, on its compound unless compound
+        # is another compound or None (any)
+        row, vector = self.stint_vector(year, race, driver, stint)
+        if compound == 'same':
+            compound = self.compounds[row]
+        return self.query(vector, k, compound=compound, race=in_race, exclude=row)
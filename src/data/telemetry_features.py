@@ -0,0 +1,153 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.data.prepare_features import group_keys
+from src.data.telemetry_store import open_telemetry
+from src.utils.profiling import profiled
+
+# Where on the lap the tires fall off: every lap in the telemetry store is cut into n_bins
+# equal shares of its distance, and the mean speed (and throttle, brake use) in each bin
+# is regressed on the lap's age within its stint. The slopes, in km/h per lap, are then
+# summarised per (Driver, Race, Year, Compound) like prepare_features' output:
+#
+#   SpeedDeg_mean       mean slope over the whole lap
+#   SpeedDeg_corner     mean slope in the slowest quarter of the track's bins (corners)
+#   SpeedDeg_straight   mean slope in the fastest quarter of the bins (straights)
+#   SpeedDeg_worst      slope of the bin losing speed fastest
+#   SpeedDeg_s1..s3     mean slope in each third of the lap, standing in for sectors
+#   ThrottleDeg_mean    mean throttle slope (% per lap)
+#   BrakeDeg_mean       mean slope of the share of samples on the brake
+#   TelemetryLaps       laps the slopes are fitted on
+#
+# Races are read one at a time through the store's memory maps, so a whole season never
+# has to be in memory
+
+speed_degradation_columns = ['SpeedDeg_mean', 'SpeedDeg_corner', 'SpeedDeg_straight', 'SpeedDeg_worst',
+                             'SpeedDeg_s1', 'SpeedDeg_s2', 'SpeedDeg_s3']
+telemetry_feature_columns = speed_degradation_columns + ['ThrottleDeg_mean', 'BrakeDeg_mean', 'TelemetryLaps']
+
+
+def binned_lap_profiles(index, channels, n_bins):
+    # Mean Speed, Throttle and Brake in each distance bin of each lap (laps x n_bins arrays,
+    # NaN for empty bins). index Offsets point into the given channel arrays
+    lengths = index['Length'].to_numpy(np.int64)
+    offsets = index['Offset'].to_numpy(np.int64)
+    gather = np.repeat(offsets - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+    lap = np.repeat(np.arange(len(index)), lengths)
+
+    distance = np.asarray(channels['Distance'])[gather].astype(np.float64)
+    lap_length = np.zeros(len(index))
+    has_samples = lengths > 0
+    np.maximum.at(lap_length, lap, distance)
+    share = distance / np.where(lap_length > 0, lap_length, 1)[lap]
+    cell = lap * n_bins + np.minimum((share * n_bins).astype(np.int64), n_bins - 1)
+
+    counts = np.bincount(cell, minlength=len(index) * n_bins)
+    profiles = {}
+    for name in ('Speed', 'Throttle', 'Brake'):
+        values = np.asarray(channels[name])[gather].astype(np.float64)
+        sums = np.bincount(cell, weights=values, minlength=len(index) * n_bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profile = (sums / counts).reshape(len(index), n_bins)
+        profile[~has_samples] = np.nan
+        profiles[name] = profile
+    return profiles
+
+
+def stint_slopes(stint_lap, stint_starts, profile, min_laps=3):
+    # Least-squares slope of each bin's profile on the stint lap number, per stint.
+    # Rows are laps grouped by stint (stint_starts are the first row of each stint);
+    # bins with fewer than min_laps laps give NaN
+    x = np.broadcast_to(stint_lap[:, None].astype(np.float64), profile.shape)
+    known = ~np.isnan(profile)
+    x = np.where(known, x, 0)
+    y = np.where(known, profile, 0)
+
+    n = np.add.reduceat(known.astype(np.float64), stint_starts, axis=0)
+    sx = np.add.reduceat(x, stint_starts, axis=0)
+    sy = np.add.reduceat(y, stint_starts, axis=0)
+    sxx = np.add.reduceat(x * x, stint_starts, axis=0)
+    sxy = np.add.reduceat(x * y, stint_starts, axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slopes = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    slopes[(n < min_laps) | ~np.isfinite(slopes)] = np.nan
+    return slopes
+
+
+def race_telemetry_features(index, channels, n_bins=30, min_laps=3):
+    # Per-stint degradation features of one race's laps
+    index = index.sort_values(['Driver', 'Stint', 'LapNumber'], kind='stable').reset_index(drop=True)
+    profiles = binned_lap_profiles(index, channels, n_bins)
+
+    stint_key = index['Driver'].astype(str) + '/' + index['Stint'].astype(str)
+    stint_starts = np.flatnonzero(np.r_[True, stint_key.to_numpy()[1:] != stint_key.to_numpy()[:-1]])
+    stint_lap = index['StintLapNumber'].to_numpy()
+    slopes = {name: stint_slopes(stint_lap, stint_starts, profile, min_laps) for name, profile in profiles.items()}
+
+    # Corners and straights are the track's slowest and fastest bins over all laps of the race
+    # (all-NaN bins and stints only give NaN features)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        track_speed = np.nanmean(profiles['Speed'], axis=0)
+        low, high = np.nanpercentile(track_speed, [25, 75])
+        speed = slopes['Speed']
+        sectors = np.array_split(np.arange(n_bins), 3)
+
+        features = index.loc[stint_starts, group_keys].reset_index(drop=True)
+        features['SpeedDeg_mean'] = np.nanmean(speed, axis=1)
+        features['SpeedDeg_corner'] = np.nanmean(speed[:, track_speed <= low], axis=1)
+        features['SpeedDeg_straight'] = np.nanmean(speed[:, track_speed >= high], axis=1)
+        features['SpeedDeg_worst'] = np.nanmin(speed, axis=1)
+        for number, bins in enumerate(sectors, start=1):
+            features[f'SpeedDeg_s{number}'] = np.nanmean(speed[:, bins], axis=1)
+        features['ThrottleDeg_mean'] = np.nanmean(slopes['Throttle'], axis=1)
+        features['BrakeDeg_mean'] = np.nanmean(slopes['Brake'], axis=1)
+
+    features['TelemetryLaps'] = np.diff(np.r_[stint_starts, len(index)])
+    return features
+
+
+@profiled('telemetry_features', rows='output')
+def telemetry_features(root, years=None, n_bins=30, min_laps=3):
+    # Degradation features per (Driver, Race, Year, Compound), averaging a driver's stints
+    # on the same compound weighted by their laps
+    index, channels = open_telemetry(root, years)
+    if index is None or index.empty:
+        return pd.DataFrame(columns=group_keys + telemetry_feature_columns)
+
+    frames = []
+    for _, race_index in index.groupby(['Year', 'Race'], observed=True, sort=False):
+        # A race's samples are one contiguous block of the channel files
+        start = int(race_index['Offset'].min())
+        end = int((race_index['Offset'] + race_index['Length']).max())
+        block = {name: np.asarray(channel[start:end]) for name, channel in channels.items()}
+        frames.append(race_telemetry_features(race_index.assign(Offset=race_index['Offset'] - start), block,
+                                              n_bins, min_laps))
+    stints = pd.concat(frames, ignore_index=True)
+
+    # Laps-weighted mean over stints, ignoring stints where a feature is missing
+    weights = stints['TelemetryLaps'].astype(np.float64)
+    weighted = pd.DataFrame({col: stints[col] * weights for col in telemetry_feature_columns[:-1]})
+    present = pd.DataFrame({col: stints[col].notna() * weights for col in telemetry_feature_columns[:-1]})
+    keys = [stints[key].astype(str) if key != 'Year' else stints[key].astype(int) for key in group_keys]
+    totals = weighted.groupby(keys, sort=False).sum(min_count=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features = totals / present.groupby(keys, sort=False).sum().replace(0, np.nan)
+    features['TelemetryLaps'] = weights.groupby(keys, sort=False).sum().astype(int)
+    return features.reset_index()
+
+
+def join_telemetry_features(modeling_data, features):
+    # prepare_features output with the telemetry features of each row's
+    # (Driver, Race, Year, Compound) added; NaN where there is no telemetry
+    features = features.set_index(group_keys)
+    keys = pd.MultiIndex.from_arrays([modeling_data[key].astype(str) if key != 'Year' else
+                                      modeling_data[key].astype(int) for key in group_keys])
+    joined = features.reindex(keys)
+    modeling_data = modeling_data.copy()
+    for col in telemetry_feature_columns:
+        modeling_data[col] = joined[col].to_numpy() if col in joined else np.nan
+    return modeling_data
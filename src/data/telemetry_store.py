@@ -0,0 +1,253 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.schema import apply_schema
+from src.data.tire_store import partition_key, read_manifest, write_manifest
+from src.utils.helpers import enable_cache, load_race
+from src.utils.profiling import profiled, stage
+
+# Memory-mapped telemetry store: the car data samples of every valid stint lap in the tire
+# metrics store, one flat binary file per channel under <root>/ (<channel>.bin), plus
+# index.parquet locating each (Year, Race, Driver, LapNumber) as an Offset and Length
+# into those files, and manifest.json recording which tire store partitions are covered.
+# A race's laps are appended in one block, so a race (or a lap) is read back by slicing
+# np.memmap views without loading the rest of the store
+
+# Channels and their on-disk dtypes; Distance is metres from the start of the lap
+telemetry_channels = {'Distance': 'float32', 'Speed': 'float32', 'Throttle': 'float32', 'Brake': 'bool'}
+
+# Tire store columns describing each lap in the index
+lap_columns = ['Driver', 'LapNumber', 'Stint', 'StintLapNumber', 'Compound']
+
+
+def extract_lap_telemetry(session, records):
+    # Car data samples of the laps in records (a tire store partition: valid stint laps only).
+    # Returns the lap index, with Offset relative to the start of the returned arrays, and
+    # one array per channel with the laps' samples back to back in records order
+    laps = session.laps.drop_duplicates(['Driver', 'LapNumber']).set_index(['Driver', 'LapNumber'])
+    keys = pd.MultiIndex.from_arrays([records['Driver'].astype(str), records['LapNumber'].astype(float)])
+    lap_info = laps[['DriverNumber', 'LapStartTime', 'Time']].reindex(keys)
+
+    lap_start = lap_info['LapStartTime'].values.astype('timedelta64[ns]')
+    lap_end = lap_info['Time'].values.astype('timedelta64[ns]')
+    first = np.zeros(len(records), dtype=np.int64)
+    lengths = np.zeros(len(records), dtype=np.int64)
+    samples = []
+    sample_base = 0
+
+    # Samples within [LapStartTime, Time) of each lap, found per driver by binary search
+    for number, rows in pd.Series(np.arange(len(records))).groupby(lap_info['DriverNumber'].values, sort=False):
+        car_data = session.car_data.get(number)
+        if car_data is None:
+            continue
+        times = car_data['SessionTime'].values.astype('timedelta64[ns]')
+        rows = rows.values
+        known = ~np.isnat(lap_start[rows]) & ~np.isnat(lap_end[rows])
+        lo = np.searchsorted(times, lap_start[rows], side='left')
+        hi = np.searchsorted(times, lap_end[rows], side='left')
+        first[rows] = sample_base + lo
+        lengths[rows] = np.where(known, hi - lo, 0)
+        samples.append(car_data)
+        sample_base += len(car_data)
+
+    offsets = np.cumsum(lengths) - lengths
+    if samples:
+        car_data = pd.concat(samples, ignore_index=True)
+    else:
+        car_data = pd.DataFrame({'SessionTime': pd.Series(dtype='timedelta64[ns]'), 'Speed': [], 'Throttle': [],
+                                 'Brake': []})
+    gather = np.repeat(first - offsets, lengths) + np.arange(lengths.sum())
+
+    seconds = car_data['SessionTime'].values.astype('timedelta64[ns]')[gather].astype(np.int64) / 1e9
+    speed = car_data['Speed'].to_numpy(np.float64)[gather]
+    channels = {
+        'Distance': lap_distance(seconds, speed, offsets, lengths),
+        'Speed': speed,
+        'Throttle': car_data['Throttle'].to_numpy(np.float64)[gather],
+        'Brake': car_data['Brake'].to_numpy(bool)[gather],
+    }
+
+    index = pd.DataFrame({col: records[col].values for col in lap_columns})
+    index['Offset'] = offsets
+    index['Length'] = lengths
+    return index, {name: channels[name].astype(dtype) for name, dtype in telemetry_channels.items()}
+
+
+def lap_distance(seconds, speed, offsets, lengths):
+    # Distance covered since the start of each lap, integrating speed (km/h) over time
+    # with the trapezoidal rule, restarting at 0 at every lap's first sample
+    increments = np.r_[0.0, (speed[1:] + speed[:-1]) / 2 / 3.6 * np.diff(seconds)]
+    starts = offsets[lengths > 0]
+    increments[starts] = 0
+    distance = np.cumsum(increments)
+    return distance - np.repeat(distance[starts], lengths[lengths > 0])
+
+
+def read_telemetry_index(root):
+    index_path = Path(root) / 'index.parquet'
+    if not index_path.exists():
+        return None
+    return pd.read_parquet(index_path)
+
+
+def write_telemetry_index(root, index):
+    index_path = Path(root) / 'index.parquet'
+    tmp_path = index_path.with_suffix('.parquet.tmp')
+    index.to_parquet(tmp_path, index=False)
+    tmp_path.replace(index_path)
+
+
+def channel_path(root, name):
+    return Path(root) / f"{name}.bin"
+
+
+def open_telemetry(root, years=None):
+    # The lap index and a read-only np.memmap per channel; nothing is read until sliced
+    index = read_telemetry_index(root)
+    if index is None:
+        return None, {}
+    if years is not None:
+        index = index[index['Year'].isin(years)].reset_index(drop=True)
+
+    channels = {}
+    for name, dtype in telemetry_channels.items():
+        path = channel_path(root, name)
+        size = path.stat().st_size if path.exists() else 0
+        channels[name] = np.memmap(path, dtype=dtype, mode='r') if size else np.empty(0, dtype=dtype)
+    return index, channels
+
+
+def lap_telemetry(root, year, race_name, driver, lap_number):
+    # Samples of one lap, read through the memory maps
+    index, channels = open_telemetry(root, [year])
+    match = index[(index['Race'] == race_name) & (index['Driver'] == driver) & (index['LapNumber'] == lap_number)]
+    if match.empty:
+        raise KeyError(f"No telemetry for {driver} lap {lap_number} of {year} {race_name}")
+    offset, length = int(match['Offset'].iloc[0]), int(match['Length'].iloc[0])
+    return pd.DataFrame({name: np.asarray(channel[offset:offset + length]) for name, channel in channels.items()})
+
+
+def append_races(root, collected, versions):
+    # Append each (year, race name, index, channels) block to the channel files and point
+    # the index at it. Laps of a race collected again replace the old ones in the index;
+    # their old samples stay in the files until compact_telemetry
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(root)
+    old_index = read_telemetry_index(root)
+    frames = [] if old_index is None else [old_index]
+    replaced = set()
+
+    base = channel_length(root)
+    for year, race_name, index, channels in collected:
+        for name, dtype in telemetry_channels.items():
+            with open(channel_path(root, name), 'ab') as f:
+                f.write(np.ascontiguousarray(channels[name], dtype=dtype).tobytes())
+
+        index = index.assign(Year=year, Race=race_name, Offset=index['Offset'] + base)
+        frames.append(index)
+        replaced.add((year, race_name))
+        base += int(index['Length'].sum())
+
+        manifest[partition_key(year, race_name)] = {
+            'year': year,
+            'race': race_name,
+            'version': versions[(year, race_name)],
+            'laps': len(index),
+            'samples': int(index['Length'].sum()),
+        }
+
+    if not replaced:
+        return 0
+    if old_index is not None:
+        keys = pd.MultiIndex.from_arrays([old_index['Year'].astype(int), old_index['Race'].astype(str)])
+        frames[0] = old_index[~keys.isin(list(replaced))]
+
+    write_telemetry_index(root, telemetry_index_frame(pd.concat(frames, ignore_index=True)))
+    write_manifest(root, manifest)
+    return len(replaced)
+
+
+def telemetry_index_frame(index):
+    index = apply_schema(index[['Year', 'Race'] + lap_columns + ['Offset', 'Length']])
+    return index.astype({'Offset': 'int64', 'Length': 'int32'})
+
+
+def channel_length(root):
+    path = channel_path(root, 'Distance')
+    if not path.exists():
+        return 0
+    return path.stat().st_size // np.dtype(telemetry_channels['Distance']).itemsize
+
+
+def compact_telemetry(root):
+    # Rewrite the channel files keeping only the samples the index points at
+    index, channels = open_telemetry(root)
+    if index is None:
+        return
+    gather = np.repeat(index['Offset'].to_numpy() - (np.cumsum(index['Length']) - index['Length']).to_numpy(),
+                       index['Length'].to_numpy()) + np.arange(index['Length'].sum())
+
+    for name, channel in channels.items():
+        tmp_path = channel_path(root, name).with_suffix('.bin.tmp')
+        np.asarray(channel)[gather].tofile(tmp_path)
+        tmp_path.replace(channel_path(root, name))
+
+    index['Offset'] = (np.cumsum(index['Length']) - index['Length']).astype('int64')
+    write_telemetry_index(root, index)
+
+
+def stale_telemetry(root, tire_store_path, years=None):
+    # Tire store partitions without telemetry, or whose laps were processed by another version
+    manifest = read_manifest(root)
+    entries = sorted(read_manifest(tire_store_path).values(), key=lambda entry: (entry['year'], entry['order']))
+    return [entry for entry in entries
+            if (years is None or entry['year'] in years) and
+            manifest.get(partition_key(entry['year'], entry['race']), {}).get('version') != entry['version']]
+
+
+def telemetry_race(task):
+    # Worker entry point: the lap index and channel arrays of one race, or the error
+    year, race_name, records, session_loader = task
+    try:
+        with stage('load_race', year=year, race=race_name):
+            session = session_loader(year, race_name, 'R')
+        with stage('extract_lap_telemetry', rows=len(records), year=year, race=race_name):
+            index, channels = extract_lap_telemetry(session, records)
+        return year, race_name, index, channels, None
+    except Exception as error:
+        return year, race_name, None, None, f"{type(error).__name__}: {error}"
+
+
+@profiled('collect_telemetry')
+def collect_telemetry(years, tire_store_path, root, n_workers=1, session_loader=load_race):
+    # Extract telemetry for the stored races that don't have it yet. Sessions are loaded
+    # again (from the FastF1 cache) so tire metrics collection doesn't pay for telemetry
+    entries = stale_telemetry(root, tire_store_path, years)
+    print(f"Collecting telemetry for {len(entries)} races")
+    tasks = [(entry['year'], entry['race'],
+              pd.read_parquet(Path(tire_store_path) / entry['path'], columns=lap_columns), session_loader)
+             for entry in entries]
+    versions = {(entry['year'], entry['race']): entry['version'] for entry in entries}
+
+    if not tasks:
+        return 0
+
+    # Races are appended as they arrive, so only a few are held in memory at a time
+    if n_workers > 1:
+        initializer = enable_cache if session_loader is load_race else None
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=initializer) as executor:
+            return append_races(root, successful(executor.map(telemetry_race, tasks)), versions)
+    return append_races(root, successful(map(telemetry_race, tasks)), versions)
+
+
+def successful(results):
+    for year, race_name, index, channels, error in results:
+        print(f"Telemetry for {year} {race_name}")
+        if error is None:
+            yield year, race_name, index, channels
+        else:
+            print(f"  Failed: {error}")
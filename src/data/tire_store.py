@@ -0,0 +1,141 @@
+import json
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from src.data.race_summary import driver_race_summary, update_driver_race_summary
+from src.data.schema import apply_schema, empty_tire_matrix
+from src.utils.profiling import profiled
+
+# Partitioned tire-metrics store: one Parquet file per (Year, Race) under
+# <root>/<year>/, plus manifest.json recording what has been processed and
+# with which processing version, and driver_race_summary.parquet with one
+# row per (Driver, Race) for ranking
+
+
+def read_manifest(root):
+    manifest_path = Path(root) / 'manifest.json'
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def write_manifest(root, manifest):
+    manifest_path = Path(root) / 'manifest.json'
+    tmp_path = manifest_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(manifest_path)
+
+
+def partition_key(year, race_name):
+    return f"{year}/{race_name}"
+
+
+def race_slug(race_name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', race_name).strip('_')
+
+
+def stale_races(root, races, version):
+    # (year, race name) pairs that are missing from the store or were processed by another version
+    manifest = read_manifest(root)
+    return [(year, race_name) for year, race_name in races
+            if manifest.get(partition_key(year, race_name), {}).get('version') != version]
+
+
+def write_races(root, collected, version, schedule):
+    # Store each (year, race name, records) partition and record it in the manifest.
+    # schedule maps (year, race name) to the race's position in its season for ordering.
+    # Nothing is written when collected is empty, so an up-to-date store is left untouched
+    manifest = read_manifest(root)
+    summary = load_driver_race_summary(root)
+    written = 0
+
+    for year, race_name, records in collected:
+        order = schedule[(year, race_name)]
+        path = Path(str(year)) / f"{order:02d}_{race_slug(race_name)}.parquet"
+
+        (Path(root) / path).parent.mkdir(parents=True, exist_ok=True)
+        apply_schema(records).to_parquet(Path(root) / path, index=False)
+        summary = update_driver_race_summary(summary, records)
+
+        manifest[partition_key(year, race_name)] = {
+            'year': year,
+            'race': race_name,
+            'order': order,
+            'path': path.as_posix(),
+            'rows': len(records),
+            'version': version,
+            'written': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        written += 1
+
+    if not written:
+        return
+    Path(root).mkdir(parents=True, exist_ok=True)
+    write_driver_race_summary(root, summary)
+    write_manifest(root, manifest)
+
+
+@profiled('load_driver_race_summary', rows='output')
+def load_driver_race_summary(root, years=None):
+    # Built from the partitions when the store predates the summary
+    summary_path = Path(root) / 'driver_race_summary.parquet'
+    if summary_path.exists():
+        summary = pd.read_parquet(summary_path)
+    elif read_manifest(root):
+        summary = pd.concat([driver_race_summary(partition) for partition in iter_tire_matrix(root)],
+                            ignore_index=True)
+        write_driver_race_summary(root, summary)
+    else:
+        return driver_race_summary(empty_tire_matrix())
+
+    if years is not None:
+        summary = summary[summary['Year'].isin(years)].reset_index(drop=True)
+    return summary
+
+
+def write_driver_race_summary(root, summary):
+    summary_path = Path(root) / 'driver_race_summary.parquet'
+    tmp_path = summary_path.with_suffix('.parquet.tmp')
+    summary.to_parquet(tmp_path, index=False)
+    tmp_path.replace(summary_path)
+
+
+def store_entries(root, years=None):
+    # Manifest entries of the partitions of the requested years, in season order
+    entries = sorted(read_manifest(root).values(), key=lambda entry: (entry['year'], entry['order']))
+    return [entry for entry in entries if years is None or entry['year'] in years]
+
+
+@profiled('load_tire_matrix', rows='output')
+def load_tire_matrix(root, years=None, columns=None):
+    # Read only the partitions of the requested years, and only the requested columns
+    frames = [pd.read_parquet(Path(root) / entry['path'], columns=columns) for entry in store_entries(root, years)]
+    if not frames:
+        return empty_tire_matrix(columns)
+
+    # Categories differ between partitions, so the schema is applied again after concatenating
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+
+def iter_tire_matrix(root, years=None, columns=None):
+    # Yield one schema-applied partition at a time, for streaming consumers
+    for entry in store_entries(root, years):
+        yield apply_schema(pd.read_parquet(Path(root) / entry['path'], columns=columns))
+
+
+def import_csv(csv_path, root, version):
+    # Split a monolithic tire_metrics.csv into per-race partitions
+    tire_matrix = pd.read_csv(csv_path)
+    collected = [(int(year), race_name, records.reset_index(drop=True))
+                 for (year, race_name), records in tire_matrix.groupby(['Year', 'Race'], sort=False)]
+
+    schedule = {}
+    for year, race_name, _ in collected:
+        schedule[(year, race_name)] = sum(1 for key in schedule if key[0] == year)
+
+    write_races(root, collected, version, schedule)
@@ -1,78 +1,112 @@
-import pandas as pd
-
-from src.analysis.rank_drivers import analyze_best_driver, plot_driver_rankings
-from src.data.collect_data import collect_data
-from src.analysis.train_model import train_and_evaluate_model
+from src.analysis.rank_drivers import rank_drivers, driver_ranking_charts
+from src.analysis.charts import render_charts
+from src.data.collect_data import collect_data, PROCESSING_VERSION
+from src.data.session_cache import race_loader
+from src.data.tire_store import load_driver_race_summary, read_manifest, import_csv
+from src.analysis.train_model import train_and_evaluate_model, model_predictors
+from src.analysis.incremental import update_models
+from src.analysis.backtest import rolling_origin_backtest
+from src.analysis.weight_sweep import random_weights, weight_sweep
+from src.analysis.bootstrap import bootstrap_rankings
 from src.utils.helpers import enable_cache
-from src.data.prepare_features import prepare_features
-from src.config import collect_new_data, years, train_years, test_years, use_weights
+from src.data.feature_store import cached_features
+from src.data.telemetry_store import collect_telemetry
+from src.data.stint_index import update_stint_index
+from src.config import (collect_new_data, tire_store_path, years, train_years, test_years, use_weights,
+                        run_backtest, backtest_workers, headless_plots, plot_workers, weight_sweep_vectors,
+                        weight_sweep_top_n, bootstrap_replicates, bootstrap_workers, bootstrap_seed, profile_report,
+                        profile_memory, cprofile_stage, cprofile_path, collect_telemetry_data, telemetry_store_path,
+                        collection_workers, incremental_training, build_stint_index, stint_index_path)
+from src.utils.profiling import run_profiled
 from pathlib import Path
 
 
 def main():
     enable_cache()
-    data_path = Path('data/processed/tire_metrics.csv')
+    store_path = Path(tire_store_path)
+    legacy_csv_path = Path('data/processed/tire_metrics.csv')
+
+    # Partition a tire_metrics.csv from before the store existed
+    if not read_manifest(store_path) and legacy_csv_path.exists():
+        import_csv(legacy_csv_path, store_path, PROCESSING_VERSION)
 
     if collect_new_data:
-        tire_matrix = collect_data(years)
-        tire_matrix.to_csv(data_path, index=False)
-    else:
-        tire_matrix = pd.read_csv(data_path)
+        collect_data(years, store=store_path, session_loader=race_loader())
 
-    # Prepare features
-    modeling_data = prepare_features(tire_matrix)
+    # Distance-binned degradation from car telemetry, for the races that have it
+    if collect_telemetry_data:
+        collect_telemetry(years, store_path, telemetry_store_path, collection_workers)
+
+    # Nearest-neighbour index of stint degradation curves, for the races added since the last run
+    if build_stint_index:
+        update_stint_index(stint_index_path, store_path, years)
+
+    # Prepare features, reused from the feature store while the store's races are unchanged
+    modeling_data = cached_features(store_path, years, telemetry=collect_telemetry_data)
 
     # Split into train and test
-    train_data = modeling_data[modeling_data['Race'].str.contains('|'.join(map(str, train_years)))].copy()
-    test_data = modeling_data[modeling_data['Race'].str.contains('|'.join(map(str, test_years)))].copy()
-
-    # Define predictors
-    predictors = [
-        'SmoothedDeg_mean',
-        'SmoothedDeg_std',
-        'LapTime_mean',
-        'LapTime_std',
-        'LapTime_min',
-        'DegradationPct_mean',
-        'DegradationPct_max',
-        'DegradationPct_median',
-        'RelativePerformance',
-        'PositionsGained'
-    ]
-
-    # Add tire compound dummy variables
-    tire_columns = [col for col in modeling_data.columns if col.startswith('Tire_')]
-    predictors.extend(tire_columns)
+    train_data = modeling_data[modeling_data['Year'].isin(train_years)].copy()
+    test_data = modeling_data[modeling_data['Year'].isin(test_years)].copy()
+
+    # Define predictors, with tire compound dummy variables
+    predictors = model_predictors(modeling_data)
 
     # Define target
     target_stint_length = 'StintLength'
     target_race_points = 'RacePoints'
 
-    # Train and evaluate model
-    train_and_evaluate_model(train_data, test_data, predictors, target_stint_length)
-    train_and_evaluate_model(train_data, test_data, predictors, target_race_points)
+    # In headless mode every chart is collected and rendered together at the end
+    charts = [] if headless_plots else None
+
+    # Train and evaluate model, or update the persisted models with the races added since the last run
+    for target in [target_stint_length, target_race_points]:
+        if incremental_training:
+            update_models(train_data, test_data, predictors, target)
+        else:
+            train_and_evaluate_model(train_data, test_data, predictors, target, charts=charts)
+
+    if run_backtest:
+        for target in [target_stint_length, target_race_points]:
+            print()
+            print(f"Rolling-origin backtest (target = {target}):")
+            print(rolling_origin_backtest(modeling_data, predictors, target, years, backtest_workers).to_string())
 
     # NEW: Analyze best drivers
     print("====================")
     print("BEST DRIVER ANALYSIS")
     print("====================")
 
-    # Overall driver rankings
-    driver_rankings = analyze_best_driver(tire_matrix, weighted=use_weights)
+    # Overall driver rankings, from the per-(Driver, Race) summary kept up to date by the store
+    race_summary = load_driver_race_summary(store_path, years)
+    driver_rankings = rank_drivers(race_summary, weighted=use_weights)
 
     # Display top 20 drivers
     print("\nTop 20 Drivers (Overall Performance):")
     print(driver_rankings[['Driver', 'CompositeScore', 'PointsPerRace',
                            'DegradationPct', 'AvgPositionsGained']].head(20))
 
-    # Visualize the driver rankings
-    plot_driver_rankings(driver_rankings, top_n=20)
+    if weight_sweep_vectors > 0:
+        _, stability = weight_sweep(driver_rankings, random_weights(weight_sweep_vectors), weight_sweep_top_n)
+        print(f"\nRank stability across {weight_sweep_vectors} random weight vectors:")
+        print(stability.head(20).round(3).to_string())
+
+    if bootstrap_replicates > 0:
+        intervals = bootstrap_rankings(race_summary, bootstrap_replicates, weighted=use_weights,
+                                       seed=bootstrap_seed, n_workers=bootstrap_workers)
+        print(f"\n95% bootstrap intervals ({bootstrap_replicates} resamples of each driver's races):")
+        print(intervals.head(20).round(3).to_string())
 
-    # Visualize top drivers with radar charts
-    plot_driver_rankings(driver_rankings, top_n=6, radar=True)
+    # Visualize the driver rankings, and top drivers with radar charts
+    ranking_charts = (driver_ranking_charts(driver_rankings, top_n=20) +
+                      driver_ranking_charts(driver_rankings, top_n=6, radar=True))
+
+    if headless_plots:
+        render_charts(charts + ranking_charts, headless=True, n_workers=plot_workers)
+    else:
+        render_charts(ranking_charts)
 
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main, profile_report, profile_memory, cprofile_stage, cprofile_path)
     print()
     print("Execution Done")
@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.rank_drivers import normalized_metrics, rank_drivers, ranking_weights
+from src.config import service_cache_size, stint_index_path, tire_store_path
+from src.data.prepare_features import prepare_features, tire_matrix_columns
+from src.data.stint_index import open_stint_index
+from src.data.tire_store import load_driver_race_summary, load_tire_matrix
+
+# In-process query API over the tire matrix, the prepare_features output and the store's
+# driver race summary, as used by the HTTP service in src/service/server.py:
+#
+#   service = QueryService('data/processed/tire_metrics')
+#   service.degradation_curve(driver='VER', compound='SOFT', year=2023)
+#   service.top_drivers(10, weights={'PointsPerRace': 0.6, 'FinishPosition': 0.4})
+#   service.similar_stints(2023, 'Bahrain Grand Prix', 'VER', 2, k=10)
+#
+# Rows are located through indexes built once per load: for each of Driver, Race,
+# Compound and Year, the row positions holding each value. Results are kept in a bounded
+# LRU cache keyed by the query and its parameters. Similar stints come from the persisted
+# stint index (src/data/stint_index.py) when it exists. The store's manifest and summary
+# file, and the stint index's manifest, are checked (at most every check_interval seconds)
+# before answering, and the data is reloaded and the cache emptied when they change.
+# Results are shared with the cache, so callers should treat them as read-only
+
+index_columns = ['Driver', 'Race', 'Compound', 'Year']
+
+# Columns of prepare_features output summarised by driver_stats
+driver_stat_columns = ['SmoothedDeg_mean', 'DegradationPct_mean', 'DegSlope_mean', 'LapTime_min', 'RacePoints',
+                       'StintLength', 'PositionsGained']
+
+# Metrics weighted by top_drivers, by their names without the _Normalized suffix
+ranking_metrics = {metric.removesuffix('_Normalized'): metric for metric in normalized_metrics}
+
+
+class LRUCache:
+    # Bounded mapping dropping the least recently used entry when full; thread-safe
+
+    def __init__(self, maxsize=service_cache_size):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None, count_miss=True):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += count_miss
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def build_indexes(frame):
+    # {column: {value: sorted row positions}} for the index columns present in frame
+    return {col: {key: positions.astype(np.int32) for key, positions in
+                  frame.groupby(frame[col].astype(str) if col != 'Year' else frame[col].astype(int),
+                                sort=False).indices.items()}
+            for col in index_columns if col in frame.columns}
+
+
+def select(frame, indexes, filters):
+    # Rows of frame matching every (column, value) filter, intersecting the smallest sets first
+    filters = {col: value for col, value in filters.items() if value is not None}
+    if not filters:
+        return frame
+    position_sets = sorted((indexes[col].get(value, np.empty(0, dtype=np.int32)) for col, value in filters.items()),
+                           key=len)
+    positions = position_sets[0]
+    for other in position_sets[1:]:
+        positions = np.intersect1d(positions, other, assume_unique=True)
+    return frame.iloc[positions]
+
+
+def records(frame):
+    # JSON-ready rows: plain Python values, None for missing
+    return [{col: (None if pd.isna(value) else value.item() if hasattr(value, 'item') else value)
+             for col, value in row.items()} for row in frame.to_dict('records')]
+
+
+class QueryService:
+
+    def __init__(self, store_path=tire_store_path, years=None, cache_size=service_cache_size, check_interval=1.0,
+                 stint_index_path=stint_index_path):
+        self.store_path = Path(store_path)
+        self.stint_index_path = Path(stint_index_path) if stint_index_path else None
+        self.years = years
+        self.cache = LRUCache(cache_size)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.version = None
+        self.latest_version = None
+        self.checked_at = float('-inf')
+        self.load()
+
+    def data_version(self):
+        # Changes whenever the store writes races (manifest) or the driver race summary, or
+        # the stint index is updated
+        files = [self.store_path / 'manifest.json', self.store_path / 'driver_race_summary.parquet']
+        if self.stint_index_path:
+            files.append(self.stint_index_path / 'manifest.json')
+        return tuple((stat.st_mtime_ns, stat.st_size) if (stat := file_stat(path)) else None for path in files)
+
+    def load(self):
+        version = self.data_version()
+        tire_matrix = load_tire_matrix(self.store_path, self.years, columns=tire_matrix_columns)
+        modeling_data = prepare_features(tire_matrix)
+        summary = load_driver_race_summary(self.store_path, self.years)
+        stint_index = open_stint_index(self.stint_index_path) if self.stint_index_path else None
+
+        # Swapped in as one tuple so concurrent queries see either the old or the new data
+        self.data = (tire_matrix, build_indexes(tire_matrix), modeling_data, build_indexes(modeling_data),
+                     summary, build_indexes(summary), stint_index)
+        self.version = version
+        self.cache.clear()
+
+    def refresh(self, reload=True):
+        # True when the store changed since the last load, reloading it unless reload is
+        # False. The store is checked at most every check_interval seconds
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            self.latest_version = self.data_version()
+        if self.latest_version == self.version:
+            return False
+        if reload:
+            with self.lock:
+                if self.latest_version != self.version:
+                    self.load()
+        return True
+
+    def query(self, name, **params):
+        # Result of the named query, e.g. query('degradation_curve', driver='VER'), from the
+        # cache when possible
+        if name not in queries:
+            raise KeyError(f"Unknown query '{name}'")
+        self.refresh()
+        key = (name, self.version, cache_key(params))
+        result = self.cache.get(key)
+        if result is None:
+            result = queries[name](self, **params)
+            self.cache.put(key, result)
+        return result
+
+    def cached(self, name, **params):
+        # The cached result of the query, or None when it has to be computed or the data
+        # has to be reloaded first (cheap enough to call from an event loop)
+        if name not in queries:
+            raise KeyError(f"Unknown query '{name}'")
+        if self.refresh(reload=False):
+            return None
+        # A miss is counted when the query is then computed
+        return self.cache.get((name, self.version, cache_key(params)), count_miss=False)
+
+    def degradation_curve(self, driver=None, compound=None, year=None, race=None):
+        return self.query('degradation_curve', driver=driver, compound=compound, year=year, race=race)
+
+    def driver_stats(self, driver, year=None):
+        return self.query('driver_stats', driver=driver, year=year)
+
+    def top_drivers(self, n=10, weights=None, years=None):
+        return self.query('top_drivers', n=n, weights=weights, years=years)
+
+    def similar_stints(self, year, race, driver, stint, k=10, compound='same', in_race=None):
+        return self.query('similar_stints', year=year, race=race, driver=driver, stint=stint, k=k,
+                          compound=compound, in_race=in_race)
+
+
+def file_stat(path):
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
+
+
+def cache_key(params):
+    # Hashable, order-independent form of the query parameters
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(sorted(freeze(item) for item in value))
+        return value
+    return freeze(params)
+
+
+def degradation_curve(service, driver=None, compound=None, year=None, race=None):
+    # Mean SmoothedDeg and DegradationPct by lap of the stint, over the matching laps
+    tire_matrix, indexes = service.data[:2]
+    laps = select(tire_matrix, indexes, {'Driver': driver, 'Compound': compound, 'Year': year, 'Race': race})
+
+    stint_lap = laps['StintLapNumber'].to_numpy(np.int64)
+    counts = np.bincount(stint_lap)
+    present = np.flatnonzero(counts)
+    curve = pd.DataFrame({'StintLapNumber': present, 'Laps': counts[present]})
+    for col in ['SmoothedDeg', 'DegradationPct']:
+        values = laps[col].to_numpy(np.float64)
+        known = ~np.isnan(values)
+        sums = np.bincount(stint_lap[known], weights=values[known], minlength=len(counts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curve[col] = (sums / np.bincount(stint_lap[known], minlength=len(counts)))[present]
+
+    return {'driver': driver, 'compound': compound, 'year': year, 'race': race, 'laps': int(len(laps)),
+            'curve': records(curve)}
+
+
+def driver_stats(service, driver, year=None):
+    # prepare_features rows of a driver, averaged per compound
+    _, _, modeling_data, indexes = service.data[:4]
+    rows = select(modeling_data, indexes, {'Driver': driver, 'Year': year})
+    if rows.empty:
+        raise KeyError(f"No data for driver '{driver}'")
+
+    by_compound = rows.groupby(rows['Compound'].astype(str))
+    stats = by_compound[driver_stat_columns].mean()
+    stats.insert(0, 'Races', by_compound['Race'].nunique())
+    return {'driver': driver, 'year': year, 'races': int(rows['Race'].nunique()),
+            'compounds': records(stats.reset_index())}
+
+
+def top_drivers(service, n=10, weights=None, years=None):
+    # Drivers by CompositeScore, over the races of the given years, with custom metric
+    # weights ({metric: weight}, metrics missing from it weigh 0) or the configured ones
+    rankings = ranked_drivers(service, years)
+    if weights:
+        unknown = set(weights) - set(ranking_metrics)
+        if unknown:
+            raise ValueError(f"Unknown ranking metrics {sorted(unknown)}, expected {list(ranking_metrics)}")
+        weight_vector = np.array([float(weights.get(metric, 0)) for metric in ranking_metrics])
+    else:
+        weight_vector = np.array([ranking_weights()[metric] for metric in normalized_metrics])
+
+    scores = rankings[normalized_metrics].to_numpy(np.float64) @ weight_vector
+    order = np.argsort(-scores, kind='stable')[:n]
+    top = rankings.iloc[order][['Driver', 'PointsPerRace', 'SmoothedDeg', 'FinishPosition', 'StartingPosition',
+                                'AvgPositionsGained', 'RacesParticipated']].astype({'Driver': str})
+    top.insert(1, 'CompositeScore', scores[order])
+    top.insert(0, 'Rank', np.arange(1, len(top) + 1))
+    return {'years': sorted(years) if years else None, 'weights': dict(zip(ranking_metrics, weight_vector.tolist())),
+            'drivers': records(top)}
+
+
+def ranked_drivers(service, years=None):
+    # rank_drivers over the summary rows of the given years, cached like query results
+    key = ('ranked_drivers', service.version, cache_key(years))
+    rankings = service.cache.get(key)
+    if rankings is None:
+        summary, indexes = service.data[4:6]
+        if years:
+            summary = pd.concat([select(summary, indexes, {'Year': int(year)}) for year in years])
+        rankings = rank_drivers(summary)
+        service.cache.put(key, rankings)
+    return rankings
+
+
+def similar_stints(service, year, race, driver, stint, k=10, compound='same', in_race=None):
+    # The k indexed stints whose degradation curves are nearest to the given stint's, on its
+    # compound by default (compound=None searches all compounds), optionally in one race
+    stint_index = service.data[6]
+    if stint_index is None:
+        raise KeyError("No stint index, build it with: python -m src.cli stints")
+    neighbours = stint_index.similar_stints(year, race, driver, stint, k, compound, in_race)
+    return {'year': year, 'race': race, 'driver': driver, 'stint': stint, 'compound': compound,
+            'stints': records(neighbours.astype({'Race': str, 'Driver': str, 'Compound': str}))}
+
+
+queries = {'degradation_curve': degradation_curve, 'driver_stats': driver_stats, 'top_drivers': top_drivers,
+           'similar_stints': similar_stints}
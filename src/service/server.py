@@ -0,0 +1,153 @@
+import asyncio
+import json
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from src.service.queries import ranking_metrics
+
+# Minimal asyncio HTTP/1.1 service (GET only, keep-alive) answering QueryService queries
+# as JSON. Cached answers are returned straight from the event loop; other queries run in
+# its default thread pool, so a slow cache miss does not hold up other clients:
+#
+#   GET /degradation-curve?driver=VER&compound=SOFT&year=2023
+#   GET /driver-stats?driver=VER&year=2023
+#   GET /top-drivers?n=10&years=2023,2024&PointsPerRace=0.6&FinishPosition=0.4
+#   GET /similar-stints?year=2023&race=Bahrain%20Grand%20Prix&driver=VER&stint=2&k=10
+#                                                # also compound=any|SOFT|..., in_race=...
+#   GET /cache                                   # cache size, hits and misses
+#   GET /health
+
+
+def degradation_curve_params(params):
+    return {'driver': params.get('driver'), 'compound': upper(params.get('compound')),
+            'year': optional_int(params.get('year')), 'race': params.get('race')}
+
+
+def driver_stats_params(params):
+    if 'driver' not in params:
+        raise ValueError("driver is required")
+    return {'driver': params['driver'], 'year': optional_int(params.get('year'))}
+
+
+def top_drivers_params(params):
+    unknown = set(params) - {'n', 'years'} - set(ranking_metrics)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}, weights are given as {list(ranking_metrics)}")
+    weights = {metric: float(params[metric]) for metric in ranking_metrics if metric in params}
+    years = params.get('years')
+    return {'n': int(params.get('n', 10)), 'weights': weights or None,
+            'years': [int(year) for year in years.split(',')] if years else None}
+
+
+def similar_stints_params(params):
+    missing = [name for name in ('year', 'race', 'driver', 'stint') if name not in params]
+    if missing:
+        raise ValueError(f"{', '.join(missing)} required")
+    compound = params.get('compound', 'same').lower()
+    return {'year': int(params['year']), 'race': params['race'], 'driver': params['driver'],
+            'stint': int(params['stint']), 'k': int(params.get('k', 10)),
+            'compound': None if compound == 'any' else 'same' if compound == 'same' else compound.upper(),
+            'in_race': params.get('in_race')}
+
+
+routes = {
+    '/degradation-curve': ('degradation_curve', degradation_curve_params),
+    '/driver-stats': ('driver_stats', driver_stats_params),
+    '/top-drivers': ('top_drivers', top_drivers_params),
+    '/similar-stints': ('similar_stints', similar_stints_params),
+}
+
+
+def upper(value):
+    return value.upper() if value else value
+
+
+def optional_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+async def answer(service, target):
+    # (status, body) for a request target such as /driver-stats?driver=VER
+    url = urlsplit(target)
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    if url.path == '/health':
+        return 200, {'status': 'ok'}
+    if url.path == '/cache':
+        return 200, service.cache.stats()
+    if url.path not in routes:
+        return 404, {'error': f"Unknown path {url.path}", 'paths': list(routes) + ['/cache', '/health']}
+
+    name, parse = routes[url.path]
+    try:
+        params = parse(params)
+        result = service.cached(name, **params)
+        if result is None:
+            result = await asyncio.get_running_loop().run_in_executor(None, partial(service.query, name, **params))
+        return 200, result
+    except (KeyError, ValueError) as error:
+        return 400, {'error': str(error.args[0]) if error.args else type(error).__name__}
+    except Exception as error:
+        return 500, internal_error(target, error)
+
+
+def internal_error(target, error):
+    # Body of a 500 answer; the details are only printed, not sent to the client
+    print(f"Query {target} failed: {type(error).__name__}: {error}")
+    return {'error': f"Internal error ({type(error).__name__})"}
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode('latin-1').split()
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if method != 'GET':
+                status, body = 405, {'error': "Only GET is supported"}
+            else:
+                status, body = await answer(service, target)
+
+            keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+            try:
+                payload = json.dumps(body).encode()
+            except Exception as error:
+                status, payload = 500, json.dumps(internal_error(target, error)).encode()
+            writer.write(f"HTTP/1.1 {status} {reason(status)}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+def reason(status):
+    return {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}[status]
+
+
+async def start_server(service, host, port):
+    return await asyncio.start_server(partial(handle_connection, service), host, port)
+
+
+def serve(service, host, port):
+    async def run():
+        server = await start_server(service, host, port)
+        print(f"Serving queries on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -13,6 +13,14 @@ def load_race(year, grand_prix, session):
     return race
 
 
+def load_race_slim(year, grand_prix, session):
+    # Lap-level data only, skipping car telemetry and weather. Race control messages are
+    # still loaded, as FastF1 derives the laps' Deleted flags from them
+    race = fastf1.get_session(year, grand_prix, session)
+    race.load(laps=True, telemetry=False, weather=False, messages=True)
+    return race
+
+
 def get_races(year):
     events = fastf1.get_event_schedule(year)
     races = []
@@ -49,6 +57,21 @@ def is_valid_lap(index, stint_laps, sc_vsc_periods=None):
     return True
 
 
+def valid_lap_mask(laps, sc_vsc_intervals=None):
+    # Vectorized equivalent of is_valid_lap over a whole laps frame
+    mask = ((laps['LapNumber'] != 1) &
+            laps['PitInTime'].isnull() &
+            laps['PitOutTime'].isnull() &
+            laps['LapTime'].notnull() &
+            ~laps['Deleted'].astype(bool))
+
+    # If SC/VSC intervals are provided, drop laps affected by them
+    if sc_vsc_intervals is not None:
+        mask &= ~neutralised_lap_mask(laps, sc_vsc_intervals)
+
+    return mask
+
+
 def calculate_baseline(stint_laps, valid_indices):
     # Get the first 3 valid laps of the stint
     initial_valid_laps = stint_laps.loc[valid_indices[:3]].copy()
@@ -77,6 +100,24 @@ def calculate_baseline(stint_laps, valid_indices):
     return baseline
 
 
+def calculate_baselines(lap_times, stint_ids):
+    # Vectorized equivalent of calculate_baseline for every stint at once.
+    # lap_times holds the valid lap times in ns, stint_ids the stint each lap belongs to
+    laps = pd.DataFrame({'LapTime': lap_times, 'StintId': stint_ids})
+    initial = laps[laps.groupby('StintId', sort=False).cumcount() < 3]
+    stats = initial.groupby('StintId', sort=False)['LapTime'].agg(['first', 'median', 'std'])
+
+    # Fastest non-outlier lap from the first 3 valid laps, or the median if all are outliers
+    deviation = (initial['LapTime'] - initial['StintId'].map(stats['median'])).abs()
+    inlier = deviation <= 1.5 * initial['StintId'].map(stats['std'])
+    fastest_inlier = initial['LapTime'].where(inlier).groupby(initial['StintId'], sort=False).min()
+
+    outlier = (stats['first'] - stats['median']).abs() > 1.5 * stats['std']
+    baseline = stats['first'].where(~outlier, fastest_inlier.fillna(stats['median']))
+
+    return baseline.reindex(stint_ids).values
+
+
 def extract_sc_vsc_periods(track_status):
     sc_vsc_periods = []
     current_period = {"active": False, "start_time": None}
@@ -95,3 +136,45 @@ def extract_sc_vsc_periods(track_status):
         sc_vsc_periods.append((current_period["start_time"], pd.Timedelta.max))
 
     return sc_vsc_periods
+
+
+def extract_sc_vsc_intervals(track_status):
+    # Vectorized equivalent of extract_sc_vsc_periods, returning (starts, ends) arrays sorted by start
+    messages = track_status['Message'].astype(str)
+    deployed = messages.str.contains('SCDeployed', regex=False)
+    cleared = messages.str.contains('AllClear', regex=False) & ~deployed
+
+    # A period runs from the last deployment before an AllClear to that AllClear
+    events = track_status.loc[deployed | cleared, 'Time'].values
+    is_deploy = deployed[deployed | cleared].values
+    closes = np.flatnonzero(~is_deploy[1:] & is_deploy[:-1]) + 1
+
+    starts = events[closes - 1]
+    ends = events[closes]
+
+    # Handle still active SC/VSC at the end of the data
+    if len(is_deploy) and is_deploy[-1]:
+        starts = np.append(starts, events[-1])
+        ends = np.append(ends, pd.Timedelta.max.to_timedelta64())
+
+    order = np.argsort(starts, kind='stable')
+    return starts[order].astype('timedelta64[ns]'), ends[order].astype('timedelta64[ns]')
+
+
+def neutralised_lap_mask(laps, sc_vsc_intervals):
+    # True for every lap overlapping an SC/VSC interval, using the same inclusive overlap
+    # rule as is_valid_lap. As there, a missing start or end time never rules out an overlap
+    starts, ends = sc_vsc_intervals
+    lap_start = laps['LapStartTime'].values.astype('timedelta64[ns]')
+    lap_end = laps['Time'].values.astype('timedelta64[ns]')
+
+    if len(starts) == 0:
+        return pd.Series(False, index=laps.index)
+
+    # Number of intervals starting at or before each lap's end, and the latest end among them
+    started = np.where(np.isnat(lap_end), len(starts), np.searchsorted(starts, lap_end, side='right'))
+    latest_end = np.maximum.accumulate(ends)[np.maximum(started - 1, 0)]
+
+    overlaps = (started > 0) & (np.isnat(lap_start) | (latest_end >= lap_start))
+
+    return pd.Series(overlaps, index=laps.index)
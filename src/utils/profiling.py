@@ -0,0 +1,190 @@
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# Lightweight stage instrumentation. Pipeline functions mark their stages with the
+# profiled decorator or the stage context manager; while a Profiler is active each stage
+# is recorded with its wall time, CPU time, rows processed and peak traced memory (above
+# the level at the start of the stage), and otherwise the markers cost next to nothing.
+# Stages run on other threads (e.g. the session prefetch thread) record times only.
+#
+#   with Profiler(cprofile_stage='prepare_features') as profiler:
+#       main()
+#   profiler.write('profile_report.json')   # or .csv
+
+active_profiler = None
+
+
+class Profiler:
+
+    def __init__(self, memory=True, cprofile_stage=None, cprofile_path='profile.prof'):
+        self.memory = memory
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path
+        self.cprofile = cProfile.Profile() if cprofile_stage else None
+        self.records = []
+        self.open_peaks = []
+        self.started_tracing = False
+        self.previous = None
+        self.pid = os.getpid()
+        self.thread = threading.get_ident()
+
+    def __enter__(self):
+        global active_profiler
+        self.thread = threading.get_ident()
+        self.previous, active_profiler = active_profiler, self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info):
+        global active_profiler
+        active_profiler = self.previous
+        if self.started_tracing:
+            tracemalloc.stop()
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(self.cprofile_path)
+
+    def add_records(self, records):
+        # Stages recorded elsewhere, e.g. by a worker process
+        self.records.extend(records)
+
+    def summary(self):
+        # Totals per stage name, in the order stages first ran
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0, 'wall_seconds': 0.0,
+                                                        'cpu_seconds': 0.0, 'rows': 0, 'peak_memory_mb': None})
+            total['calls'] += 1
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            total['rows'] += record['rows'] or 0
+            if record['peak_memory_mb'] is not None:
+                total['peak_memory_mb'] = max(total['peak_memory_mb'] or 0, record['peak_memory_mb'])
+        return list(totals.values())
+
+    def write(self, path):
+        # JSON holds every record plus per-stage totals; CSV one row per record
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == '.csv':
+            import pandas as pd
+            pd.DataFrame(self.records).to_csv(path, index=False)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'stages': self.records}, f, indent=2, default=str)
+        return path
+
+
+@contextmanager
+def stage(name, rows=None, **labels):
+    # Record one run of a stage; the yielded dict can be updated, e.g. with rows once known
+    profiler = current_profiler()
+    record = {'stage': name, **labels, 'rows': rows}
+    if profiler is None:
+        yield record
+        return
+
+    # Traced memory peaks and cProfile are per process and per thread respectively, so
+    # they are only taken on the thread that entered the profiler
+    own_thread = threading.get_ident() == profiler.thread
+    memory = profiler.memory and own_thread
+    if memory:
+        # Peaks of enclosing stages are carried over before the peak is reset for this one
+        current, peak = tracemalloc.get_traced_memory()
+        if profiler.open_peaks:
+            profiler.open_peaks[-1] = max(profiler.open_peaks[-1], peak)
+        tracemalloc.reset_peak()
+        profiler.open_peaks.append(current)
+        start_memory = current
+
+    profile = profiler.cprofile if name == profiler.cprofile_stage and own_thread else None
+    if profile is not None:
+        profile.enable()
+
+    cpu_time = time.process_time if own_thread else time.thread_time
+    start_wall, start_cpu = time.perf_counter(), cpu_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - start_wall
+        record['cpu_seconds'] = cpu_time() - start_cpu
+        if profile is not None:
+            profile.disable()
+
+        record['peak_memory_mb'] = None
+        if memory:
+            peak = max(profiler.open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if profiler.open_peaks:
+                profiler.open_peaks[-1] = max(profiler.open_peaks[-1], peak)
+            record['peak_memory_mb'] = (peak - start_memory) / 2 ** 20
+
+        record['pid'] = os.getpid()
+        profiler.records.append(record)
+
+
+def profiled(name, labels=(), rows='input'):
+    # Decorator form of stage. rows counts the first argument ('input') or the result
+    # ('output'); labels name arguments recorded with the stage, e.g. the target
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_profiler() is None:
+                return func(*args, **kwargs)
+
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            first = next(iter(arguments.values()), None)
+            with stage(name, **{label: arguments.get(label) for label in labels}) as record:
+                if rows == 'input':
+                    record['rows'] = count_rows(first)
+                result = func(*args, **kwargs)
+                if rows == 'output':
+                    record['rows'] = count_rows(result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def count_rows(value):
+    # Frames and lists count their rows, anything else has none
+    return len(value) if hasattr(value, 'shape') or isinstance(value, list) else None
+
+
+def current_profiler():
+    # Forked worker processes inherit the parent's profiler, but record nothing into it
+    if active_profiler is not None and active_profiler.pid == os.getpid():
+        return active_profiler
+    return None
+
+
+def profiling_options():
+    # What a worker process needs to record its own stages for the active profiler
+    profiler = current_profiler()
+    return None if profiler is None else {'memory': profiler.memory}
+
+
+def run_profiled(func, report_path=None, memory=True, cprofile_stage=None, cprofile_path='profile.prof'):
+    # Run func, writing a stage report when report_path is set and cProfile stats of
+    # cprofile_stage when that is set
+    if report_path is None and not cprofile_stage:
+        return func()
+
+    with Profiler(memory and report_path is not None, cprofile_stage, cprofile_path) as profiler:
+        result = func()
+    if report_path is not None:
+        print(f"Profile report written to {profiler.write(report_path)}")
+    if cprofile_stage:
+        print(f"cProfile stats for {cprofile_stage} written to {cprofile_path}")
+    return result
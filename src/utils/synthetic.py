@@ -0,0 +1,188 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+from fastf1.core import Laps
+
+COMPOUNDS = ['SOFT', 'MEDIUM', 'HARD']
+POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+
+
+class SyntheticSession:
+    # Stand-in for a loaded fastf1 Session exposing only what the pipeline reads.
+    # car_data is generated on first access, as most callers only need the laps
+    def __init__(self, laps, results, track_status, seed=0):
+        self.laps = laps
+        self.results = results
+        self.track_status = track_status
+        self.seed = seed
+        self._car_data = None
+
+    @property
+    def car_data(self):
+        if self._car_data is None:
+            self._car_data = make_car_data(self.laps, self.seed)
+        return self._car_data
+
+
+def make_session(seed=0, n_drivers=20, n_laps=57, n_sc_periods=2, max_stops=2, deleted_rate=0.02,
+                 missing_time_rate=0.01):
+    # Realistic laps, results and track_status frames for one race: every driver runs
+    # 1 to max_stops pit stops on random compounds, lap times follow tire wear and fuel
+    # burn, and a share of laps is deleted or has no lap time
+    rng = np.random.default_rng(seed)
+    drivers = [f"D{i:02d}" for i in range(n_drivers)]
+
+    grid = rng.permutation(n_drivers) + 1
+    finish = rng.permutation(n_drivers) + 1
+    results = pd.DataFrame({
+        'Abbreviation': drivers,
+        'GridPosition': grid.astype(float),
+        'Position': finish.astype(float),
+        'Points': [float(POINTS[p - 1]) if p <= len(POINTS) else 0.0 for p in finish],
+    })
+
+    frames = []
+    for d, driver in enumerate(drivers):
+        # Stints with pit laps in between
+        n_stops = rng.integers(1, max_stops + 1)
+        stops = np.sort(rng.choice(np.arange(8, n_laps - 5), size=n_stops, replace=False))
+        lap_numbers = np.arange(1, n_laps + 1)
+        stint = np.searchsorted(stops, lap_numbers, side='left') + 1
+        compound = np.array(COMPOUNDS)[rng.integers(0, len(COMPOUNDS), size=n_stops + 1)][stint - 1]
+
+        stint_start = np.concatenate([[1], stops + 1])[stint - 1]
+        stint_lap = lap_numbers - stint_start
+        lap_time = (90.0 + 0.5 * d / n_drivers
+                    + 0.06 * stint_lap
+                    - 0.03 * lap_numbers
+                    + rng.normal(0, 0.3, size=n_laps))
+        lap_time[0] += 5.0
+        lap_time[np.isin(lap_numbers, stops)] += 20.0
+
+        lap_td = pd.Series(pd.to_timedelta(lap_time, unit='s'))
+        end_time = pd.Timedelta(minutes=60) + lap_td.cumsum()
+        start_time = end_time - lap_td
+
+        in_lap = np.isin(lap_numbers, stops)
+        out_lap = np.isin(lap_numbers, stops + 1)
+        pit_in = end_time.where(in_lap)
+        pit_out = start_time.where(out_lap)
+
+        lap_td[rng.random(n_laps) < missing_time_rate] = pd.NaT
+
+        frames.append(pd.DataFrame({
+            'Driver': driver,
+            'DriverNumber': str(d + 1),
+            'LapNumber': lap_numbers.astype(float),
+            'Stint': stint.astype(float),
+            'LapTime': lap_td.values,
+            'LapStartTime': start_time.values,
+            'Time': end_time.values,
+            'PitInTime': pit_in.values,
+            'PitOutTime': pit_out.values,
+            'Compound': compound,
+            'Deleted': rng.random(n_laps) < deleted_rate,
+            'Position': np.clip(grid[d] + np.cumsum(rng.integers(-1, 2, size=n_laps)), 1, n_drivers).astype(float),
+        }))
+
+    laps = Laps(pd.concat(frames, ignore_index=True))
+
+    track_status = make_track_status(rng, pd.Timedelta(minutes=60), laps['Time'].max(), n_sc_periods)
+
+    return SyntheticSession(laps, results, track_status, seed)
+
+
+def make_car_data(laps, seed=0, sample_rate=4.0, n_corners=10):
+    # fastf1-like car_data: per driver number, SessionTime, Speed (km/h), Throttle (%) and
+    # Brake samples at sample_rate Hz. Every lap follows the same track of n_corners corners
+    # whose minimum speed drops with tire age, some corners much more than others
+    rng = np.random.default_rng([seed, 1])
+    apex = np.sort(rng.uniform(0, 1, n_corners))
+    apex_speed = rng.uniform(80, 220, n_corners)
+    wear_sensitivity = rng.uniform(0, 0.6, n_corners)
+    width = rng.uniform(0.01, 0.03, n_corners)
+
+    car_data = {}
+    for number, driver_laps in laps.groupby('DriverNumber', sort=False):
+        start = driver_laps['LapStartTime'].iloc[0]
+        end = driver_laps['Time'].iloc[-1]
+        session_time = start + pd.to_timedelta(np.arange(0, (end - start).total_seconds(), 1 / sample_rate), unit='s')
+
+        # Lap and fraction of the lap covered at every sample
+        lap = np.clip(np.searchsorted(driver_laps['Time'].values, session_time.values, side='right'),
+                      0, len(driver_laps) - 1)
+        lap_start = driver_laps['LapStartTime'].values[lap]
+        lap_duration = (driver_laps['Time'].values - driver_laps['LapStartTime'].values)[lap]
+        fraction = np.clip((session_time.values - lap_start) / lap_duration, 0, 1)
+
+        stint_start = driver_laps.groupby('Stint')['LapNumber'].transform('min').values[lap]
+        tire_age = driver_laps['LapNumber'].values[lap] - stint_start
+
+        # Each corner pulls speed down towards its apex speed, less so on fresh tires
+        dip = np.zeros(len(fraction))
+        for corner in range(n_corners):
+            apex_now = apex_speed[corner] - wear_sensitivity[corner] * tire_age
+            pull = np.exp(-0.5 * ((fraction - apex[corner]) / width[corner]) ** 2)
+            dip = np.maximum(dip, pull * (310 - apex_now))
+        speed = 310 - dip + rng.normal(0, 1.5, len(fraction))
+
+        slowing = np.r_[np.diff(speed) < -8, False]
+        car_data[number] = pd.DataFrame({
+            'SessionTime': session_time,
+            'Speed': speed,
+            'Throttle': np.clip(100 - dip / 2, 0, 100).round(),
+            'Brake': slowing,
+        })
+
+    return car_data
+
+
+def make_track_status(rng, start, end, n_periods, open_at_end=False):
+    # Track status messages with n_periods SC/VSC neutralisations between start and end,
+    # including Yellow noise, VSCEnding messages and VSC periods upgraded to a full SC
+    bounds = np.sort(rng.uniform(0, 1, size=2 * n_periods)).reshape(-1, 2)
+    times = [start]
+    messages = ['AllClear']
+    for i, (deployed, cleared) in enumerate(bounds):
+        deployed_at = start + (end - start) * deployed
+        cleared_at = start + (end - start) * cleared
+        if rng.random() < 0.3:
+            times.append(deployed_at - (cleared_at - deployed_at) / 4)
+            messages.append('Yellow')
+        kind = 'VSCDeployed' if rng.random() < 0.5 else 'SCDeployed'
+        times.append(deployed_at)
+        messages.append(kind)
+        if kind == 'VSCDeployed' and rng.random() < 0.2:
+            times.append(deployed_at + (cleared_at - deployed_at) / 3)
+            messages.append('SCDeployed')
+        elif kind == 'VSCDeployed':
+            times.append(deployed_at + (cleared_at - deployed_at) * 0.9)
+            messages.append('VSCEnding')
+        if not (open_at_end and i == n_periods - 1):
+            times.append(cleared_at)
+            messages.append('AllClear')
+
+    return pd.DataFrame({
+        'Time': pd.to_timedelta(times),
+        'Status': [{'AllClear': '1', 'Yellow': '2', 'SCDeployed': '4',
+                    'VSCDeployed': '6', 'VSCEnding': '7'}[m] for m in messages],
+        'Message': messages,
+    }).sort_values('Time', kind='stable', ignore_index=True)
+
+
+def make_races(n_races, year=2024):
+    # Like official event names, race names carry the season
+    return [(f"Synthetic Grand Prix {i + 1} {year}", f"Country {i + 1}") for i in range(n_races)]
+
+
+def load_synthetic_race(year, grand_prix, session):
+    # Offline stand-in for load_race; the same race always yields the same session
+    if 'Cancelled' in grand_prix:
+        raise ValueError(f"No {session} session data for {grand_prix}")
+    return make_session(seed=zlib.crc32(f"{year} {grand_prix} {session}".encode()))
+
+
+def get_synthetic_races(year, n_races=22):
+    # Offline stand-in for get_races
+    return make_races(n_races, year)
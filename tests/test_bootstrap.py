@@ -0,0 +1,54 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.bootstrap import bootstrap_chunk, bootstrap_rankings, race_index, replicates_per_chunk
+from src.analysis.rank_drivers import ranking_weights
+from src.data.collect_data import collect_data
+from src.data.race_summary import driver_race_summary
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Bootstrap intervals are reproducible: the same seed gives the same intervals in one
+# process or spread over workers, as every chunk of replicates draws from its own child
+# of SeedSequence(seed), and another seed gives other intervals
+
+n_replicates = 2 * replicates_per_chunk + 100
+
+
+@pytest.fixture(scope='module')
+def summary():
+    # Drivers are ranked from 20 races on
+    with contextlib.redirect_stdout(io.StringIO()):
+        return driver_race_summary(collect_data([2023, 2024], session_loader=load_synthetic_race,
+                                                race_lister=lambda year: get_synthetic_races(year, 11)))
+
+
+@pytest.fixture(scope='module')
+def intervals(summary):
+    return bootstrap_rankings(summary, n_replicates, seed=3, n_workers=1)
+
+
+def test_same_seed_same_intervals_for_any_workers(summary, intervals):
+    assert len(intervals) and intervals['ScoreLower'].notna().all()
+    pd.testing.assert_frame_equal(bootstrap_rankings(summary, n_replicates, seed=3, n_workers=2), intervals)
+
+
+def test_other_seed_other_intervals(summary, intervals):
+    other = bootstrap_rankings(summary, n_replicates, seed=4, n_workers=1)
+    assert not np.allclose(other['ScoreLower'], intervals['ScoreLower'])
+
+
+def test_chunks_draw_from_spawned_seeds(summary):
+    # Chunk i of seed s is bootstrap_chunk seeded with SeedSequence(s).spawn(n_chunks)[i]
+    drivers, values, offsets, counts = race_index(summary)
+    seeds = np.random.SeedSequence(3).spawn(3)
+    sizes = [replicates_per_chunk, replicates_per_chunk, 100]
+    scores = np.concatenate([bootstrap_chunk((values, offsets, counts, ranking_weights(True), size, seed))[0]
+                             for size, seed in zip(sizes, seeds)])
+
+    lower = pd.Series(np.nanpercentile(scores, 2.5, axis=0), index=drivers)
+    intervals = bootstrap_rankings(summary, n_replicates, seed=3)
+    np.testing.assert_allclose(intervals['ScoreLower'], lower[intervals['Driver']].to_numpy(), rtol=1e-12)
@@ -0,0 +1,52 @@
+import contextlib
+import io
+
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from src.analysis.charts import render_charts
+from src.analysis.rank_drivers import analyze_best_driver, driver_ranking_charts
+from src.analysis.train_model import model_predictors, train_and_evaluate_model
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Headless rendering of the full chart set (model scatters, ranking bars and radar grid):
+# no show() call, and the same PNGs from the process pool as from the main thread
+
+
+@pytest.fixture(scope='module')
+def charts():
+    # Drivers are ranked from 20 races on
+    years = [2023, 2024]
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(years, session_loader=load_synthetic_race,
+                                   race_lister=lambda year: get_synthetic_races(year, 11))
+        modeling_data = prepare_features(tire_matrix)
+        charts = []
+        for target in ['StintLength', 'RacePoints']:
+            train_and_evaluate_model(modeling_data[modeling_data['Year'] == 2023],
+                                     modeling_data[modeling_data['Year'] == 2024], model_predictors(modeling_data),
+                                     target, cache_dir=None, charts=charts)
+    driver_rankings = analyze_best_driver(tire_matrix)
+    return charts + driver_ranking_charts(driver_rankings, top_n=10) + \
+        driver_ranking_charts(driver_rankings, top_n=6, radar=True)
+
+
+def test_headless_parallel_rendering_matches_sequential(charts, tmp_path, monkeypatch):
+    def show():
+        raise AssertionError("show() called in headless mode")
+    monkeypatch.setattr(plt, 'show', show)
+
+    sequential, parallel = tmp_path / 'sequential', tmp_path / 'parallel'
+    sequential.mkdir()
+    parallel.mkdir()
+    files = render_charts(charts, headless=True, n_workers=1, output_dir=sequential)
+    assert render_charts(charts, headless=True, n_workers=2, output_dir=parallel) == files
+
+    assert sorted(files) == sorted(spec['file'] for spec in charts)
+    assert sorted(path.name for path in parallel.iterdir()) == sorted(files)
+    for file in files:
+        assert np.array_equal(mpimg.imread(sequential / file), mpimg.imread(parallel / file)), file
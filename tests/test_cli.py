@@ -0,0 +1,57 @@
+import argparse
+import contextlib
+import io
+
+import pytest
+
+import src.config as config
+from src import cli
+from src.data.collect_data import collect_data
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# The train and rank stages' features, which come from the features stage's file only while
+# the store is unchanged since, and the stints stage's option checks
+
+
+def collect(store, races):
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data([2024], session_loader=load_synthetic_race, store=store,
+                     race_lister=lambda year: get_synthetic_races(year, races))
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'tire_store_path', str(tmp_path / 'store'))
+    monkeypatch.setattr(config, 'features_path', str(tmp_path / 'features.parquet'))
+    monkeypatch.setattr(config, 'feature_store_path', None)
+    monkeypatch.setattr(config, 'collect_telemetry_data', False)
+    monkeypatch.setattr(config, 'years', [2024])
+    return tmp_path
+
+
+def test_features_file_is_rebuilt_after_a_collect(settings, capsys):
+    collect(config.tire_store_path, 3)
+    cli.features(argparse.Namespace(streaming=False))
+    written = cli.load_features()
+    assert 'out of date' not in capsys.readouterr().out
+    assert written['Race'].nunique() == 3
+
+    collect(config.tire_store_path, 4)
+    rebuilt = cli.load_features()
+    assert 'out of date' in capsys.readouterr().out
+    assert rebuilt['Race'].nunique() == 4
+
+    # A features file without its fingerprint (e.g. from before it was recorded) is rebuilt too
+    cli.features(argparse.Namespace(streaming=False))
+    cli.fingerprint_path().unlink()
+    assert cli.load_features()['Race'].nunique() == 4
+    assert 'out of date' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('argv', [['stints', '--driver', 'D00'], ['stints', '--driver', 'D00', '--year', '2024'],
+                                  ['stints', '--driver', 'D00', '--race', 'Synthetic Grand Prix 1 2024']])
+def test_stints_driver_needs_year_and_race(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(argv)
+    assert exit_info.value.code == 2
+    assert "--driver also needs --year and --race" in capsys.readouterr().err
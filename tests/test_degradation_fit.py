@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.degradation_fit import fit_stint_degradation, fuel_corrected_lap_times
+
+# The stacked stint fit against np.polyfit of each stint, and its degree validation
+
+
+@pytest.fixture(scope='module')
+def tire_matrix():
+    rng = np.random.default_rng(0)
+    rows = []
+    for driver in ['AAA', 'BBB']:
+        for stint, length in [(1, 18), (2, 25)]:
+            for stint_lap in range(1, length + 1):
+                rows.append({'Year': 2024, 'Race': 'Test Grand Prix', 'Driver': driver, 'Stint': stint,
+                             'StintLapNumber': stint_lap, 'LapNumber': stint_lap + (stint - 1) * 18,
+                             'LapTime': 90000 + 60 * stint_lap + rng.normal(0, 150)})
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize('degree', [1, 2])
+def test_fit_matches_polyfit(tire_matrix, degree):
+    fit = fit_stint_degradation(tire_matrix, degree=degree)
+    corrected = tire_matrix.assign(Corrected=fuel_corrected_lap_times(tire_matrix))
+    for _, stint in corrected.groupby(['Driver', 'Stint']):
+        expected = np.polyfit(stint['StintLapNumber'] - 1, stint['Corrected'], degree)[::-1]
+        np.testing.assert_allclose(fit.loc[stint.index, 'DegIntercept'], expected[0], rtol=1e-9)
+        np.testing.assert_allclose(fit.loc[stint.index, 'DegSlope'], expected[1], rtol=1e-6)
+
+
+@pytest.mark.parametrize('degree', [0, -1, 1.5])
+def test_degree_without_slope_is_rejected(tire_matrix, degree):
+    with pytest.raises(ValueError, match="degree must be an integer of at least 1"):
+        fit_stint_degradation(tire_matrix, degree=degree)
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from src.data.collect_data import collect_data
+from src.data.feature_store import cached_features, column_path, features_key, metadata_file
+from src.data.prepare_features import group_keys
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Cached features against computing them without the cache, when the entry holds every
+# requested column and when some of them are missing from it
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    store = tmp_path_factory.mktemp('store')
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data([2024], session_loader=load_synthetic_race, store=store,
+                     race_lister=lambda year: get_synthetic_races(year, 4))
+    return store
+
+
+def features(store, root, columns=None):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        modeling_data = cached_features(store, [2024], columns, root=root)
+    return modeling_data, output.getvalue()
+
+
+def test_cached_features_match_uncached(store, tmp_path):
+    expected, _ = features(store, None)
+    built, output = features(store, tmp_path)
+    assert 'computed base features' in output
+    hit, output = features(store, tmp_path)
+    assert 'hit' in output
+    pd.testing.assert_frame_equal(built, expected)
+    pd.testing.assert_frame_equal(hit, expected)
+
+
+def test_partial_column_miss_is_computed(store, tmp_path):
+    expected, _ = features(store, None)
+    features(store, tmp_path)
+
+    # An entry lacking one requested column (unlisted) and the file of another
+    entry_path = tmp_path / features_key(store, [2024])[:24]
+    metadata = json.loads((entry_path / metadata_file).read_text())
+    del metadata['columns']['DegSlope_mean']
+    (entry_path / metadata_file).write_text(json.dumps(metadata))
+    column_path(entry_path, 'DegSlope_mean').unlink()
+    column_path(entry_path, 'RacePoints').unlink()
+
+    columns = ['DegSlope_mean', 'RacePoints', 'StintLength']
+    partial, output = features(store, tmp_path, columns)
+    assert 'computed missing base features' in output
+    pd.testing.assert_frame_equal(partial, expected[group_keys + columns])
+
+    hit, output = features(store, tmp_path, columns)
+    assert 'hit' in output
+    pd.testing.assert_frame_equal(hit, expected[group_keys + columns])
+
+
+def test_unknown_column_lists_supported_columns(store, tmp_path):
+    with pytest.raises(KeyError, match=r"Unknown feature columns \['NoSuchFeature'\], supported columns are .*"
+                                       r"'StintLength'"):
+        features(store, tmp_path, ['StintLength', 'NoSuchFeature'])
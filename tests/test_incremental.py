@@ -0,0 +1,70 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from src.analysis.incremental import IncrementalModels, load_models, update_models
+from src.analysis.train_model import model_predictors
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Incremental updates on synthetic seasons arriving in two batches: Ridge from the merged
+# moments against Ridge refitted on every row, the persisted state, and the reservoir cap
+
+target = 'StintLength'
+
+
+@pytest.fixture(scope='module')
+def modeling_data():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return prepare_features(collect_data([2022, 2023, 2024], session_loader=load_synthetic_race,
+                                             race_lister=lambda year: get_synthetic_races(year, 6)))
+
+
+@pytest.fixture(scope='module')
+def batches(modeling_data):
+    # 2022 and the first half of 2023, then the rest of 2023; 2024 is held out
+    train = modeling_data[modeling_data['Year'] < 2024]
+    keys = list(zip(train['Year'].astype(int), train['Race'].astype(str)))
+    first = set(sorted(set(keys))[:9])
+    return train[[key in first for key in keys]], train, modeling_data[modeling_data['Year'] == 2024]
+
+
+def test_merged_moments_match_full_ridge(modeling_data, batches):
+    first, train, _ = batches
+    models = IncrementalModels(model_predictors(modeling_data), target)
+    assert models.update(first) == len(first)
+    assert models.update(train) == len(train) - len(first)
+    assert models.update(train) == 0
+
+    X, y = models.rows(train)[:, :-1], train[target].to_numpy(np.float64)
+    scaler = StandardScaler().fit(X)
+    full_ridge = Ridge(alpha=models.alpha).fit(scaler.transform(X), y)
+    assert np.allclose(models.scaler().mean_, scaler.mean_)
+    assert np.allclose(models.scaler().scale_, scaler.scale_)
+    assert np.allclose(models.ridge().coef_, full_ridge.coef_)
+    assert np.isclose(models.ridge().intercept_, full_ridge.intercept_)
+
+
+def test_saved_state_round_trips(modeling_data, batches, tmp_path):
+    first, train, test = batches
+    predictors = model_predictors(modeling_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        update_models(first, test, predictors, target, model_dir=tmp_path, check_drift=False)
+        updated = update_models(train, test, predictors, target, model_dir=tmp_path, check_drift=False)
+    loaded = load_models(tmp_path, predictors, target)
+
+    assert loaded.n == updated.n == len(train) and loaded.seen_races == updated.seen_races
+    for expected, actual in zip(updated.predict(test), loaded.predict(test)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_reservoir_stays_within_its_cap(modeling_data):
+    models = IncrementalModels(model_predictors(modeling_data), target, trees_per_update=2, reservoir_size=50)
+    for (year, race), rows in modeling_data.groupby(['Year', 'Race'], observed=True, sort=False):
+        models.update(rows)
+        assert len(models.reservoir) == min(models.n, 50)
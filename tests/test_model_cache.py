@@ -0,0 +1,70 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Ridge
+
+from src.analysis.model_cache import load_or_fit
+
+# Fitted models reused from the cache only for the same fit: identical inputs are a hit,
+# while changing one training row, a hyperparameter or the predictor list is a miss
+
+predictors = ['TyreLife', 'TrackTemp']
+target = 'LapTime'
+hyperparameters = {'alpha': 1.0}
+
+
+@pytest.fixture
+def train_data():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(50, 3)), columns=predictors + [target])
+    data['Driver'] = [f"D{i % 20:02d}" for i in range(50)]
+    return data
+
+
+class CountingFit:
+    def __init__(self):
+        self.fits = 0
+
+    def __call__(self, train_data, predictors, target):
+        self.fits += 1
+        return Ridge().fit(train_data[predictors], train_data[target])
+
+
+def cached_fit(fit, train_data, cache_dir, predictors=predictors, hyperparameters=hyperparameters):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_or_fit(fit, train_data, predictors, target, hyperparameters, cache_dir)
+
+
+def test_identical_fit_is_a_hit(tmp_path, train_data):
+    fit = CountingFit()
+    first = cached_fit(fit, train_data, tmp_path)
+    # Columns outside the predictors and target do not take part in the fit
+    second = cached_fit(fit, train_data.assign(Driver='D00'), tmp_path)
+    assert fit.fits == 1
+    np.testing.assert_array_equal(first.coef_, second.coef_)
+
+
+def test_changed_row_is_a_miss(tmp_path, train_data):
+    fit = CountingFit()
+    cached_fit(fit, train_data, tmp_path)
+    changed = train_data.copy()
+    changed.loc[7, 'TyreLife'] += 1e-9
+    cached_fit(fit, changed, tmp_path)
+    assert fit.fits == 2
+
+
+def test_changed_hyperparameter_is_a_miss(tmp_path, train_data):
+    fit = CountingFit()
+    cached_fit(fit, train_data, tmp_path)
+    cached_fit(fit, train_data, tmp_path, hyperparameters={'alpha': 2.0})
+    assert fit.fits == 2
+
+
+def test_changed_predictors_is_a_miss(tmp_path, train_data):
+    fit = CountingFit()
+    cached_fit(fit, train_data, tmp_path)
+    cached_fit(fit, train_data, tmp_path, predictors=predictors[:1])
+    assert fit.fits == 2
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from src.data.collect_data import collect_data
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Process-pool collection with the offline stub session loader: the same tire matrix as the
+# sequential collection, and a race that fails to load reported without stopping the run
+
+
+def races_with_cancellation(year):
+    return get_synthetic_races(year, 4) + [("Cancelled Grand Prix", "Nowhere")]
+
+
+def test_parallel_collection_matches_sequential(capsys):
+    years = [2022, 2023]
+    sequential = collect_data(years, n_workers=1, session_loader=load_synthetic_race,
+                              race_lister=races_with_cancellation)
+    parallel = collect_data(years, n_workers=2, session_loader=load_synthetic_race,
+                            race_lister=races_with_cancellation)
+
+    # Results merge in schedule order whatever order the workers finish in
+    pd.testing.assert_frame_equal(sequential, parallel, check_exact=True)
+    assert sequential['Race'].astype(str).unique().tolist() == [
+        race for year in years for race, _ in get_synthetic_races(year, 4)]
+
+    output = capsys.readouterr().out
+    assert output.count("Cancelled Grand Prix: ValueError") == 2 * len(years)
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import threading
+
+import pandas as pd
+import pytest
+
+from src.benchmarks.prefetch_benchmark import DelayedLoader
+from src.data.collect_data import collect_data, prefetch_sessions_ahead
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Collection with sessions prefetched by a background thread against sequential collection
+# with one worker: the same tire matrix, at most depth + 2 sessions alive at once, and a
+# loader thread dying of a non-Exception surfacing in the consumer rather than hanging it
+
+years = [2023, 2024]
+races_per_season = 4
+
+
+def race_lister(year):
+    return get_synthetic_races(year, races_per_season)
+
+
+@pytest.fixture(scope='module')
+def sessions():
+    return {(year, race[0]): load_synthetic_race(year, race[0], 'R') for year in years for race in race_lister(year)}
+
+
+def collect(sessions, prefetch):
+    loader = DelayedLoader(sessions, 0.01)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(years, n_workers=1, session_loader=loader, race_lister=race_lister,
+                                   prefetch=prefetch)
+    return tire_matrix, loader.peak_live
+
+
+@pytest.mark.parametrize('depth', [1, 2, 4])
+def test_prefetch_matches_sequential_and_bounds_live_sessions(sessions, depth):
+    sequential, _ = collect(sessions, 0)
+    prefetched, peak = collect(sessions, depth)
+    pd.testing.assert_frame_equal(sequential, prefetched, check_exact=True)
+    # Back-pressure: queued sessions, plus the one being loaded and the one processed
+    assert peak <= depth + 2
+
+
+def test_loader_exit_reaches_consumer():
+    def loader(year, grand_prix, session_name):
+        if grand_prix == 'B':
+            raise SystemExit(3)
+        return grand_prix
+
+    tasks = [(2024, name, loader, None) for name in 'ABC']
+    seen, raised = [], []
+
+    def consume():
+        try:
+            for task, (session, error) in prefetch_sessions_ahead(tasks, 1):
+                seen.append(session)
+        except SystemExit as error:
+            raised.append(error.code)
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    consumer.join(timeout=10)
+    assert not consumer.is_alive()
+    assert seen == ['A']
+    assert raised == [3]
@@ -0,0 +1,39 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features, prepare_features_streaming
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Features of races that keep their name from season to season: each season's race is
+# compared with its own field only, as if the seasons were prepared separately
+
+
+@pytest.fixture(scope='module')
+def tire_matrix():
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data([2023, 2024], session_loader=load_synthetic_race,
+                                   race_lister=lambda year: get_synthetic_races(year, 3))
+    races = tire_matrix['Race'].astype(str).str.replace(r' \d{4}$', '', regex=True)
+    assert races.nunique() == 3
+    return tire_matrix.assign(Race=races)
+
+
+def test_relative_performance_is_within_the_season(tire_matrix):
+    both = prepare_features(tire_matrix).set_index(['Driver', 'Race', 'Year', 'Compound'])
+    for year in (2023, 2024):
+        alone = prepare_features(tire_matrix[tire_matrix['Year'] == year]).set_index(
+            ['Driver', 'Race', 'Year', 'Compound'])
+        np.testing.assert_allclose(both.loc[alone.index, 'RelativePerformance'], alone['RelativePerformance'],
+                                   rtol=1e-12)
+
+
+def test_streaming_relative_performance_is_within_the_season(tire_matrix):
+    batches = [race for _, race in tire_matrix.groupby(['Year', 'Race'], observed=True, sort=False)]
+    in_memory = prepare_features(tire_matrix).set_index(['Driver', 'Race', 'Year', 'Compound'])
+    streamed = prepare_features_streaming(batches).set_index(['Driver', 'Race', 'Year', 'Compound'])
+    np.testing.assert_allclose(streamed.loc[in_memory.index, 'RelativePerformance'],
+                               in_memory['RelativePerformance'], rtol=1e-6)
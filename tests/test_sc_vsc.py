@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.benchmarks.sc_vsc_benchmark import legacy_neutralised_lap_mask
+from src.utils.helpers import (extract_sc_vsc_periods, extract_sc_vsc_intervals, neutralised_lap_mask,
+                               is_valid_lap, valid_lap_mask)
+from src.utils.synthetic import make_session, make_track_status
+
+# The interval-indexed SC/VSC filtering against the per-period functions it replaced, on
+# synthetic track status with and without an SC still open at the end of the session
+
+
+@pytest.fixture(scope='module')
+def laps():
+    laps = make_session(seed=0, n_drivers=5).laps.copy()
+    # Laps without timing must be treated as overlapping whenever periods exist
+    laps.loc[laps.sample(frac=0.02, random_state=0).index, 'LapStartTime'] = pd.NaT
+    laps.loc[laps.sample(frac=0.02, random_state=1).index, 'Time'] = pd.NaT
+    return laps
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_interval_filtering_matches_period_scan(laps, seed):
+    rng = np.random.default_rng(seed)
+    track_status = make_track_status(rng, laps['LapStartTime'].min(), laps['Time'].max(),
+                                     n_periods=int(rng.integers(0, 12)), open_at_end=bool(rng.random() < 0.3))
+
+    periods = extract_sc_vsc_periods(track_status)
+    starts, ends = extract_sc_vsc_intervals(track_status)
+    assert [(pd.Timedelta(s), pd.Timedelta(e)) for s, e in zip(starts, ends)] == periods
+
+    pd.testing.assert_series_equal(legacy_neutralised_lap_mask(laps, periods),
+                                   neutralised_lap_mask(laps, (starts, ends)), check_names=False)
+    legacy_valid = pd.Series([is_valid_lap(index, laps, periods) for index in laps.index], index=laps.index)
+    pd.testing.assert_series_equal(legacy_valid, valid_lap_mask(laps, (starts, ends)), check_names=False)
+
+
+def test_sc_open_at_end_neutralises_remaining_laps(laps):
+    # An SC never cleared covers every lap still running after it was deployed
+    rng = np.random.default_rng(0)
+    track_status = make_track_status(rng, laps['LapStartTime'].min(), laps['Time'].max(), n_periods=2,
+                                     open_at_end=True)
+    starts, ends = extract_sc_vsc_intervals(track_status)
+    neutralised = neutralised_lap_mask(laps, (starts, ends))
+    assert neutralised[laps['Time'] >= pd.Timedelta(starts[-1])].all()
+    assert not neutralised.all()
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+from src.service.queries import LRUCache
+from src.service.server import similar_stints_params, start_server
+
+# Status and JSON body of the service's answers, on a stub service whose queries fail in the
+# ways a real one can: bad parameters (400) and unexpected errors (500), and how the
+# similar-stints compound parameter is read whatever its case
+
+
+class FailingService:
+    cache = LRUCache()
+
+    def cached(self, name, **params):
+        return None
+
+    def query(self, name, **params):
+        if name == 'driver_stats':
+            raise KeyError(f"Unknown driver {params['driver']}")
+        if name == 'top_drivers':
+            return {'rankings': object()}
+        raise RuntimeError("store partition is corrupt")
+
+
+async def get(targets):
+    # (status, body) of each target, over one keep-alive connection
+    server = await start_server(FailingService(), '127.0.0.1', 0)
+    reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+    responses = []
+    for target in targets:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while (line := await reader.readline()) != b'\r\n':
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        responses.append((status, json.loads(await reader.readexactly(length))))
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return responses
+
+
+@pytest.mark.parametrize('target, status, error', [
+    ('/driver-stats?driver=XXX', 400, "Unknown driver XXX"),
+    ('/degradation-curve?driver=VER', 500, "Internal error (RuntimeError)"),
+    ('/top-drivers?n=3', 500, "Internal error (TypeError)"),
+])
+def test_error_answers(target, status, error, capsys):
+    # The connection stays usable after an error
+    responses = asyncio.run(get([target, '/health']))
+    assert responses == [(status, {'error': error}), (200, {'status': 'ok'})]
+    if status == 500:
+        assert f"Query {target} failed" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('compound, expected', [
+    ('Same', 'same'), ('same', 'same'), ('ANY', None), ('soft', 'SOFT'), (None, 'same'),
+])
+def test_similar_stints_compound(compound, expected):
+    params = {'year': '2023', 'race': 'Bahrain Grand Prix', 'driver': 'VER', 'stint': '2'}
+    if compound is not None:
+        params['compound'] = compound
+    assert similar_stints_params(params)['compound'] == expected
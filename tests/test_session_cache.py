@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data import session_cache
+from src.data.collect_data import process_race
+from src.data.session_cache import SessionCache, extract_path, race_loader, read_extract
+from src.utils.helpers import load_race
+from src.utils.synthetic import load_synthetic_race
+
+# Tire records built from a cached session extract against those built from the live
+# session: on the run writing the extract and on the run reading it back, with laps whose
+# Deleted flag is missing (None) and timings that are NaT
+
+year, race_name = 2024, 'Synthetic Grand Prix 3 2024'
+
+
+class CountingLoader:
+    # Synthetic sessions as FastF1 can return them, Deleted missing for some laps
+    def __init__(self):
+        self.loads = 0
+
+    def __call__(self, year, grand_prix, session_name):
+        self.loads += 1
+        session = load_synthetic_race(year, grand_prix, session_name)
+        laps = session.laps.copy()
+        laps['Deleted'] = laps['Deleted'].astype(object)
+        laps.loc[laps.index[::17], 'Deleted'] = None
+        session.laps = laps
+        return session
+
+
+@pytest.fixture
+def cache(tmp_path):
+    assert race_loader(None) is load_race
+    cache = race_loader(tmp_path)
+    assert isinstance(cache, SessionCache)
+    cache.loader = CountingLoader()
+    return cache
+
+
+def test_extract_gives_the_live_session_records(cache, tmp_path):
+    expected = process_race(cache.loader(year, race_name, 'R'), race_name, year)
+    cache.loader.loads = 0
+
+    cold = process_race(cache(year, race_name, 'R'), race_name, year)
+    warm = process_race(cache(year, race_name, 'R'), race_name, year)
+    assert cache.loader.loads == 1
+    pd.testing.assert_frame_equal(cold, expected, check_exact=True)
+    pd.testing.assert_frame_equal(warm, expected, check_exact=True)
+
+    laps = read_extract(extract_path(tmp_path, year, race_name, 'R')).laps
+    assert laps['Deleted'].dtype == bool
+    for col in ['LapTime', 'PitInTime', 'PitOutTime']:
+        assert np.issubdtype(laps[col].dtype, np.timedelta64) and laps[col].isna().any()
+
+
+def test_extract_version_bump_reloads(cache, monkeypatch):
+    cache(year, race_name, 'R')
+    cache(year, race_name, 'R')
+    assert cache.loader.loads == 1
+
+    monkeypatch.setattr(session_cache, 'EXTRACT_VERSION', session_cache.EXTRACT_VERSION + 1)
+    cache(year, race_name, 'R')
+    cache(year, race_name, 'R')
+    assert cache.loader.loads == 2
@@ -0,0 +1,99 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.collect_data import collect_data
+from src.data.stint_index import open_stint_index, resample_curves, update_stint_index
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Stint curve resampling against np.interp of each stint on its own, and index queries
+# against a scan of every stint vector
+
+
+def per_stint_interp(stint_ids, stint_lap, stint_length, values, n_points):
+    curves = []
+    for stint in np.unique(stint_ids):
+        laps = stint_ids == stint
+        fraction = (stint_lap[laps] - 1) / max(stint_length[laps][0] - 1, 1)
+        curves.append(np.interp(np.linspace(0, 1, n_points), fraction, values[laps]))
+    return np.array(curves)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_resample_matches_per_stint_interp(seed):
+    # Stints missing laps anywhere, their first and last included
+    rng = np.random.default_rng(seed)
+    stint_ids, stint_lap, stint_length, values = [], [], [], []
+    for stint in range(int(rng.integers(1, 30))):
+        length = int(rng.integers(1, 40))
+        laps = np.flatnonzero(rng.random(length) < 0.8) + 1
+        laps = laps if len(laps) else np.array([int(rng.integers(1, length + 1))])
+        stint_ids += [stint] * len(laps)
+        stint_lap += list(laps)
+        stint_length += [length] * len(laps)
+        values += list(rng.normal(stint * 10, 5, len(laps)))
+    args = [np.array(stint_ids), np.array(stint_lap, dtype=np.float64), np.array(stint_length, dtype=np.float64),
+            np.array(values), 12]
+    np.testing.assert_allclose(resample_curves(*args), per_stint_interp(*args), rtol=1e-12, atol=1e-9)
+
+
+def test_curve_ends_hold_first_and_last_valid_values():
+    # A flat stint at 0 followed by a flat stint at 100 whose first and last laps are missing
+    stint_ids = np.array([0] * 10 + [1] * 6)
+    stint_lap = np.r_[np.arange(1, 11), np.arange(3, 9)].astype(np.float64)
+    stint_length = np.r_[np.full(10, 10), np.full(6, 10)].astype(np.float64)
+    values = np.r_[np.zeros(10), np.full(6, 100.0)]
+    curves = resample_curves(stint_ids, stint_lap, stint_length, values, 5)
+    np.testing.assert_array_equal(curves, [[0] * 5, [100] * 5])
+
+
+@pytest.fixture(scope='module')
+def stint_index(tmp_path_factory):
+    # Indexed in two updates, the second adding a race per season
+    tmp = tmp_path_factory.mktemp('stints')
+    store, root = tmp / 'store', tmp / 'stint_index'
+    with contextlib.redirect_stdout(io.StringIO()):
+        for races in (5, 6):
+            collect_data([2023, 2024], session_loader=load_synthetic_race, store=store,
+                         race_lister=lambda year: get_synthetic_races(year, races))
+            update_stint_index(root, store)
+    return open_stint_index(root)
+
+
+@pytest.mark.parametrize('compound, in_race', [('same', None), (None, None), ('same', 'race'), (None, 'race')])
+def test_similar_stints_match_scan(stint_index, compound, in_race):
+    stints = stint_index.stints
+    vectors = np.asarray(stint_index.vectors, dtype=np.float64)
+    for row in range(0, len(stint_index), 7):
+        key = tuple(stints.iloc[row][['Year', 'Race', 'Driver', 'Stint']])
+        race = str(key[1]) if in_race else None
+        neighbours = stint_index.similar_stints(*key, k=10, compound=compound, in_race=race)
+
+        distances = np.sqrt(((vectors - vectors[row]) ** 2).sum(axis=1))
+        if compound:
+            distances[stint_index.compounds != stint_index.compounds[row]] = np.inf
+        if race:
+            distances[stints['Race'].astype(str).to_numpy() != race] = np.inf
+        distances[row] = np.inf
+        expected = np.sort(distances)[:10]
+        expected = expected[np.isfinite(expected)]
+        np.testing.assert_allclose(neighbours['Distance'].to_numpy(), expected, rtol=1e-12)
+        assert neighbours['Distance'].is_monotonic_increasing
+
+
+def test_updates_match_one_build(stint_index, tmp_path):
+    # The same stints and vectors as indexing every race at once
+    store = tmp_path / 'store'
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data([2023, 2024], session_loader=load_synthetic_race, store=store,
+                     race_lister=lambda year: get_synthetic_races(year, 6))
+        update_stint_index(tmp_path / 'stint_index', store)
+    built = open_stint_index(tmp_path / 'stint_index')
+    order = built.stints.set_index(['Year', 'Race', 'Driver', 'Stint']).index.get_indexer(
+        stint_index.stints.set_index(['Year', 'Race', 'Driver', 'Stint']).index)
+    assert len(built) == len(stint_index) and (order >= 0).all()
+    pd.testing.assert_frame_equal(built.stints.iloc[order].reset_index(drop=True), stint_index.stints)
+    np.testing.assert_array_equal(built.vectors[order], stint_index.vectors)
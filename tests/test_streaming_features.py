@@ -0,0 +1,41 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from src.benchmarks.streaming_benchmark import max_scaled_error
+from src.data.collect_data import collect_data
+from src.data.prepare_features import prepare_features, prepare_features_streaming
+from src.data.tire_store import iter_tire_matrix, load_tire_matrix
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# prepare_features_streaming over store partitions against prepare_features on the whole
+# tire matrix: same groups and columns, values within the float32 tolerance, exact medians
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    store = tmp_path_factory.mktemp('store')
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data([2023, 2024], session_loader=load_synthetic_race,
+                     race_lister=lambda year: get_synthetic_races(year, 6), store=store)
+    return store
+
+
+def test_streaming_matches_in_memory(store):
+    in_memory = prepare_features(load_tire_matrix(store))
+    streamed = prepare_features_streaming(iter_tire_matrix(store))
+
+    assert list(streamed.columns) == list(in_memory.columns)
+    assert streamed[['Driver', 'Race', 'Year', 'Compound']].astype(str).equals(
+        in_memory[['Driver', 'Race', 'Year', 'Compound']].astype(str))
+    assert max_scaled_error(in_memory, streamed) < 1e-6
+    np.testing.assert_array_equal(in_memory['DegradationPct_median'], streamed['DegradationPct_median'])
+
+
+def test_group_spanning_batches_is_rejected(store):
+    tire_matrix = load_tire_matrix(store)
+    half = len(tire_matrix) // 2
+    with pytest.raises(ValueError, match="whole races"):
+        prepare_features_streaming([tire_matrix.iloc[:half], tire_matrix.iloc[half:]])
@@ -0,0 +1,128 @@
+import contextlib
+import io
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.collect_data import collect_data
+from src.data.prepare_features import group_keys, prepare_features, tire_matrix_columns
+from src.data.telemetry_features import join_telemetry_features, telemetry_feature_columns, telemetry_features
+from src.data.telemetry_store import (channel_length, collect_telemetry, compact_telemetry, lap_telemetry,
+                                      open_telemetry, stale_telemetry)
+from src.data.tire_store import load_tire_matrix, read_manifest, write_manifest
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# The memory-mapped telemetry store on synthetic car data: laps read back as extracted,
+# races collected again superseding their laps until compaction, staleness against the tire
+# store's versions, and telemetry features joined onto the prepare_features rows
+
+
+@pytest.fixture(scope='module')
+def collected(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('collected')
+    store, root = tmp_path / 'store', tmp_path / 'telemetry'
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data([2023, 2024], session_loader=load_synthetic_race, store=store,
+                     race_lister=lambda year: get_synthetic_races(year, 3))
+        collect_telemetry([2023, 2024], store, root, session_loader=load_synthetic_race)
+    return store, root
+
+
+@pytest.fixture
+def stores(collected, tmp_path):
+    # A copy of the collected stores for each test to modify
+    store, root = tmp_path / 'store', tmp_path / 'telemetry'
+    shutil.copytree(collected[0], store)
+    shutil.copytree(collected[1], root)
+    return store, root
+
+
+def every_lap(root):
+    # The samples of every indexed lap, by (Year, Race, Driver, LapNumber)
+    index, channels = open_telemetry(root)
+    return {(lap.Year, lap.Race, lap.Driver, lap.LapNumber):
+            {name: np.array(channel[lap.Offset:lap.Offset + lap.Length]) for name, channel in channels.items()}
+            for lap in index.astype({'Race': str, 'Driver': str}).itertuples()}
+
+
+def test_laps_read_back_their_samples(collected):
+    store, root = collected
+    index, _ = open_telemetry(root)
+    assert len(index) == len(load_tire_matrix(store)) and (index['Length'] > 0).all()
+
+    sessions = {}
+    for lap in index.astype({'Race': str, 'Driver': str}).sample(30, random_state=0).itertuples():
+        if (lap.Year, lap.Race) not in sessions:
+            sessions[(lap.Year, lap.Race)] = load_synthetic_race(lap.Year, lap.Race, 'R')
+        session = sessions[(lap.Year, lap.Race)]
+        info = session.laps[(session.laps['Driver'] == lap.Driver) & (session.laps['LapNumber'] == lap.LapNumber)]
+        car_data = session.car_data[info['DriverNumber'].iloc[0]]
+        in_lap = ((car_data['SessionTime'] >= info['LapStartTime'].iloc[0])
+                  & (car_data['SessionTime'] < info['Time'].iloc[0]))
+        expected = car_data[in_lap]
+
+        samples = lap_telemetry(root, lap.Year, lap.Race, lap.Driver, lap.LapNumber)
+        np.testing.assert_array_equal(samples['Speed'], expected['Speed'].to_numpy(np.float32))
+        np.testing.assert_array_equal(samples['Throttle'], expected['Throttle'].to_numpy(np.float32))
+        np.testing.assert_array_equal(samples['Brake'], expected['Brake'].to_numpy(bool))
+        assert samples['Distance'].iloc[0] == 0 and samples['Distance'].is_monotonic_increasing
+
+    with pytest.raises(KeyError):
+        lap_telemetry(root, 2023, 'No Grand Prix', 'D00', 1)
+
+
+def test_only_races_of_a_changed_version_are_stale(stores):
+    store, root = stores
+    assert stale_telemetry(root, store) == []
+
+    manifest = read_manifest(store)
+    changed = sorted(manifest)[1]
+    manifest[changed]['version'] += 1
+    write_manifest(store, manifest)
+    assert [(entry['year'], entry['race']) for entry in stale_telemetry(root, store)] == \
+        [(manifest[changed]['year'], manifest[changed]['race'])]
+    assert stale_telemetry(root, store, years=[3000]) == []
+
+
+def test_compaction_keeps_live_laps_and_drops_superseded_ones(stores):
+    store, root = stores
+    manifest = read_manifest(store)
+    changed = manifest[sorted(manifest)[1]]
+    changed['version'] += 1
+    write_manifest(store, manifest)
+    before = every_lap(root)
+    samples_before = channel_length(root)
+
+    # The race collected again is appended; its old samples stay until compaction
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert collect_telemetry([2023, 2024], store, root, session_loader=load_synthetic_race) == 1
+    index, _ = open_telemetry(root)
+    race_samples = int(index.loc[index['Race'] == changed['race'], 'Length'].sum())
+    assert channel_length(root) == samples_before + race_samples
+    assert len(index) == len(before) and index.duplicated(['Year', 'Race', 'Driver', 'LapNumber']).sum() == 0
+
+    compact_telemetry(root)
+    index, _ = open_telemetry(root)
+    assert channel_length(root) == samples_before == index['Length'].sum()
+    after = every_lap(root)
+    assert after.keys() == before.keys()
+    for key, samples in before.items():
+        for name, values in samples.items():
+            np.testing.assert_array_equal(after[key][name], values)
+
+
+def test_features_join_onto_prepare_features_rows(collected):
+    store, root = collected
+    modeling_data = prepare_features(load_tire_matrix(store, columns=tire_matrix_columns))
+    features = telemetry_features(root, n_bins=20)
+    joined = join_telemetry_features(modeling_data, features)
+
+    pd.testing.assert_frame_equal(joined[modeling_data.columns], modeling_data)
+    assert joined['TelemetryLaps'].notna().all()
+    keyed = features.set_index(group_keys)
+    for row in joined.astype({'Driver': str, 'Race': str, 'Compound': str}).sample(25, random_state=0).itertuples():
+        expected = keyed.loc[(row.Driver, row.Race, row.Year, row.Compound), telemetry_feature_columns]
+        np.testing.assert_allclose([getattr(row, col) for col in telemetry_feature_columns],
+                                   expected.to_numpy(np.float64))
@@ -0,0 +1,84 @@
+import contextlib
+import io
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.data.collect_data import PROCESSING_VERSION, collect_data
+from src.data.tire_store import load_tire_matrix, partition_key, read_manifest, write_manifest
+from src.utils.synthetic import get_synthetic_races, load_synthetic_race
+
+# Incremental collection into the partitioned store: a second collect with nothing changed
+# loads and writes nothing, a race whose processing version changed is the only one
+# rewritten, and column and year selection read the same values as the full store
+
+years = [2023, 2024]
+
+
+class RecordingLoader:
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, year, grand_prix, session_name):
+        self.loaded.append((year, grand_prix))
+        return load_synthetic_race(year, grand_prix, session_name)
+
+
+def collect(store):
+    loader = RecordingLoader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tire_matrix = collect_data(years, n_workers=1, session_loader=loader, store=store,
+                                   race_lister=lambda year: get_synthetic_races(year, 3))
+    return tire_matrix, loader.loaded
+
+
+def age_partitions(store):
+    # Backdate every file so that any rewrite shows up in its modification time
+    files = sorted(path for path in Path(store).rglob('*') if path.is_file())
+    for path in files:
+        os.utime(path, ns=(0, 0))
+    return files
+
+
+def rewritten(files):
+    return [path for path in files if path.stat().st_mtime_ns != 0]
+
+
+def test_unchanged_collect_writes_nothing(tmp_path):
+    first, loaded = collect(tmp_path)
+    assert len(loaded) == 6
+    manifest = read_manifest(tmp_path)
+    files = age_partitions(tmp_path)
+
+    second, loaded = collect(tmp_path)
+    assert loaded == []
+    assert rewritten(files) == []
+    assert read_manifest(tmp_path) == manifest
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_changed_race_rewrites_only_its_partition(tmp_path):
+    first, _ = collect(tmp_path)
+    manifest = read_manifest(tmp_path)
+    changed = (2024, 'Synthetic Grand Prix 2 2024')
+    entry = manifest[partition_key(*changed)]
+    entry['version'] = PROCESSING_VERSION - 1
+    write_manifest(tmp_path, manifest)
+    files = age_partitions(tmp_path)
+
+    second, loaded = collect(tmp_path)
+    assert loaded == [changed]
+    partitions = [path for path in rewritten(files) if path.parent.name in map(str, years)]
+    assert partitions == [tmp_path / entry['path']]
+    assert read_manifest(tmp_path)[partition_key(*changed)]['version'] == PROCESSING_VERSION
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_column_and_year_selection_matches_full_load(tmp_path):
+    collect(tmp_path)
+    full = load_tire_matrix(tmp_path)
+    columns = ['Year', 'Race', 'Driver', 'Compound', 'LapTime']
+    selected = load_tire_matrix(tmp_path, years=[2024], columns=columns)
+    expected = full.loc[full['Year'] == 2024, columns].reset_index(drop=True)
+    pd.testing.assert_frame_equal(selected, expected, check_categorical=False)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.analysis.tuning import grow_forest, ridge_alphas, tune_random_forest, tune_ridge
+
+# Budgeted tuning on a small regression problem: tree and time budgets, the OOB plateau
+# stop, a budget too small for any forest, and reproducibility for a fixed seed
+
+# Forests of 10 trees leave a few rows without out-of-bag predictions
+pytestmark = pytest.mark.filterwarnings('ignore:Some inputs do not have OOB scores')
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 5))
+    y = 3 * X[:, 0] - 2 * X[:, 1] ** 2 + X[:, 2] * X[:, 3] + rng.normal(0, 0.5, len(X))
+    return X, y
+
+
+@pytest.mark.parametrize('budget_trees', [10, 60, 200])
+def test_tree_budget_is_respected(data, budget_trees):
+    forest, report = tune_random_forest(*data, n_candidates=6, budget_trees=budget_trees, min_trees=10, max_trees=90)
+    assert 0 < report['trees_grown'] <= budget_trees
+    assert forest.n_estimators == report['trees'] <= budget_trees
+
+
+def test_time_budget_is_respected(data):
+    _, report = tune_random_forest(*data, n_candidates=27, budget_seconds=0.5, min_trees=10, max_trees=810)
+    # The rung in progress at the deadline finishes its current growth step
+    assert report['seconds'] < 0.5 + 2
+    assert report['rungs'][-1]['trees'] < 810
+
+
+def test_plateaued_forests_stop_growing(data):
+    # No growth step can improve OOB R² by 1, so forests stop after their second step
+    forest, history, plateaued = grow_forest((None, {'max_depth': 4}, *data, 50, 10, 1.0, float('inf'), 0))
+    assert plateaued and forest.n_estimators == 20 and [trees for trees, _ in history] == [10, 20]
+    # A forest carried over from an earlier rung compares its first step with its last OOB R²
+    forest, history, plateaued = grow_forest((forest, {'max_depth': 4}, *data, 50, 10, 1.0, float('inf'), 0))
+    assert plateaued and forest.n_estimators == 30 and len(history) == 1
+
+    # Rung one grows every candidate to 10 trees, and rung two stops them at 20 instead of 30
+
+    forest, report = tune_random_forest(*data, n_candidates=4, min_trees=10, max_trees=90, tolerance=1.0)
+    assert report['trees'] == 20 and report['trees_grown'] <= 4 * 20
+
+
+@pytest.mark.parametrize('budget', [{'budget_trees': 5}, {'budget_seconds': 1e-9}])
+def test_budget_too_small_raises(data, budget):
+    with pytest.raises(ValueError, match="budget too small"):
+        tune_random_forest(*data, n_candidates=3, min_trees=10, **budget)
+
+
+def test_winner_is_deterministic_for_a_seed(data):
+    X, y = data
+    runs = [tune_random_forest(X, y, n_candidates=6, budget_trees=150, min_trees=10, max_trees=90, seed=seed)
+            for seed in (7, 7)]
+    (first, first_report), (second, second_report) = runs
+    assert first_report['params'] == second_report['params'] and first_report['trees'] == second_report['trees']
+    np.testing.assert_array_equal(first.predict(X), second.predict(X))
+
+
+def test_ridge_alpha_comes_from_the_grid(data):
+    ridge, report = tune_ridge(*data)
+    assert report['alpha'] in ridge_alphas and ridge.alpha == report['alpha']